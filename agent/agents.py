@@ -5,6 +5,7 @@ import google.generativeai as genai
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from agent.data_fetcher import fetch_place_photo, fetch_place_details, fetch_menu_from_search
+from services import llm_gateway
 
 @dataclass
 class AgentResult:
@@ -18,7 +19,7 @@ class BaseAgent:
         self.api_key = os.getenv("GEMINI_API_KEY")
         if self.api_key:
             genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
 
     async def run(self, *args, **kwargs) -> AgentResult:
         raise NotImplementedError
@@ -81,10 +82,11 @@ class ReviewAgent(BaseAgent):
         """
         
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="ReviewAgent.run"
             )
             data = json.loads(response.text)
             return AgentResult(source="review", data=data, confidence=0.7)
@@ -201,10 +203,11 @@ Lint and Test: frontend/src/app/recommendation/page.tsx#L11
         """
         
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="SearchAgent.run"
             )
             data = json.loads(response.text)
             
@@ -346,10 +349,11 @@ Produce a single JSON object analyzing the restaurant:
         """
         
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="AggregationAgent.run"
             )
             data = json.loads(response.text)
             
@@ -1,5 +1,5 @@
 import os
-import httpx
+from services.http_clients import get_client
 from dotenv import load_dotenv
 import asyncio
 
@@ -16,39 +16,39 @@ async def fetch_place_details(restaurant_name: str) -> dict:
     if not GOOGLE_API_KEY:
         return {"error": "Missing GOOGLE_API_KEY"}
 
-    async with httpx.AsyncClient() as client:
-        # 1. Find Place ID
-        search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-        params = {
-            "query": restaurant_name,
+    client = get_client("google_maps")
+    # 1. Find Place ID
+    search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+    params = {
+        "query": restaurant_name,
+        "key": GOOGLE_API_KEY,
+        "language": "zh-TW"
+    }
+    try:
+        response = await client.get(search_url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data.get("results"):
+            return {"error": "Restaurant not found"}
+        
+        place_id = data["results"][0]["place_id"]
+        
+        # 2. Get Details (Reviews + Photos)
+        details_url = "https://maps.googleapis.com/maps/api/place/details/json"
+        details_params = {
+            "place_id": place_id,
+            "fields": "name,rating,reviews,formatted_address,photos,types",
             "key": GOOGLE_API_KEY,
             "language": "zh-TW"
         }
-        try:
-            response = await client.get(search_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data.get("results"):
-                return {"error": "Restaurant not found"}
-            
-            place_id = data["results"][0]["place_id"]
-            
-            # 2. Get Details (Reviews + Photos)
-            details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-            details_params = {
-                "place_id": place_id,
-                "fields": "name,rating,reviews,formatted_address,photos,types",
-                "key": GOOGLE_API_KEY,
-                "language": "zh-TW"
-            }
-            details_resp = await client.get(details_url, params=details_params)
-            details_resp.raise_for_status()
-            return details_resp.json().get("result", {})
-            
-        except Exception as e:
-            print(f"Error fetching place details: {e}")
-            return {"error": str(e)}
+        details_resp = await client.get(details_url, params=details_params)
+        details_resp.raise_for_status()
+        return details_resp.json().get("result", {})
+        
+    except Exception as e:
+        print(f"Error fetching place details: {e}")
+        return {"error": str(e)}
 
 async def fetch_place_photo(photo_reference: str, max_width: int = 400) -> bytes:
     """
@@ -57,20 +57,20 @@ async def fetch_place_photo(photo_reference: str, max_width: int = 400) -> bytes
     if not GOOGLE_API_KEY:
         return None
 
-    async with httpx.AsyncClient() as client:
-        url = "https://maps.googleapis.com/maps/api/place/photo"
-        params = {
-            "maxwidth": max_width,
-            "photo_reference": photo_reference,
-            "key": GOOGLE_API_KEY
-        }
-        try:
-            response = await client.get(url, params=params, follow_redirects=True)
-            response.raise_for_status()
-            return response.content
-        except Exception as e:
-            print(f"Error fetching photo: {e}")
-            return None
+    client = get_client("google_maps")
+    url = "https://maps.googleapis.com/maps/api/place/photo"
+    params = {
+        "maxwidth": max_width,
+        "photo_reference": photo_reference,
+        "key": GOOGLE_API_KEY
+    }
+    try:
+        response = await client.get(url, params=params, follow_redirects=True)
+        response.raise_for_status()
+        return response.content
+    except Exception as e:
+        print(f"Error fetching photo: {e}")
+        return None
 
 async def fetch_menu_from_search(restaurant_name: str, query: str = None, num: int = 10) -> str:
     """
@@ -80,37 +80,37 @@ async def fetch_menu_from_search(restaurant_name: str, query: str = None, num: i
     if not GOOGLE_API_KEY or not SEARCH_ENGINE_ID:
         return "Google Search API not configured."
 
-    async with httpx.AsyncClient() as client:
-        url = "https://www.googleapis.com/customsearch/v1"
+    client = get_client("google_search")
+    url = "https://www.googleapis.com/customsearch/v1"
+    
+    # Construct query if not provided
+    if not query:
+        query = f"{restaurant_name} 菜單 食記 推薦"
         
-        # Construct query if not provided
-        if not query:
-            query = f"{restaurant_name} 菜單 食記 推薦"
-            
-        params = {
-            "key": GOOGLE_API_KEY,
-            "cx": SEARCH_ENGINE_ID,
-            "q": query,
-            "num": min(num, 10) # API max is 10
-        }
-        try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            snippets = []
-            if "items" in data:
-                for item in data["items"]:
-                    title = item.get("title", "")
-                    snippet = item.get("snippet", "")
-                    link = item.get("link", "")
-                    snippets.append(f"Title: {title}\nSnippet: {snippet}\nLink: {link}\n")
-            
-            return "\n".join(snippets) if snippets else "No menu information found."
-            
-        except Exception as e:
-            print(f"Error fetching menu from search: {e}")
-            return f"Error fetching menu: {str(e)}"
+    params = {
+        "key": GOOGLE_API_KEY,
+        "cx": SEARCH_ENGINE_ID,
+        "q": query,
+        "num": min(num, 10) # API max is 10
+    }
+    try:
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        
+        snippets = []
+        if "items" in data:
+            for item in data["items"]:
+                title = item.get("title", "")
+                snippet = item.get("snippet", "")
+                link = item.get("link", "")
+                snippets.append(f"Title: {title}\nSnippet: {snippet}\nLink: {link}\n")
+        
+        return "\n".join(snippets) if snippets else "No menu information found."
+        
+    except Exception as e:
+        print(f"Error fetching menu from search: {e}")
+        return f"Error fetching menu: {str(e)}"
 
 async def fetch_place_autocomplete(input_text: str) -> list:
     """
@@ -119,30 +119,30 @@ async def fetch_place_autocomplete(input_text: str) -> list:
     if not GOOGLE_API_KEY:
         return []
 
-    async with httpx.AsyncClient() as client:
-        url = "https://maps.googleapis.com/maps/api/place/autocomplete/json"
-        params = {
-            "input": input_text,
-            "key": GOOGLE_API_KEY,
-            "language": "zh-TW",
-            "types": "establishment"  # Limit to businesses
-        }
-        try:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            suggestions = []
-            if "predictions" in data:
-                for prediction in data["predictions"]:
-                    suggestions.append({
-                        "description": prediction["description"],
-                        "place_id": prediction["place_id"],
-                        "main_text": prediction["structured_formatting"]["main_text"],
-                        "secondary_text": prediction["structured_formatting"].get("secondary_text", "")
-                    })
-            return suggestions
-            
-        except Exception as e:
-            print(f"Error fetching autocomplete suggestions: {e}")
-            return []
+    client = get_client("google_maps")
+    url = "https://maps.googleapis.com/maps/api/place/autocomplete/json"
+    params = {
+        "input": input_text,
+        "key": GOOGLE_API_KEY,
+        "language": "zh-TW",
+        "types": "establishment"  # Limit to businesses
+    }
+    try:
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        
+        suggestions = []
+        if "predictions" in data:
+            for prediction in data["predictions"]:
+                suggestions.append({
+                    "description": prediction["description"],
+                    "place_id": prediction["place_id"],
+                    "main_text": prediction["structured_formatting"]["main_text"],
+                    "secondary_text": prediction["structured_formatting"].get("secondary_text", "")
+                })
+        return suggestions
+        
+    except Exception as e:
+        print(f"Error fetching autocomplete suggestions: {e}")
+        return []
@@ -0,0 +1,141 @@
+"""
+Hard Filter - preference constraints compiled to bitmasks
+Preferences are compiled once per request; each dish is then one bitwise test on
+DishAttributes.filter_mask plus a price comparison
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from schemas.allergens import SPICY, VEGAN, BEEF, PORK, SEAFOOD, ALLERGEN_BITS, ALLERGEN_MASK, normalize_allergens
+from schemas.recommendation import UserInputV2
+from schemas.restaurant_profile import DishAttributes, MenuItem
+from services.pipeline.menu_matrix import MenuMatrix
+
+# Preference keyword -> (bits that must be clear, bits that must be set)
+PREFERENCE_CONSTRAINTS: Dict[str, Tuple[int, int]] = {
+    **{p: (SPICY, 0) for p in ("no_spicy", "not_spicy", "不辣", "微辣")},
+    **{p: (BEEF, 0) for p in ("no_beef", "不吃牛", "不要牛肉")},
+    **{p: (PORK, 0) for p in ("no_pork", "不吃豬", "不要豬肉")},
+    **{p: (SEAFOOD, 0) for p in ("no_seafood", "不吃海鮮", "不要海鮮")},
+    **{p: (0, VEGAN) for p in ("vegan", "素食", "全素")},
+}
+
+# Dish-name keywords per attribute bit, for candidates without analysis data
+NAME_KEYWORDS: Dict[int, Tuple[str, ...]] = {
+    SPICY: ("辣", "spicy", "chili"),
+    BEEF: ("牛", "beef"),
+    PORK: ("豬", "pork", "bacon", "ham"),
+    SEAFOOD: ("魚", "蝦", "蟹", "貝", "蚵", "蛤", "魷", "花枝", "海鮮", "fish", "shrimp", "crab", "seafood"),
+}
+# A dish whose name contains one of these is not vegan
+MEAT_NAME_KEYWORDS = ("肉", "雞", "鴨", "鵝", "牛", "豬", "羊", "魚", "蝦", "蟹", "蛋",
+                      "chicken", "duck", "beef", "pork", "lamb", "fish", "shrimp", "egg")
+
+ALLERGY_KEYWORDS = ("allergy", "allergic", "過敏")
+_ALLERGY_WORDS = re.compile(r"allergic\s+to|allergy\s+to|allergies|allergy|allergic|過敏|對", re.IGNORECASE)
+
+
+class CompiledHardFilter:
+    """Constraints of one request: forbidden bits, required bits, price cap, unknown allergen terms"""
+
+    def __init__(self, forbidden: int, required: int, max_price: Optional[int], unknown_allergens: Tuple[str, ...]):
+        self.forbidden = forbidden
+        self.required = required
+        self.max_price = max_price
+        # Allergies outside the vocabulary fall back to substring checks on the dish's allergen strings
+        self.unknown_allergens = unknown_allergens
+
+    @property
+    def has_attribute_constraints(self) -> bool:
+        return bool(self.forbidden or self.required or self.unknown_allergens)
+
+    def allows(self, item: MenuItem) -> bool:
+        """Single-item form of apply()"""
+        analysis = item.analysis
+        if analysis is not None and self.has_attribute_constraints and not self._analysis_allowed(analysis):
+            return False
+        return not (self.max_price and item.price and item.price > self.max_price)
+
+    def diet_allows(self, dish: Any) -> bool:
+        """
+        Dietary/allergen constraints only (no price cap) for a MenuItem or a candidate dict
+        ({"dish_name"/"name", "analysis"?}); dishes without analysis data are checked by name keywords
+        """
+        if not self.has_attribute_constraints:
+            return True
+        if isinstance(dish, MenuItem):
+            analysis, name = dish.analysis, dish.name
+        else:
+            analysis, name = dish.get("analysis"), dish.get("dish_name") or dish.get("name") or ""
+            if isinstance(analysis, dict):
+                analysis = DishAttributes(**analysis)
+        if analysis is not None:
+            return self._analysis_allowed(analysis)
+
+        name = name.lower()
+        for bit, keywords in NAME_KEYWORDS.items():
+            if self.forbidden & bit and any(keyword in name for keyword in keywords):
+                return False
+        if self.required & VEGAN and any(keyword in name for keyword in MEAT_NAME_KEYWORDS):
+            return False
+        if self.forbidden & ALLERGEN_MASK and any(self.forbidden & ALLERGEN_BITS[a] for a in normalize_allergens(name)):
+            return False
+        return not any(term in name for term in self.unknown_allergens)
+
+    def _analysis_allowed(self, analysis: DishAttributes) -> bool:
+        mask = analysis.filter_mask
+        if mask & self.forbidden or mask & self.required != self.required:
+            return False
+        return not (self.unknown_allergens and any(
+            term in allergen.lower() for term in self.unknown_allergens for allergen in analysis.allergens
+        ))
+
+    def apply(self, menu_items: List[MenuItem]) -> Tuple[List[MenuItem], Dict[str, int]]:
+        """Filtered items (menu order) and rejection counts by reason"""
+        return self.apply_matrix(MenuMatrix(menu_items))
+
+    def apply_matrix(self, matrix: MenuMatrix) -> Tuple[List[MenuItem], Dict[str, int]]:
+        """apply() over an already built (e.g. cached per profile) MenuMatrix"""
+        columns = matrix.hard_filter(self.forbidden, self.required, self.max_price, self.unknown_allergens)
+        menu_items = matrix.menu_items
+        kept = [menu_items[row] for row in np.flatnonzero(columns["allowed"])]
+        rejected = {reason: int(columns[reason].sum()) for reason in ("attributes", "allergens", "budget")}
+        return kept, rejected
+
+
+@lru_cache(maxsize=1024)
+def _compile_preferences(preferences: Tuple[str, ...]) -> Tuple[int, int, Tuple[str, ...]]:
+    forbidden = required = 0
+    unknown = []
+    for pref in preferences:
+        pref_lower = pref.lower()
+        clear_bits, set_bits = PREFERENCE_CONSTRAINTS.get(pref_lower, (0, 0))
+        forbidden |= clear_bits
+        required |= set_bits
+
+        if any(keyword in pref_lower for keyword in ALLERGY_KEYWORDS):
+            allergens = normalize_allergens(pref_lower)
+            for name in allergens:
+                forbidden |= ALLERGEN_BITS[name]
+            if not allergens:
+                # e.g. "allergic to kiwi" -> "kiwi"
+                term = _ALLERGY_WORDS.sub(" ", pref_lower).strip()
+                if term:
+                    unknown.append(term)
+    return forbidden, required, tuple(unknown)
+
+
+def compile_hard_filter(user_input: UserInputV2) -> CompiledHardFilter:
+    """Compile the request's preferences and budget into a CompiledHardFilter"""
+    forbidden, required, unknown = _compile_preferences(tuple(user_input.preferences))
+
+    max_price = None
+    if user_input.budget and user_input.budget.type in ("Per_Person", "Total"):
+        # Per person: no single dish above the per-person amount; total: none above the total
+        max_price = user_input.budget.amount
+
+    return CompiledHardFilter(forbidden, required, max_price, unknown)
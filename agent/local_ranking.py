@@ -0,0 +1,186 @@
+"""
+Local Ranking - deterministic dish selection without an LLM call
+Review-derived scores, occasion fit, category diversity, balance must-haves and
+budget fitting over the profile's MenuMatrix; reasons come from templates
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from schemas.allergens import SPICY
+from schemas.recommendation import UserInputV2
+from schemas.restaurant_profile import MenuItem
+from services.pipeline.menu_matrix import MenuMatrix, OCCASION_TAG_BITS
+
+# Score adjustments on top of the canonical review score (MenuMatrix.scores)
+OCCASION_MATCH_BONUS = 4.0
+SIGNATURE_BONUS = 2.0
+ALL_SIGNATURES_BONUS = 8.0
+LIGHT_BONUS = 4.0
+FRIED_PENALTY = 4.0
+SPICY_PREFERENCE_BONUS = 3.0
+# Subtracted per dish already picked from the same category
+CATEGORY_REPEAT_PENALTY = 5.0
+
+# UserInputV2.occasion -> suitable_occasions tags that fit it
+OCCASION_TAGS: Dict[str, Tuple[str, ...]] = {
+    "friends": ("group_share", "alcohol_pairing"),
+    "family": ("family", "group_share"),
+    "date": ("date",),
+    "business": ("business",),
+}
+
+OCCASION_LABELS = {
+    "friends": "朋友聚餐",
+    "family": "家庭聚餐",
+    "date": "約會",
+    "business": "商務聚餐",
+    "fitness": "健身減脂",
+    "all_signatures": "招牌全制霸",
+}
+
+SPICY_PREFERENCES = ("spicy", "辣", "要辣", "愛吃辣")
+
+
+def target_dish_count(user_input: UserInputV2) -> int:
+    """Dish count: explicit target, else 1.5 per person for shared (min 3), 1 per person otherwise"""
+    if user_input.dish_count_target:
+        return user_input.dish_count_target
+    if user_input.dining_style == "Shared":
+        return max(3, int(user_input.party_size * 1.5))
+    return user_input.party_size
+
+
+def total_budget(user_input: UserInputV2) -> Optional[int]:
+    """Budget for the whole order, None if unbounded"""
+    budget = user_input.budget
+    if not budget or not budget.amount:
+        return None
+    if budget.type == "Per_Person":
+        return budget.amount * user_input.party_size
+    return budget.amount
+
+
+def _adjusted_scores(matrix: MenuMatrix, user_input: UserInputV2) -> np.ndarray:
+    scores = matrix.scores.copy()
+    occasion = user_input.occasion
+
+    if occasion == "all_signatures":
+        scores += ALL_SIGNATURES_BONUS * matrix.is_signature
+    else:
+        scores += SIGNATURE_BONUS * matrix.is_signature
+
+    tag_mask = 0
+    for tag in OCCASION_TAGS.get(occasion, ()):
+        tag_mask |= OCCASION_TAG_BITS[tag]
+    if tag_mask:
+        scores += OCCASION_MATCH_BONUS * ((matrix.occasion_mask & tag_mask) != 0)
+
+    if occasion == "fitness":
+        scores += LIGHT_BONUS * matrix.is_light - FRIED_PENALTY * matrix.is_fried
+
+    if any(pref.lower() in SPICY_PREFERENCES for pref in user_input.preferences):
+        scores += SPICY_PREFERENCE_BONUS * ((matrix.filter_mask & SPICY) != 0)
+
+    return scores
+
+
+def select_dishes(matrix: MenuMatrix, rows: np.ndarray, user_input: UserInputV2) -> List[int]:
+    """
+    Pick rows for the order, best first
+
+    Shared meals first take the best vegetable dish, and a soup for 4+ people
+    (the BalanceCheckerAgent rules), then fill greedily by adjusted score minus
+    a penalty per dish already taken from the same category. A dish is only
+    taken if the rest of the order can still be filled within the budget with
+    the cheapest remaining dish. Ties go to menu order.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        return []
+
+    target = min(target_dish_count(user_input), len(rows))
+    budget = total_budget(user_input)
+    scores = _adjusted_scores(matrix, user_input)[rows]
+    prices = matrix.price[rows]
+    codes = matrix.category_codes[rows]
+    available = np.ones(len(rows), dtype=bool)
+    category_counts = np.zeros(len(matrix.categories), dtype=np.int64)
+    picked: List[int] = []
+    spent = 0
+
+    def take(candidates: np.ndarray) -> bool:
+        nonlocal spent
+        mask = available & candidates
+        if budget is not None:
+            slots_after = target - len(picked) - 1
+            others = prices[available & (prices > 0)]
+            reserve = int(others.min()) * slots_after if slots_after > 0 and len(others) else 0
+            mask &= prices <= budget - spent - reserve
+        if not mask.any():
+            return False
+        adjusted = np.where(mask, scores - CATEGORY_REPEAT_PENALTY * category_counts[codes], -np.inf)
+        best = int(np.argmax(adjusted))  # First maximum: menu order on ties
+        available[best] = False
+        category_counts[codes[best]] += 1
+        spent += int(prices[best])
+        picked.append(best)
+        return True
+
+    if user_input.dining_style == "Shared":
+        take(matrix.is_vegetable[rows])
+        if user_input.party_size >= 4 and len(picked) < target:
+            take(matrix.is_soup[rows])
+
+    everything = np.ones(len(rows), dtype=bool)
+    while len(picked) < target and take(everything):
+        pass
+
+    # Present in score order rather than pick order
+    picked.sort(key=lambda i: (-scores[i], i))
+    return [int(rows[i]) for i in picked]
+
+
+def dish_reason(item: MenuItem, user_input: UserInputV2) -> str:
+    """Template reason from signature/popularity flags, occasion fit and review evidence"""
+    tags = []
+    analysis = item.analysis
+    if analysis and analysis.is_signature:
+        tags.append("招牌菜")
+    if item.is_popular:
+        tags.append("人氣必點")
+    if analysis and user_input.occasion in OCCASION_TAGS and set(OCCASION_TAGS[user_input.occasion]) & {
+        tag.lower() for tag in analysis.suitable_occasions
+    }:
+        tags.append(f"適合{OCCASION_LABELS[user_input.occasion]}")
+
+    evidence = None
+    if analysis and analysis.highlight_review:
+        evidence = f"網友說「{analysis.highlight_review}」"
+    elif item.ai_insight and item.ai_insight.mention_count > 0 and item.ai_insight.summary:
+        evidence = f"{item.ai_insight.mention_count} 則評論提到：{item.ai_insight.summary}"
+    elif item.description:
+        evidence = item.description
+
+    if tags and evidence:
+        return f"{'、'.join(tags)}，{evidence}"
+    if tags:
+        return "、".join(tags)
+    if evidence:
+        return evidence
+    return f"{item.category or '同類型'}的推薦菜色"
+
+
+def summarize(items: List[MenuItem], user_input: UserInputV2, total_price: int) -> str:
+    """One-line summary of the local selection"""
+    categories = []
+    for item in items:
+        if item.category not in categories:
+            categories.append(item.category)
+    occasion = OCCASION_LABELS.get(user_input.occasion)
+    basis = f"評論熱度與{occasion}情境" if occasion else "評論熱度"
+    return (
+        f"依{basis}為 {user_input.party_size} 人挑選 {len(items)} 道菜"
+        f"（{'、'.join(categories)}），合計 ${total_price}。"
+    )
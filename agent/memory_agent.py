@@ -17,6 +17,8 @@ from datetime import datetime
 from google.cloud import firestore
 from dataclasses import dataclass
 
+from services.firestore_async import run_firestore
+
 @dataclass
 class DishMemory:
     """Represents a memory about a specific dish"""
@@ -60,7 +62,7 @@ class MemoryAgent:
         try:
             # Fetch user memory document
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await run_firestore(doc_ref.get)
             
             if not doc.exists:
                 return ""
@@ -187,7 +189,7 @@ class MemoryAgent:
                 update_data['rejected_dishes'] = firestore.ArrayUnion(rejected_entries)
             
             # Save to Firestore
-            doc_ref.set(update_data, merge=True)
+            await run_firestore(doc_ref.set, update_data, merge=True)
             
             print(f"✓ Saved feedback for user {user_id}")
             return True
@@ -220,7 +222,7 @@ class MemoryAgent:
             doc_ref = self.db.collection(self.collection).document(user_id)
             
             # Update occasion preferences
-            doc_ref.set({
+            await run_firestore(doc_ref.set, {
                 f'occasion_preferences.{occasion}': preference_updates,
                 'last_updated': firestore.SERVER_TIMESTAMP
             }, merge=True)
@@ -254,7 +256,7 @@ class MemoryAgent:
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
             
-            doc_ref.set({
+            await run_firestore(doc_ref.set, {
                 'general_preferences': preferences,
                 'last_updated': firestore.SERVER_TIMESTAMP
             }, merge=True)
@@ -281,7 +283,7 @@ class MemoryAgent:
         
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc_ref.delete()
+            await run_firestore(doc_ref.delete)
             
             print(f"✓ Cleared all memory for user {user_id}")
             return True
@@ -305,7 +307,7 @@ class MemoryAgent:
         
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await run_firestore(doc_ref.get)
             
             if not doc.exists:
                 return {
@@ -360,7 +362,7 @@ class MemoryAgent:
         
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await run_firestore(doc_ref.get)
             
             timestamp = datetime.now()
             
@@ -423,7 +425,7 @@ class MemoryAgent:
             budget_patterns[occasion]['max'] = max(budget_patterns[occasion]['max'], budget_spent)
             
             # Save updated data
-            doc_ref.set({
+            await run_firestore(doc_ref.set, {
                 'restaurant_history': restaurant_history,
                 'cuisine_preferences': cuisine_prefs,
                 'budget_patterns': budget_patterns,
@@ -461,7 +463,7 @@ class MemoryAgent:
         
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await run_firestore(doc_ref.get)
             
             data = doc.to_dict() if doc.exists else {}
             patterns = data.get('dining_patterns', {
@@ -490,7 +492,7 @@ class MemoryAgent:
             patterns['frequent_occasions'] = [occ for occ, _ in sorted_occasions[:3]]
             
             # Save
-            doc_ref.set({
+            await run_firestore(doc_ref.set, {
                 'dining_patterns': patterns,
                 'last_updated': firestore.SERVER_TIMESTAMP
             }, merge=True)
@@ -517,7 +519,7 @@ class MemoryAgent:
         
         try:
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await run_firestore(doc_ref.get)
             
             if not doc.exists:
                 return []
@@ -559,7 +561,7 @@ class MemoryAgent:
             
             # Get additional context
             doc_ref = self.db.collection(self.collection).document(user_id)
-            doc = doc_ref.get()
+            doc = await run_firestore(doc_ref.get)
             
             if not doc.exists:
                 return basic_memory
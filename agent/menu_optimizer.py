@@ -0,0 +1,317 @@
+"""
+Menu Optimizer - budget-aware dish selection as a grouped knapsack
+Picks the highest-utility set of candidate dishes under a total budget, a dish
+count range and per-group minimums/maximums (soup, vegetable, staple, ...),
+with quantities fixed by the party-size portion rules. Exact over price
+buckets, so a feasible menu comes back in milliseconds without an LLM round.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.local_ranking import total_budget
+from schemas.recommendation import UserInputV2
+from services.pipeline.menu_matrix import (
+    SOUP_CATEGORY_KEYWORDS, STAPLE_CATEGORY_KEYWORDS, STAPLE_NAME_KEYWORDS,
+    VEGETABLE_CATEGORY_KEYWORDS, VEGETABLE_NAME_KEYWORDS,
+)
+
+# Budget resolution: prices are rounded up to this many buckets of the budget
+PRICE_BUCKETS = 256
+
+DESSERT_KEYWORDS = ("甜點", "甜品", "dessert", "dolci")
+DRINK_KEYWORDS = ("飲料", "飲品", "drink", "beverage", "茶飲")
+SIDE_KEYWORDS = ("冷菜", "前菜", "配菜", "開胃菜", "小菜", "side", "appetizer")
+
+STATUS_UTILITY = {"must order": 3.0, "recommended": 2.0, "standard": 1.0}
+SIGNATURE_TAGS = ("signature", "centerpiece", "招牌", "必點", "主秀")
+
+
+@dataclass
+class MenuCandidate:
+    """One dish the optimizer may pick; quantity is fixed, price is per portion"""
+    name: str
+    price: int
+    category: str
+    group: str
+    utility: float
+    quantity: int = 1
+    data: Any = None  # Original candidate (dict), returned with the selection
+
+    @property
+    def cost(self) -> int:
+        return self.price * self.quantity
+
+
+@dataclass
+class MenuConstraints:
+    """Total budget (None = unbounded), dish count range and per-group count limits"""
+    budget: Optional[int]
+    min_dishes: int
+    max_dishes: int
+    group_min: Dict[str, int] = field(default_factory=dict)
+    group_max: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class OptimizedMenu:
+    """Selected candidates (input order), totals, and which constraints had to be dropped"""
+    selected: List[MenuCandidate]
+    total_price: int
+    utility: float
+    feasible: bool
+    relaxed: List[str] = field(default_factory=list)
+
+
+def dish_group(category: str, name: str) -> str:
+    """Balance group of a dish, from the same keywords as BalanceCheckerAgent"""
+    category = (category or "").lower()
+    name = (name or "").lower()
+    if any(k in category for k in SOUP_CATEGORY_KEYWORDS):
+        return "soup"
+    if any(k in category for k in VEGETABLE_CATEGORY_KEYWORDS) or any(k in name for k in VEGETABLE_NAME_KEYWORDS):
+        return "vegetable"
+    if any(k in category for k in DESSERT_KEYWORDS):
+        return "dessert"
+    if any(k in category for k in DRINK_KEYWORDS):
+        return "drink"
+    if any(k in category for k in STAPLE_CATEGORY_KEYWORDS) or any(k in name for k in STAPLE_NAME_KEYWORDS):
+        return "staple"
+    if any(k in category for k in SIDE_KEYWORDS):
+        return "side"
+    return "main"
+
+
+def portion_quantity(group: str, dining_style: str, party_size: int) -> int:
+    """Portions to order (prompt_builder section 8: Quantity Calculation)"""
+    if dining_style != "Shared":
+        return party_size
+    if group in ("staple", "drink"):
+        return party_size
+    if group in ("side", "dessert"):
+        return math.ceil(party_size / 2)
+    return 1
+
+
+def parse_price(value: Any) -> Optional[int]:
+    """Integer price from an int/float or a string like "$180" / "NT$1,200"; None if unknown"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value > 0 else None
+    digits = re.findall(r"\d+", str(value).replace(",", ""))
+    return int(digits[0]) if digits else None
+
+
+def candidate_utility(dish: Dict[str, Any], occasion: Optional[str] = None) -> Optional[float]:
+    """
+    Utility of a candidate dict (aggregator output or a MenuItem dump); None for dishes to avoid
+    Every dish is worth at least a little, so spare budget buys more food
+    """
+    status = str(dish.get("status") or "").lower()
+    if status == "avoid":
+        return None
+    utility = 0.5 + STATUS_UTILITY.get(status, 1.0)
+
+    signature_weight = 4.0 if occasion == "all_signatures" else 2.0
+    tag = str(dish.get("tag") or "").lower()
+    analysis = dish.get("analysis") or {}
+    if any(t in tag for t in SIGNATURE_TAGS) or analysis.get("is_signature"):
+        utility += signature_weight
+
+    confidence = dish.get("confidence_score") or dish.get("confidence")
+    if isinstance(confidence, (int, float)):
+        utility += confidence / 100.0
+    if dish.get("is_popular"):
+        utility += 2.0
+    if dish.get("is_risky"):
+        utility -= 1.0
+    utility += float(analysis.get("sentiment_score") or 0.0)
+    insight = dish.get("ai_insight") or {}
+    utility += min(insight.get("mention_count") or 0, 5) * 0.2
+    return max(utility, 0.1)
+
+
+def build_candidates(pool: Sequence[Any], user_input: UserInputV2) -> List[MenuCandidate]:
+    """
+    MenuCandidates from the orchestrator's candidate pool (dicts or MenuItem models)
+    Dishes without a usable price are costed at the pool's median price
+    """
+    dishes = []
+    for raw in pool:
+        dish = raw.model_dump() if hasattr(raw, "model_dump") else dict(raw)
+        name = dish.get("dish_name") or dish.get("name")
+        if not name:
+            continue
+        dishes.append((name, dish))
+
+    known = sorted(p for p in (parse_price(d.get("price")) for _, d in dishes) if p)
+    fallback_price = known[len(known) // 2] if known else 0
+
+    candidates = []
+    seen = set()
+    for name, dish in dishes:
+        if name in seen:
+            continue
+        utility = candidate_utility(dish, user_input.occasion)
+        if utility is None:
+            continue
+        seen.add(name)
+        category = dish.get("category") or "其他"
+        group = dish_group(category, name)
+        candidates.append(MenuCandidate(
+            name=name,
+            price=parse_price(dish.get("price")) or fallback_price,
+            category=category,
+            group=group,
+            utility=utility,
+            quantity=portion_quantity(group, user_input.dining_style, user_input.party_size),
+            data=dish,
+        ))
+    return candidates
+
+
+def constraints_for(user_input: UserInputV2, candidates: Sequence[MenuCandidate]) -> MenuConstraints:
+    """
+    Constraints from the request (same rules the agents' prompts describe):
+    shared meals take party_size+1 .. party_size+3 dishes (+4 for all_signatures)
+    with a vegetable, a soup for 4+ people, and at most one staple/soup/dessert/drink;
+    individual meals take one to three dishes per person, at least one main
+    """
+    n = user_input.party_size
+
+    groups = {c.group for c in candidates}
+    group_min: Dict[str, int] = {}
+    if user_input.dining_style == "Shared":
+        min_dishes, max_dishes = n + 1, n + (4 if user_input.occasion == "all_signatures" else 3)
+        group_max = {"soup": 1, "staple": 1, "dessert": 1, "drink": 1}
+        if user_input.occasion != "all_signatures":
+            if "vegetable" in groups:
+                group_min["vegetable"] = 1
+            if n >= 4 and "soup" in groups:
+                group_min["soup"] = 1
+    else:
+        min_dishes, max_dishes = 1, 3
+        group_max = {"soup": 1, "staple": 1, "dessert": 1, "drink": 1}
+        if "main" in groups:
+            group_min["main"] = 1
+
+    if user_input.dish_count_target:
+        min_dishes = max_dishes = user_input.dish_count_target
+
+    return MenuConstraints(budget=total_budget(user_input), min_dishes=min_dishes, max_dishes=max_dishes,
+                           group_min=group_min, group_max=group_max)
+
+
+def _solve(candidates: Sequence[MenuCandidate], constraints: MenuConstraints) -> Optional[Tuple[List[int], float]]:
+    """Exact grouped knapsack over (dish count, price bucket); None if infeasible"""
+    max_k = min(constraints.max_dishes, len(candidates))
+    if constraints.min_dishes > max_k:
+        return None
+
+    if constraints.budget is None:
+        unit, capacity = 1, 0
+        costs = [0] * len(candidates)
+    else:
+        # Round prices up, capacity down: any bucket-feasible menu is within budget
+        unit = max(1, math.ceil(constraints.budget / PRICE_BUCKETS))
+        capacity = constraints.budget // unit
+        costs = [math.ceil(c.cost / unit) for c in candidates]
+
+    by_group: Dict[str, List[int]] = {}
+    for i, candidate in enumerate(candidates):
+        if costs[i] <= capacity:
+            by_group.setdefault(candidate.group, []).append(i)
+    for group, minimum in constraints.group_min.items():
+        if len(by_group.get(group, ())) < minimum:
+            return None
+
+    # best[k, b]: max utility with k dishes costing b buckets
+    best = np.full((max_k + 1, capacity + 1), -np.inf)
+    best[0, 0] = 0.0
+    trail = []
+    for group, members in by_group.items():
+        g_max = min(constraints.group_max.get(group, max_k), len(members), max_k)
+        g_min = constraints.group_min.get(group, 0)
+        # table[j, k, b]: j dishes taken from this group so far
+        table = np.full((g_max + 1, max_k + 1, capacity + 1), -np.inf)
+        table[0] = best
+        takes = []
+        for i in members:
+            c, u = costs[i], candidates[i].utility
+            shifted = np.full_like(table, -np.inf)
+            shifted[1:, 1:, c:] = table[:-1, :-1, :capacity + 1 - c] + u
+            take = shifted > table
+            table = np.where(take, shifted, table)
+            takes.append(take)
+        window = table[g_min:]
+        counts = np.argmax(window, axis=0) + g_min
+        best = np.max(window, axis=0)
+        trail.append((members, takes, counts))
+
+    k_range = best[constraints.min_dishes:max_k + 1]
+    if not np.isfinite(k_range).any():
+        return None
+    k, b = np.unravel_index(int(np.argmax(k_range)), k_range.shape)
+    k = int(k) + constraints.min_dishes
+    b = int(b)
+    utility = float(best[k, b])
+
+    chosen = []
+    for members, takes, counts in reversed(trail):
+        j = int(counts[k, b])
+        for i, take in zip(reversed(members), reversed(takes)):
+            if j > 0 and take[j, k, b]:
+                chosen.append(i)
+                j, k, b = j - 1, k - 1, b - costs[i]
+    return sorted(chosen), utility
+
+
+def optimize_menu(candidates: Sequence[MenuCandidate], constraints: MenuConstraints) -> OptimizedMenu:
+    """
+    Best feasible menu; when none exists, group minimums, then the dish count
+    minimum are dropped (listed in `relaxed`) before giving up with an empty menu
+    """
+    relaxed: List[str] = []
+    attempts = [
+        constraints,
+        MenuConstraints(constraints.budget, constraints.min_dishes, constraints.max_dishes, {}, constraints.group_max),
+        MenuConstraints(constraints.budget, 1, constraints.max_dishes, {}, constraints.group_max),
+    ]
+    for attempt, label in zip(attempts, (None, "group_min", "min_dishes")):
+        if label:
+            relaxed.append(label)
+        solution = _solve(candidates, attempt)
+        if solution is not None:
+            rows, utility = solution
+            selected = [candidates[i] for i in rows]
+            return OptimizedMenu(
+                selected=selected,
+                total_price=sum(c.cost for c in selected),
+                utility=utility,
+                feasible=not relaxed,
+                relaxed=relaxed,
+            )
+    return OptimizedMenu(selected=[], total_price=0, utility=0.0, feasible=False, relaxed=relaxed)
+
+
+def to_menu_dicts(menu: OptimizedMenu) -> List[Dict[str, Any]]:
+    """Selected dishes in the agents' menu dict format (dish_name, price, quantity, category, tag, reason)"""
+    dishes = []
+    for candidate in menu.selected:
+        data = candidate.data or {}
+        analysis = data.get("analysis") or {}
+        signature = analysis.get("is_signature") or str(data.get("status") or "").lower() == "must order"
+        dishes.append({
+            "dish_name": candidate.name,
+            "price": candidate.price,
+            "quantity": candidate.quantity,
+            "category": candidate.category,
+            "tag": data.get("tag") or ("招牌" if signature else "Standard"),
+            "reason": data.get("reason") or data.get("description") or "",
+        })
+    return dishes
@@ -0,0 +1,220 @@
+"""
+Menu Rules - local balance and QA scoring for agent menus
+Scores the Executive Chef and Restaurant Manager checklists in code (portion
+counts per party size, cooking-method entropy, temperature mix, over-ordering,
+centerpiece) so the agents only call Gemini when a menu does not clear the
+threshold. Counts how many LLM calls were skipped.
+"""
+
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from agent.menu_optimizer import dish_group
+
+# Local score (0-1) at or above which the LLM check is skipped
+BALANCE_SKIP_THRESHOLD = float(os.getenv("LOCAL_BALANCE_SKIP_THRESHOLD", "0.75"))
+QA_SKIP_THRESHOLD = float(os.getenv("LOCAL_QA_SKIP_THRESHOLD", "0.85"))
+
+# (method, keywords) in detection order; BalanceCheckerAgent's four come first
+COOKING_METHOD_KEYWORDS = (
+    ("fried", ("炸", "fried", "酥")),
+    ("steamed", ("蒸", "steamed")),
+    ("grilled", ("烤", "grilled", "燒")),
+    ("stir-fried", ("炒", "stir-fry")),
+    ("braised", ("滷", "燉", "燜", "braised", "stewed")),
+    ("cold", ("涼拌", "沙拉", "salad")),
+    ("boiled", ("煮", "燙", "汆", "boiled")),
+)
+COLD_KEYWORDS = ("涼拌", "冷", "冰", "沙拉", "salad", "cold", "生魚片", "sashimi")
+COLD_CATEGORY_KEYWORDS = ("冷菜", "前菜", "開胃", "甜點", "甜品", "沙拉")
+CENTERPIECE_TAGS = ("必點", "招牌", "主秀", "signature", "centerpiece")
+
+_stats = {check: {"local": 0, "llm": 0} for check in ("balance", "consolidate", "qa_soft")}
+
+
+@dataclass
+class RulesReport:
+    """Local score (0-1), whether it clears the threshold, issues found and per-criterion scores"""
+    score: float
+    passed: bool
+    issues: List[str] = field(default_factory=list)
+    criteria: Dict[str, float] = field(default_factory=dict)
+
+
+def cooking_method(dish_name: str) -> str:
+    name = (dish_name or "").lower()
+    for method, keywords in COOKING_METHOD_KEYWORDS:
+        if any(word in name for word in keywords):
+            return method
+    return "unknown"
+
+
+def is_cold(dish: Dict[str, Any]) -> bool:
+    name = (dish.get("dish_name") or "").lower()
+    category = dish.get("category") or ""
+    return any(k in name for k in COLD_KEYWORDS) or any(k in category for k in COLD_CATEGORY_KEYWORDS)
+
+
+def method_entropy(methods: List[str]) -> float:
+    """Shannon entropy of the detected cooking methods, normalized to 0-1 (1 with fewer than two)"""
+    known = [m for m in methods if m != "unknown"]
+    if len(known) < 2:
+        return 1.0
+    counts = Counter(known)
+    entropy = -sum((c / len(known)) * math.log(c / len(known)) for c in counts.values())
+    return entropy / math.log(len(known))
+
+
+def analyze_menu(menu: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Menu composition: categories, groups, cooking methods, temperatures, greasy ratio"""
+    categories: Dict[str, int] = {}
+    groups: Counter = Counter()
+    methods = []
+    cold = 0
+    for dish in menu:
+        category = dish.get("category", "Unknown")
+        categories[category] = categories.get(category, 0) + 1
+        groups[dish_group(dish.get("category") or "", dish.get("dish_name") or "")] += 1
+        methods.append(cooking_method(dish.get("dish_name", "")))
+        cold += is_cold(dish)
+
+    count = len(menu)
+    return {
+        "categories": categories,
+        "dish_count": count,
+        "has_vegetable": any(
+            '蔬菜' in dish.get('category', '') or '青菜' in dish.get('dish_name', '') for dish in menu),
+        "has_soup": any('湯' in dish.get('category', '') for dish in menu),
+        "has_staple": any(
+            '主食' in dish.get('category', '') or '飯' in dish.get('dish_name', '') or '麵' in dish.get('dish_name', '')
+            for dish in menu),
+        "cooking_methods": [m for m in methods if m != "unknown"],
+        "greasy_ratio": methods.count("fried") / count if count else 0,
+        "method_entropy": method_entropy(methods),
+        "cold_dishes": cold,
+        "hot_dishes": count - cold,
+        "groups": dict(groups),
+    }
+
+
+def score_balance(menu: List[Dict[str, Any]], dining_style: str, party_size: int) -> RulesReport:
+    """
+    Executive Chef checklist for shared meals (individual meals are not balance-checked):
+    vegetable 0.2, soup for 4+ people 0.15, dish count 0.2, grease 0.15,
+    staple/dessert counts 0.1, cooking-method entropy 0.1, hot/cold mix 0.1.
+    A missing vegetable or too few dishes never passes, whatever the score.
+    """
+    analysis = analyze_menu(menu)
+    if dining_style != "Shared":
+        return RulesReport(score=1.0, passed=True, criteria={"individual": 1.0})
+
+    issues = []
+    criteria = {}
+    count = analysis["dish_count"]
+    groups = analysis["groups"]
+
+    criteria["vegetable"] = 0.2 if analysis["has_vegetable"] else 0.0
+    if not analysis["has_vegetable"]:
+        issues.append("缺少蔬菜類菜品")
+
+    criteria["soup"] = 0.15 if analysis["has_soup"] or party_size < 4 else 0.0
+    if not criteria["soup"]:
+        issues.append("建議加入湯品（4人以上聚餐）")
+
+    criteria["dish_count"] = 0.2 * min(1.0, count / (party_size + 1))
+    if count < party_size + 1:
+        issues.append(f"菜數不足（建議至少 {party_size + 1} 道）")
+
+    greasy = analysis["greasy_ratio"]
+    criteria["grease"] = 0.15 * (1.0 - min(1.0, max(0.0, greasy - 0.5) * 2))
+    if greasy > 0.5:
+        issues.append("油炸/油膩菜品比例過高（> 50%），建議加入清爽/酸味菜品")
+
+    # One staple dish per 4 people, one dessert per 3 (at least one each)
+    staple_ok = groups.get("staple", 0) <= max(1, party_size // 4)
+    dessert_ok = groups.get("dessert", 0) <= max(1, party_size // 3)
+    criteria["portions"] = 0.05 * staple_ok + 0.05 * dessert_ok
+    if not staple_ok:
+        issues.append("主食種類過多")
+    if not dessert_ok:
+        issues.append("甜點種類過多")
+
+    criteria["cooking_methods"] = 0.1 * analysis["method_entropy"]
+    if analysis["method_entropy"] < 0.5:
+        issues.append("烹調方式過於單一")
+
+    mixed = analysis["cold_dishes"] > 0 and analysis["hot_dishes"] > 0
+    criteria["temperature"] = 0.1 if mixed or count < 4 else 0.05
+    if criteria["temperature"] < 0.1:
+        issues.append("建議冷熱菜搭配")
+
+    blocking = not analysis["has_vegetable"] or count < party_size + 1
+    score = round(sum(criteria.values()), 4)
+    return RulesReport(score=score, passed=not blocking and score >= BALANCE_SKIP_THRESHOLD,
+                       issues=issues, criteria=criteria)
+
+
+def score_quality(menu: List[Dict[str, Any]], user_input, hard_checks: Dict[str, Any]) -> RulesReport:
+    """
+    Restaurant Manager checklist: per-head unit items 0.4, over-ordering 0.2,
+    centerpiece for business 0.2, code hard checks 0.2
+    """
+    n = user_input.party_size
+    issues = []
+    criteria = {}
+
+    # Staples/drinks: party size +/- 1; desserts: at least one per two people
+    unit_dishes = []
+    for dish in menu:
+        group = dish_group(dish.get("category") or "", dish.get("dish_name") or "")
+        quantity = dish.get("quantity", 0) or 0
+        if group in ("staple", "drink"):
+            ok = abs(quantity - n) <= 1
+        elif group == "dessert":
+            ok = quantity >= math.ceil(n / 2)
+        else:
+            continue
+        unit_dishes.append(ok)
+        if not ok:
+            issues.append(f"{dish.get('dish_name')} 份數 {quantity} 與 {n} 人不符")
+    criteria["per_head"] = 0.4 * (sum(unit_dishes) / len(unit_dishes) if unit_dishes else 1.0)
+
+    limit = n + (4 if user_input.occasion == "all_signatures" else 3)
+    if n == 1 and user_input.dining_style != "Shared":
+        limit = 3
+    criteria["portion_size"] = 0.2 if len(menu) <= limit else 0.0
+    if len(menu) > limit:
+        issues.append(f"菜數 {len(menu)} 道對 {n} 人過多")
+
+    has_centerpiece = any(
+        any(tag in str(dish.get("tag") or "").lower() for tag in CENTERPIECE_TAGS) for dish in menu)
+    criteria["occasion"] = 0.2 if user_input.occasion != "business" or has_centerpiece else 0.0
+    if not criteria["occasion"]:
+        issues.append("商務聚餐缺少主秀菜色")
+
+    criteria["hard_checks"] = 0.2 if hard_checks.get("all_passed") else 0.0
+
+    score = round(sum(criteria.values()), 4)
+    return RulesReport(score=score, passed=score >= QA_SKIP_THRESHOLD, issues=issues, criteria=criteria)
+
+
+def record(check: str, skipped_llm: bool):
+    """Count one check as decided locally (no LLM call) or sent to the LLM"""
+    _stats[check]["local" if skipped_llm else "llm"] += 1
+
+
+def get_rules_stats() -> Dict[str, Any]:
+    """LLM calls skipped by the local rules, per check"""
+    stats = {}
+    for check, counts in _stats.items():
+        total = counts["local"] + counts["llm"]
+        stats[check] = {
+            "skipped_llm_calls": counts["local"],
+            "llm_calls": counts["llm"],
+            "skip_rate": counts["local"] / total if total else 0.0,
+        }
+    stats["thresholds"] = {"balance": BALANCE_SKIP_THRESHOLD, "qa": QA_SKIP_THRESHOLD}
+    return stats
@@ -6,10 +6,66 @@ Implements Hard Filter (Python) + Soft Ranking (LLM) for dish recommendations
 import os
 import json
 import time
+import hashlib
+import re
 import google.generativeai as genai
-from typing import List, Optional, Dict
+import numpy as np
+from typing import Any, List, Optional, Dict
 from schemas.recommendation import UserInputV2, RecommendationResponseV2, DishSlotResponse, MenuItemV2
 from schemas.restaurant_profile import RestaurantProfile, MenuItem
+from services import llm_gateway
+from services.memory_cache import BoundedTTLCache
+from services.single_flight import SingleFlight
+from services.pipeline.matching import DishNameIndex
+from agent.hard_filter import compile_hard_filter
+from services.pipeline.rankings import ranked_alternatives
+from services.pipeline.menu_matrix import MenuMatrix, get_menu_matrix
+from agent import local_ranking
+
+# Result cache: identical requests against the same profile version reuse a recent ranking
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "600"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "512"))
+# Personalized requests (user_id set) bypass the cache unless this is turned off
+RESULT_CACHE_SKIP_PERSONALIZED = os.getenv("RECOMMENDATION_CACHE_SKIP_PERSONALIZED", "true").lower() in ("true", "1", "yes")
+
+# Default ranking mode when the request does not set one: llm, local or auto
+RANKING_MODE = os.getenv("RECOMMENDATION_RANKING_MODE", "llm").lower()
+
+_result_cache = BoundedTTLCache("recommendation_results", max_entries=RESULT_CACHE_MAX_ENTRIES, default_ttl=RESULT_CACHE_TTL_SECONDS)
+_result_flights = SingleFlight("recommendation")
+_result_cache_bypassed = {"personalized": 0}
+
+
+def recommendation_cache_key(user_input: UserInputV2, profile: RestaurantProfile) -> str:
+    """
+    Canonical cache key: the request fields that shape the result plus the profile version.
+    Preferences are order/case-insensitive and free text is whitespace-normalized;
+    user_id and other metadata are not part of the key.
+    """
+    natural_input = re.sub(r"\s+", " ", user_input.natural_input or "").strip()
+    canonical = {
+        "place_id": profile.place_id,
+        "profile_updated_at": profile.updated_at.isoformat() if profile.updated_at else None,
+        "dining_style": user_input.dining_style,
+        "party_size": user_input.party_size,
+        "budget": user_input.budget.model_dump(mode="json") if user_input.budget else None,
+        "dish_count_target": user_input.dish_count_target,
+        "preferences": sorted({p.strip().lower() for p in user_input.preferences if p.strip()}),
+        "natural_input": natural_input,
+        "occasion": user_input.occasion,
+        "language": user_input.language,
+    }
+    encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def get_result_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the recommendation result cache"""
+    return {
+        **_result_cache.stats(),
+        "bypassed_personalized": _result_cache_bypassed["personalized"],
+        "coalesced": _result_flights.stats(),
+    }
 
 
 class RecommendationService:
@@ -25,6 +81,8 @@ class RecommendationService:
             raise ValueError("GEMINI_API_KEY environment variable not set")
 
         genai.configure(api_key=self.api_key)
+        # Set when the LLM ranking failed and heuristics were used (such results are not cached)
+        self.used_fallback = False
 
     async def generate_recommendation(
         self,
@@ -40,13 +98,60 @@ class RecommendationService:
 
         Returns:
             RecommendationResponseV2 with recommended dishes
+
+        Results are served from the result cache when the same request was answered
+        recently for the same profile version (each copy gets a fresh recommendation_id).
+        Local-mode results are computed directly and never cached.
+        """
+        if self._resolve_ranking_mode(user_input) == "local":
+            return await self._generate_uncached(user_input, profile, ranking_mode="local")
+
+        if user_input.user_id and RESULT_CACHE_SKIP_PERSONALIZED:
+            _result_cache_bypassed["personalized"] += 1
+            return await self._generate_uncached(user_input, profile)
+
+        key = recommendation_cache_key(user_input, profile)
+        cached = _result_cache.get(key)
+        if cached is None:
+            # Identical concurrent requests share one ranking
+            cached = await _result_flights.do(key, lambda: self._generate_and_cache(key, user_input, profile))
+        else:
+            print(f"[RecommendationService] Result cache hit for {profile.name}")
+
+        return cached.model_copy(deep=True, update={"recommendation_id": f"rec_{int(time.time())}"})
+
+    async def _generate_and_cache(self, key: str, user_input: UserInputV2, profile: RestaurantProfile) -> RecommendationResponseV2:
+        recommendations = await self._generate_uncached(user_input, profile)
+        if recommendations.items and not self.used_fallback:
+            _result_cache.set(key, recommendations.model_copy(deep=True))
+        return recommendations
+
+    def _resolve_ranking_mode(self, user_input: UserInputV2) -> str:
         """
+        llm or local for this request (request field, else RECOMMENDATION_RANKING_MODE)
+
+        auto keeps the LLM for personalized requests (user_id or free-text needs)
+        unless the gateway is overloaded; everything else is ranked locally.
+        """
+        mode = user_input.ranking_mode or RANKING_MODE
+        if mode == "auto":
+            personalized = bool(user_input.user_id or (user_input.natural_input or "").strip())
+            mode = "llm" if personalized and not llm_gateway.llm_overloaded() else "local"
+        return "local" if mode == "local" else "llm"
+
+    async def _generate_uncached(
+        self,
+        user_input: UserInputV2,
+        profile: RestaurantProfile,
+        ranking_mode: str = "llm"
+    ) -> RecommendationResponseV2:
+        """Hard filter + LLM soft ranking (or local ranking), without the result cache"""
         print(f"[RecommendationService] Generating recommendations for {user_input.party_size} people")
         print(f"[RecommendationService] Dining style: {user_input.dining_style}")
         print(f"[RecommendationService] Preferences: {user_input.preferences}")
 
         # Step 1: Hard Filter (Python-based)
-        filtered_items = self._hard_filter(profile.menu_items, user_input)
+        filtered_items = self._hard_filter(profile.menu_items, user_input, matrix=get_menu_matrix(profile))
         print(f"[RecommendationService] Hard filter: {len(profile.menu_items)} → {len(filtered_items)} items")
 
         if not filtered_items:
@@ -61,12 +166,19 @@ class RecommendationService:
                 currency="TWD"
             )
 
-        # Step 2: Soft Ranking (LLM-based)
+        # Step 2: Soft Ranking (LLM-based, or deterministic local ranking)
+        if ranking_mode == "local":
+            return self._local_ranking(filtered_items, user_input, profile)
         recommendations = await self._soft_ranking(filtered_items, user_input, profile)
 
         return recommendations
 
-    def _hard_filter(self, menu_items: List[MenuItem], user_input: UserInputV2) -> List[MenuItem]:
+    def _hard_filter(
+        self,
+        menu_items: List[MenuItem],
+        user_input: UserInputV2,
+        matrix: Optional[MenuMatrix] = None
+    ) -> List[MenuItem]:
         """
         Hard filter dishes based on binary constraints
 
@@ -75,96 +187,23 @@ class RecommendationService:
         - Dishes that violate allergen constraints
         - Dishes outside budget range (if specified)
 
+        The preferences are compiled once into bitmasks (agent/hard_filter.py) and
+        tested against the menu's filter_mask and price columns in one vectorized pass.
+
         Args:
             menu_items: All menu items from restaurant
             user_input: User preferences
+            matrix: The profile's cached MenuMatrix over menu_items (built here if not given)
 
         Returns:
             Filtered list of menu items
         """
-        filtered = []
-
-        for item in menu_items:
-            # If no analysis data, we cannot apply attribute-based filters
-            # But we should still include the dish (fallback: pass through)
-            has_analysis = item.analysis is not None
-
-            # Check preferences for hard constraints (only if analysis data available)
-            skip = False
-            if has_analysis:
-                for pref in user_input.preferences:
-                    pref_lower = pref.lower()
-
-                    # No spicy constraint
-                    if pref_lower in ['no_spicy', 'not_spicy', '不辣', '微辣']:
-                        if item.analysis.is_spicy:
-                            print(f"[HardFilter] Rejected {item.name} - is spicy")
-                            skip = True
-                            break
-
-                    # No beef constraint
-                    if pref_lower in ['no_beef', '不吃牛', '不要牛肉']:
-                        if item.analysis.contains_beef:
-                            print(f"[HardFilter] Rejected {item.name} - contains beef")
-                            skip = True
-                            break
-
-                    # No pork constraint
-                    if pref_lower in ['no_pork', '不吃豬', '不要豬肉']:
-                        if item.analysis.contains_pork:
-                            print(f"[HardFilter] Rejected {item.name} - contains pork")
-                            skip = True
-                            break
-
-                    # No seafood constraint
-                    if pref_lower in ['no_seafood', '不吃海鮮', '不要海鮮']:
-                        if item.analysis.contains_seafood:
-                            print(f"[HardFilter] Rejected {item.name} - contains seafood")
-                            skip = True
-                            break
-
-                    # Vegan constraint
-                    if pref_lower in ['vegan', '素食', '全素']:
-                        if not item.analysis.is_vegan:
-                            print(f"[HardFilter] Rejected {item.name} - not vegan")
-                            skip = True
-                            break
-
-            if skip:
-                continue
-
-            # Check allergens (only if analysis data available)
-            if has_analysis and user_input.preferences:
-                allergen_keywords = ['allergy', 'allergic', '過敏']
-                for pref in user_input.preferences:
-                    if any(keyword in pref.lower() for keyword in allergen_keywords):
-                        # Extract allergen name (e.g., "allergic to peanuts" → "peanuts")
-                        allergen = pref.lower().split('to')[-1].strip() if 'to' in pref.lower() else pref
-                        if any(allergen in a.lower() for a in item.analysis.allergens):
-                            print(f"[HardFilter] Rejected {item.name} - contains allergen: {allergen}")
-                            skip = True
-                            break
-
-            if skip:
-                continue
-
-            # Budget filter (if specified)
-            if user_input.budget:
-                max_price = None
-                if user_input.budget.type == "Per_Person":
-                    max_price = user_input.budget.amount
-                elif user_input.budget.type == "Total":
-                    # For total budget, filter out dishes that exceed the total budget
-                    max_price = user_input.budget.amount
-
-                if max_price and item.price and item.price > max_price:
-                    print(f"[HardFilter] Rejected {item.name} - price ${item.price} > max ${max_price}")
-                    continue
-
-            # Passed all filters
-            filtered.append(item)
+        hard_filter = compile_hard_filter(user_input)
+        if matrix is None or matrix.menu_items is not menu_items:
+            matrix = MenuMatrix(menu_items)
+        filtered, rejected = hard_filter.apply_matrix(matrix)
 
-        print(f"[HardFilter] Kept {len(filtered)} items after filtering")
+        print(f"[HardFilter] Kept {len(filtered)} items after filtering (rejected: {rejected})")
         return filtered
 
     async def _soft_ranking(
@@ -219,11 +258,6 @@ class RecommendationService:
             }
         }
 
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
-            generation_config=generation_config
-        )
-
         # Build menu data for LLM
         menu_data = []
         for item in filtered_items:
@@ -258,14 +292,7 @@ class RecommendationService:
             menu_data.append(item_dict)
 
         # Calculate target dish count
-        if user_input.dish_count_target:
-            target_count = user_input.dish_count_target
-        else:
-            # Heuristic: 1.5-2 dishes per person for shared, 1 per person for individual
-            if user_input.dining_style == "Shared":
-                target_count = max(3, int(user_input.party_size * 1.5))
-            else:
-                target_count = user_input.party_size
+        target_count = local_ranking.target_dish_count(user_input)
 
         from agent.prompts import RECOMMENDATION_PROMPT_TEMPLATE
         
@@ -282,7 +309,12 @@ class RecommendationService:
         )
 
         try:
-            response = await model.generate_content_async(prompt)
+            response = await llm_gateway.generate_content_async(
+                prompt,
+                model_name='gemini-2.5-flash',
+                generation_config=generation_config,
+                call_site="RecommendationService._soft_ranking"
+            )
             result_text = response.text
 
             # Parse JSON (no need to clean markdown code blocks as response is pure JSON)
@@ -292,15 +324,14 @@ class RecommendationService:
             recommendations = []
             total_price = 0
 
+            # Built once per response: exact, then normalized, then partial (containment) match
+            menu_index = DishNameIndex((item.name, item) for item in filtered_items)
+
             for rec_data in result.get("recommendations", []):
                 dish_name = rec_data.get("dish_name")
 
-                # Find corresponding MenuItem (simple exact match for now, could be improved)
-                menu_item = next((item for item in filtered_items if item.name == dish_name), None)
-                
-                # If exact match fails, try partial match
-                if not menu_item:
-                    menu_item = next((item for item in filtered_items if dish_name in item.name or item.name in dish_name), None)
+                # Find corresponding MenuItem
+                menu_item = menu_index.get(dish_name) if dish_name else None
 
                 if not menu_item:
                     print(f"[SoftRanking] Warning: LLM recommended unknown dish: {dish_name}")
@@ -345,7 +376,8 @@ class RecommendationService:
                 alternatives = self._generate_alternatives_for_slot(
                     category=menu_item.category or "其他",
                     exclude_names=[menu_item.name],  # Exclude current dish
-                    filtered_items=filtered_items,
+                    profile=profile,
+                    user_input=user_input,
                     limit=3  # Up to 3 alternatives per slot
                 )
 
@@ -426,47 +458,32 @@ class RecommendationService:
         self,
         category: str,
         exclude_names: List[str],
-        filtered_items: List[MenuItem],
+        profile: RestaurantProfile,
+        user_input: UserInputV2,
         limit: int = 3
     ) -> List[MenuItemV2]:
         """
         Generate alternative dishes for a slot from the same category.
+
+        Walks the profile's precomputed category ranking, skipping excluded
+        dishes and dishes the request's hard filter rejects.
         
         Args:
             category: The category to find alternatives in
             exclude_names: Dish names to exclude (e.g., the current display dish)
-            filtered_items: Items that passed hard filter (already filtered by user preferences)
+            profile: Restaurant profile (category rankings are built if missing)
+            user_input: User preferences (same hard filter as the recommended dishes)
             limit: Maximum number of alternatives to return
             
         Returns:
             List of MenuItemV2 alternatives
         """
-        # Find candidates from the same category
-        candidates = []
-        for item in filtered_items:
-            if item.category == category and item.name not in exclude_names:
-                candidates.append(item)
-        
-        # Score and sort candidates (higher score = better alternative)
-        def score_item(item: MenuItem) -> float:
-            score = 0.0
-            if item.is_popular:
-                score += 10.0
-            if item.analysis and item.analysis.sentiment_score:
-                score += item.analysis.sentiment_score * 5.0
-            if item.ai_insight:
-                if item.ai_insight.sentiment == "positive":
-                    score += 3.0
-                score += min(item.ai_insight.mention_count, 5) * 0.5
-            if item.is_risky:
-                score -= 10.0
-            return score
-        
-        sorted_candidates = sorted(candidates, key=score_item, reverse=True)
-        
+        hard_filter = compile_hard_filter(user_input)
+        candidates = ranked_alternatives(profile, category, exclude_names, limit, allows=hard_filter.allows)
+
         # Convert to MenuItemV2
         alternatives = []
-        for item in sorted_candidates[:limit]:
+        for item in candidates:
             # Generate a better reason for the alternative
             # Prioritize AI insight summary (user reviews) over menu description
             reason = None
@@ -501,93 +518,63 @@ class RecommendationService:
     def _fallback_ranking(self, filtered_items: List[MenuItem], user_input: UserInputV2, profile: RestaurantProfile) -> RecommendationResponseV2:
         """
         Fallback ranking when LLM fails
-        Uses simple heuristics: prioritize popular and high-sentiment dishes
+        Same as the local ranking mode; the result is flagged so it is not cached
         """
         print(f"[SoftRanking] Using fallback ranking")
+        self.used_fallback = True
+        return self._local_ranking(filtered_items, user_input, profile)
 
-        # Sort by popularity and sentiment
-        def score_item(item: MenuItem) -> float:
-            score = 0.0
-
-            # Popular dishes get bonus
-            if item.is_popular:
-                score += 10.0
-
-            # Sentiment score bonus
-            if item.analysis and item.analysis.sentiment_score:
-                score += item.analysis.sentiment_score * 5.0
-
-            # Positive AI insight bonus
-            if item.ai_insight:
-                if item.ai_insight.sentiment == "positive":
-                    score += 3.0
-                elif item.ai_insight.sentiment == "negative":
-                    score -= 5.0
-
-                # Mention count bonus
-                score += min(item.ai_insight.mention_count, 5) * 0.5
-
-            # Risky dishes get penalty
-            if item.is_risky:
-                score -= 10.0
-
-            return score
-
-        sorted_items = sorted(filtered_items, key=score_item, reverse=True)
-
-        # Calculate target count
-        if user_input.dish_count_target:
-            target_count = user_input.dish_count_target
-        else:
-            if user_input.dining_style == "Shared":
-                target_count = max(3, int(user_input.party_size * 1.5))
-            else:
-                target_count = user_input.party_size
+    def _local_ranking(self, filtered_items: List[MenuItem], user_input: UserInputV2, profile: RestaurantProfile) -> RecommendationResponseV2:
+        """
+        Deterministic ranking without an LLM call
+        Review scores, occasion fit, category diversity, balance and budget over the
+        profile's MenuMatrix (see agent.local_ranking); reasons come from templates
+        """
+        start = time.perf_counter()
+        matrix = get_menu_matrix(profile)
+        rows = matrix.rows_for(filtered_items)
+        if rows is None:
+            # Items not taken from this profile's menu list: rank them on their own
+            matrix = MenuMatrix(filtered_items)
+            rows = np.arange(matrix.size)
+        selected_items = [matrix.menu_items[row] for row in local_ranking.select_dishes(matrix, rows, user_input)]
 
-        # Select top items
-        selected_items = sorted_items[:target_count]
-        
         recommendations = []
         total_price = 0
         category_summary = {}
 
         for item in selected_items:
+            cat = item.category or "其他"
             menu_item_v2 = MenuItemV2(
                 dish_id=item.id or "",
                 dish_name=item.name,
                 price=item.price or 0,
                 quantity=1,
-                reason="Popular and highly rated",
-                category=item.category or "其他",
+                reason=local_ranking.dish_reason(item, user_input),
+                category=cat,
                 review_count=item.ai_insight.mention_count if item.ai_insight else 0
             )
-            
+
             # Generate alternatives for this slot
             alternatives = self._generate_alternatives_for_slot(
-                category=item.category or "其他",
-                exclude_names=[item.name],
-                filtered_items=sorted_items,  # Use all sorted items as candidates
+                category=cat,
+                exclude_names=[selected.name for selected in selected_items],
+                profile=profile,
+                user_input=user_input,
                 limit=3
             )
-            
-            dish_slot = DishSlotResponse(
-                category=item.category or "其他",
-                display=menu_item_v2,
-                alternatives=alternatives
-            )
-            
-            recommendations.append(dish_slot)
-            if item.price:
-                total_price += item.price
-            
-            cat = item.category or "其他"
+
+            recommendations.append(DishSlotResponse(category=cat, display=menu_item_v2, alternatives=alternatives))
+            total_price += item.price or 0
             category_summary[cat] = category_summary.get(cat, 0) + 1
 
+        print(f"[LocalRanking] {len(filtered_items)} items → {len(selected_items)} dishes, ${total_price} "
+              f"in {(time.perf_counter() - start) * 1000:.1f}ms")
 
         return RecommendationResponseV2(
             recommendation_id=f"rec_{int(time.time())}",
             restaurant_name=profile.name,
-            recommendation_summary="Fallback recommendations based on popularity.",
+            recommendation_summary=local_ranking.summarize(selected_items, user_input, total_price),
             items=recommendations,
             total_price=total_price,
             cuisine_type="中式餐館",
@@ -601,37 +588,19 @@ class RecommendationService:
         category: str,
         exclude_names: List[str],
         profile: RestaurantProfile,
-        limit: int = 5
+        limit: int = 5,
+        user_input: Optional[UserInputV2] = None
     ) -> List[MenuItemV2]:
         """
         Get alternative dishes for a specific category
+        Walks the profile's category ranking; with user_input, hard-filtered dishes are skipped
         """
-        candidates = []
-        for item in profile.menu_items:
-            # Filter by category
-            if item.category != category:
-                continue
-            
-            # Filter excluded items
-            if item.name in exclude_names:
-                continue
-                
-            candidates.append(item)
-            
-        # Sort candidates by score (popularity + sentiment)
-        def score_item(item: MenuItem) -> float:
-            score = 0.0
-            if item.is_popular: score += 10.0
-            if item.analysis and item.analysis.sentiment_score:
-                score += item.analysis.sentiment_score * 5.0
-            if item.is_risky: score -= 10.0
-            return score
-            
-        sorted_candidates = sorted(candidates, key=score_item, reverse=True)
-        
+        allows = compile_hard_filter(user_input).allows if user_input else None
+        candidates = ranked_alternatives(profile, category, exclude_names, limit, allows=allows)
+
         # Convert top candidates to MenuItemV2
         results = []
-        for item in sorted_candidates[:limit]:
+        for item in candidates:
             menu_item_v2 = MenuItemV2(
                 dish_id=item.id or "",
                 dish_name=item.name,
@@ -19,6 +19,14 @@ import google.generativeai as genai
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from schemas.recommendation import UserInputV2, MenuItemV2
+from services import llm_gateway
+from agent import menu_optimizer, menu_rules
+from agent.hard_filter import compile_hard_filter
+
+# Non-personalized requests: take the optimizer's menu and only ask the LLM for reasons
+MENU_OPTIMIZER_ENABLED = os.getenv("MENU_OPTIMIZER_ENABLED", "true").lower() in ("true", "1", "yes")
+# DishSelectorAgent.explain only writes reasons for an already fixed menu: no selection to reason about, so flash suffices
+EXPLAIN_MODEL_NAME = os.getenv("EXPLAIN_MODEL_NAME", "gemini-2.5-flash")
 
 
 @dataclass
@@ -40,7 +48,7 @@ class RecommendationAgentBase:
         self.api_key = os.getenv("GEMINI_API_KEY")
         if self.api_key:
             genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
 
     async def run(self, *args, **kwargs) -> AgentDecision:
         raise NotImplementedError
@@ -192,10 +200,11 @@ You are the **"Culinary Experience Curator."** You are not an accountant; you ar
 """
 
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="DishSelectorAgent.run"
             )
             data = json.loads(response.text)
 
@@ -222,6 +231,76 @@ You are the **"Culinary Experience Curator."** You are not an accountant; you ar
                 issues=[str(e)]
             )
 
+    async def explain(self,
+                      menu: List[Dict[str, Any]],
+                      user_input: UserInputV2) -> AgentDecision:
+        """
+        Reasons (and display names) for an already-chosen menu, e.g. from the
+        menu optimizer; dishes, prices and quantities are kept as given
+        """
+        print("🍽️  DishSelectorAgent: Explaining optimized menu...")
+
+        prompt = f"""
+# Role
+You are the **"Culinary Experience Curator."** The menu below is final; explain it to the guest.
+
+# Language Requirement
+- Write `reason` and `rationale` in **{user_input.language}**.
+- If the language is not Chinese, format `dish_name` as "Translated Name (Original Name)"; for zh-TW keep the original name.
+
+# User Context
+- Party Size: {user_input.party_size}
+- Dining Style: {user_input.dining_style}
+- Occasion: {user_input.occasion or 'casual'}
+- Dietary Restrictions: {', '.join(user_input.preferences) if user_input.preferences else 'None'}
+
+# Final Menu (do not add, remove or reorder dishes)
+{json.dumps(menu, ensure_ascii=False, indent=2, default=str)}
+
+# Output Format (JSON)
+{{
+  "dishes": [
+    {{"dish_name": "String", "reason": "String (Why this dish for this guest?)"}}
+  ],
+  "rationale": "String (Brief strategy explanation)"
+}}
+"""
+
+        try:
+            response = await llm_gateway.generate_content_async(
+                prompt,
+                model_name=EXPLAIN_MODEL_NAME,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="DishSelectorAgent.explain"
+            )
+            data = json.loads(response.text)
+            explained = data.get("dishes", [])
+            if len(explained) != len(menu):
+                raise ValueError(f"expected {len(menu)} dishes, got {len(explained)}")
+
+            final_menu = []
+            for dish, text in zip(menu, explained):
+                final_menu.append({
+                    **dish,
+                    "dish_name": text.get("dish_name") or dish["dish_name"],
+                    "reason": text.get("reason") or dish.get("reason", ""),
+                })
+            return AgentDecision(
+                agent_name="DishSelector",
+                approved=True,
+                data=final_menu,
+                metadata={"rationale": data.get("rationale", "")}
+            )
+
+        except Exception as e:
+            print(f"⚠️  DishSelectorAgent explain failed, keeping candidate reasons: {e}")
+            return AgentDecision(
+                agent_name="DishSelector",
+                approved=False,
+                data=menu,
+                issues=[str(e)]
+            )
+
 
 
 
@@ -239,51 +318,7 @@ class BalanceCheckerAgent(RecommendationAgentBase):
 
     def _analyze_menu(self, menu: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Analyze menu composition"""
-        categories = {}
-        cooking_methods = []
-        has_fried = 0
-
-        for dish in menu:
-            cat = dish.get('category', 'Unknown')
-            categories[cat] = categories.get(cat, 0) + 1
-
-            dish_name = dish.get('dish_name', '').lower()
-            # Detect cooking methods
-            if any(word in dish_name for word in ['炸', 'fried', '酥']):
-                cooking_methods.append('fried')
-                has_fried += 1
-            elif any(word in dish_name for word in ['蒸', 'steamed']):
-                cooking_methods.append('steamed')
-            elif any(word in dish_name for word in ['烤', 'grilled', '燒']):
-                cooking_methods.append('grilled')
-            elif any(word in dish_name for word in ['炒', 'stir-fry']):
-                cooking_methods.append('stir-fried')
-
-        greasy_ratio = has_fried / len(menu) if menu else 0
-
-        return {
-            "categories": categories,
-            "dish_count": len(menu),
-            "has_vegetable": any(
-                '蔬菜' in dish.get(
-                    'category',
-                    '') or '青菜' in dish.get(
-                    'dish_name',
-                    '') for dish in menu),
-            "has_soup": any(
-                '湯' in dish.get(
-                    'category',
-                    '') for dish in menu),
-            "has_staple": any(
-                '主食' in dish.get(
-                    'category',
-                    '') or '飯' in dish.get(
-                    'dish_name',
-                    '') or '麵' in dish.get(
-                    'dish_name',
-                    '') for dish in menu),
-            "cooking_methods": cooking_methods,
-            "greasy_ratio": greasy_ratio}
+        return menu_rules.analyze_menu(menu)
 
     async def run(self,
                   current_menu: List[Dict[str, Any]],
@@ -293,31 +328,26 @@ class BalanceCheckerAgent(RecommendationAgentBase):
         print("⚖️  BalanceCheckerAgent: Checking menu balance...")
 
         analysis = self._analyze_menu(current_menu)
-        issues = []
-
-        # Check for shared dining requirements
-        if dining_style == "Shared":
-            if not analysis['has_vegetable']:
-                issues.append("缺少蔬菜類菜品")
-            if not analysis['has_soup'] and party_size >= 4:
-                issues.append("建議加入湯品（4人以上聚餐）")
-            if analysis['dish_count'] < party_size + 1:
-                issues.append(f"菜數不足（建議至少 {party_size + 1} 道）")
-            if analysis['greasy_ratio'] > 0.5:
-                issues.append("油炸/油膩菜品比例過高（> 50%），建議加入清爽/酸味菜品")
-
-        # If balanced, approve
-        if not issues:
-            print(f"✓ Menu is well-balanced")
+
+        # Local rules first: the Executive Chef is only consulted below the threshold
+        report = menu_rules.score_balance(current_menu, dining_style, party_size)
+        issues = report.issues
+        analysis["local_score"] = report.score
+
+        if report.passed:
+            menu_rules.record("balance", skipped_llm=True)
+            print(f"✓ Menu is well-balanced (local score {report.score:.2f})")
             return AgentDecision(
                 agent_name="BalanceChecker",
                 approved=True,
                 data=current_menu,
+                issues=issues or None,
                 metadata=analysis
             )
 
         # Need adjustment
-        print(f"⚠️  Balance issues: {issues}")
+        menu_rules.record("balance", skipped_llm=False)
+        print(f"⚠️  Balance issues (local score {report.score:.2f}): {issues}")
 
         prompt = f"""
 # Role
@@ -350,10 +380,11 @@ If balance is poor, suggest a **SWAP** (Replace X with Y) to fix the issue witho
 """
 
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="BalanceCheckerAgent.run"
             )
             data = json.loads(response.text)
 
@@ -411,8 +442,14 @@ class QualityAssuranceAgent(RecommendationAgentBase):
                 critique=hard_checks.get('critique')
             )
 
-        # Soft checks (LLM-based semantic validation)
-        soft_checks = await self._perform_soft_checks(final_menu, user_input)
+        # Soft checks: local rules, LLM-based semantic validation below the threshold
+        report = menu_rules.score_quality(final_menu, user_input, hard_checks)
+        if report.passed:
+            menu_rules.record("qa_soft", skipped_llm=True)
+            soft_checks = {"approved": True, "critique": "", "source": "local_rules", "score": report.score}
+        else:
+            menu_rules.record("qa_soft", skipped_llm=False)
+            soft_checks = await self._perform_soft_checks(final_menu, user_input)
 
         all_passed = hard_checks['all_passed'] and soft_checks.get(
             'approved', False)
@@ -532,10 +569,11 @@ You are the **"Restaurant Manager"** performing the final sanity check before pr
 """
 
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="QualityAssuranceAgent._perform_soft_checks"
             )
             data = json.loads(response.text)
             return data
@@ -563,6 +601,7 @@ You are the **"Restaurant Manager"** performing the final sanity check before pr
 
         # If approved, just return base menu
         if balance_decision.approved:
+            menu_rules.record("consolidate", skipped_llm=True)
             print("   Balance approved. Returning menu.")
             return AgentDecision(
                 agent_name="QualityAssurance",
@@ -571,6 +610,8 @@ You are the **"Restaurant Manager"** performing the final sanity check before pr
                 metadata={"source": "auto-approval"}
             )
 
+        menu_rules.record("consolidate", skipped_llm=False)
+
         prompt = f"""
 # Role
 You are the **"Final Decision Maker"** (Restaurant Manager).
@@ -605,10 +646,11 @@ Synthesize a **FINAL MENU** that resolves conflicts.
 }}
 """
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="QualityAssuranceAgent.consolidate"
             )
             data = json.loads(response.text)
             final_menu = data.get("final_menu", base_menu)
@@ -661,6 +703,16 @@ class OrchestratorAgent:
         self.balance_checker = BalanceCheckerAgent()
         self.qa_agent = QualityAssuranceAgent()
 
+    def _optimize_menu(
+            self,
+            candidates: List[Dict[str, Any]],
+            user_input: UserInputV2) -> menu_optimizer.OptimizedMenu:
+        """Budget/portion/balance-feasible menu from the candidate pool, dietary violations removed"""
+        pool = menu_optimizer.build_candidates(candidates, user_input)
+        hard_filter = compile_hard_filter(user_input)
+        safe = [c for c in pool if hard_filter.diet_allows(c.data)]
+        return menu_optimizer.optimize_menu(safe, menu_optimizer.constraints_for(user_input, safe))
+
     def _calculate_menu_score(
             self,
             qa_result: AgentDecision,
@@ -713,6 +765,21 @@ class OrchestratorAgent:
         print("🤖 Multi-Agent Recommendation System (Parallel) Starting...")
         print("=" * 80 + "\n")
 
+        optimized = self._optimize_menu(candidates, user_input)
+        optimized_menu = menu_optimizer.to_menu_dicts(optimized)
+        print(f"🧮 Optimizer: {len(optimized_menu)} dishes, ${optimized.total_price}"
+              f"{' (relaxed: ' + ', '.join(optimized.relaxed) + ')' if optimized.relaxed else ''}")
+
+        # Requests without a personal note or memory: the optimizer already meets
+        # budget, portions and balance, so skip the select/balance/QA rounds
+        personalized = bool(getattr(user_input, 'natural_input', None) or getattr(user_input, 'user_id', None))
+        if MENU_OPTIMIZER_ENABLED and optimized.feasible and not personalized:
+            decision = await self.dish_selector.explain(optimized_menu, user_input)
+            print(f"\n{'='*80}")
+            print(f"🎯 Optimized menu returned without LLM iterations")
+            print(f"{'='*80}\n")
+            return decision.data
+
         max_iterations = 2  # Reduced from 3 for speed
         current_menu = []
         previous_critique = None
@@ -738,8 +805,8 @@ class OrchestratorAgent:
                 )
 
             if not decision.approved:
-                print("❌ Dish selection failed, using candidates as fallback")
-                current_menu = candidates[:10]
+                print("❌ Dish selection failed, using optimized menu as fallback")
+                current_menu = optimized_menu or candidates[:10]
             else:
                 current_menu = decision.data
 
@@ -815,4 +882,4 @@ class OrchestratorAgent:
         print(f"⚠️  Max iterations reached. Returning best attempt.")
         print(f"   Best Score: {best_score:.1f}/100")
         print(f"{'='*80}\n")
-        return best_menu or current_menu
+        return best_menu or optimized_menu or current_menu
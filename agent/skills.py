@@ -1,9 +1,10 @@
 import os
 import json
-import asyncio
 import google.generativeai as genai
 from typing import List, Dict, Any
 
+from services import llm_gateway
+
 class MenuExtractionSkill:
     """
     A reusable skill for extracting structured menu data from images using Gemini Vision.
@@ -12,7 +13,7 @@ class MenuExtractionSkill:
         self.api_key = os.getenv("GEMINI_API_KEY")
         if self.api_key:
             genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
 
     async def execute(self, images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -45,10 +46,11 @@ class MenuExtractionSkill:
         """
 
         try:
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+            response = await llm_gateway.generate_content_async(
                 [prompt] + images,
-                generation_config={"response_mime_type": "application/json"}
+                model_name=self.model_name,
+                generation_config={"response_mime_type": "application/json"},
+                call_site="MenuExtractionSkill.execute"
             )
             data = json.loads(response.text)
             
@@ -3,20 +3,38 @@ V2 Recommendation API Endpoint
 Implements two-stage recommendation: Hard Filter + Soft Ranking
 """
 
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Query
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, HTTPException, status, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from sse_starlette.sse import EventSourceResponse
 from typing import List, Optional
 
 from schemas.recommendation import UserInputV2, RecommendationResponseV2, MenuItemV2
 from schemas.restaurant_profile import RestaurantProfile
-from agent.recommendation import RecommendationService
+from agent.recommendation import RecommendationService, get_result_cache_stats
+from agent.menu_rules import get_rules_stats
 from services import firestore_service
 from services.pipeline.orchestrator import RestaurantPipeline
 from schemas.pipeline import PipelineInput
-from services.job_manager import job_manager, JobStatus
+from services.job_manager import job_manager, job_scheduler, JobStatus, SchedulerSaturated, TERMINAL_STATUSES
+from services.firestore_async import get_firestore_io_stats
+from services.pipeline.menu_matrix import get_menu_matrix_cache_stats
+from services.llm_gateway import get_llm_stats, llm_priority, PRIORITY_BACKGROUND
+from services.http_clients import get_http_stats
+from services.image_fetcher import get_image_fetch_stats
+from services.image_fingerprint import get_image_fingerprint_stats
 
 router = APIRouter()
 
+# SSE progress stream: with no in-process event for this long, re-read the job
+# (covers jobs running on another instance) and send a keep-alive ping
+JOB_STREAM_RESYNC_SECONDS = float(os.getenv("JOB_STREAM_RESYNC_SECONDS", "5"))
+JOB_STREAM_PING_SECONDS = float(os.getenv("JOB_STREAM_PING_SECONDS", "15"))
+
 from services.restaurant_service import RestaurantService
 from services.mock_service import MockService
 
@@ -43,6 +61,7 @@ async def process_recommendation_logic(user_input: UserInputV2) -> Recommendatio
         user_input=user_input,
         profile=profile
     )
+    recommendations.profile_is_stale = firestore_service.is_profile_stale(profile)
     
     return recommendations
 
@@ -50,16 +69,16 @@ async def process_recommendation_job(job_id: str, user_input: UserInputV2):
     """Background task for async recommendation with progress updates"""
     try:
         # Stage 1: Start (10%)
-        job_manager.update_status(job_id, JobStatus.PROCESSING, progress=10, message="正在搜尋餐廳資料...")
+        await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=10, message="正在搜尋餐廳資料...")
         
         # Mock handling for tests
         if user_input.place_id == 'mock-place-id':
             recommendations = MockService.get_mock_recommendation(user_input.restaurant_name)
-            job_manager.update_status(job_id, JobStatus.COMPLETED, progress=100, message="推薦生成完成", result=recommendations.model_dump(mode='json'))
+            await job_manager.update_status_async(job_id, JobStatus.COMPLETED, progress=100, message="推薦生成完成", result=recommendations.model_dump(mode='json'))
             return
         
         # Stage 2: Get profile (20-60% for cold start, or quick jump for warm start)
-        job_manager.update_status(job_id, JobStatus.PROCESSING, progress=15, message="正在檢查餐廳資料...")
+        await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=15, message="正在檢查餐廳資料...")
         
         # Pass job_id for progress updates during cold start
         profile = await RestaurantService.get_or_create_profile(
@@ -72,10 +91,10 @@ async def process_recommendation_job(job_id: str, user_input: UserInputV2):
             raise ValueError(f"Restaurant '{profile.name}' has no menu items available.")
         
         # Stage 3: Analyze menu (65%)
-        job_manager.update_status(job_id, JobStatus.PROCESSING, progress=65, message="正在分析菜單內容...")
+        await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=65, message="正在分析菜單內容...")
         
         # Stage 4: Generate recommendation (75%)
-        job_manager.update_status(job_id, JobStatus.PROCESSING, progress=75, message="AI 正在計算最佳推薦...")
+        await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=75, message="AI 正在計算最佳推薦...")
         
         recommendation_service = RecommendationService()
         recommendations = await recommendation_service.generate_recommendation(
@@ -84,14 +103,15 @@ async def process_recommendation_job(job_id: str, user_input: UserInputV2):
         )
         
         # Stage 5: Finalize (90%)
-        job_manager.update_status(job_id, JobStatus.PROCESSING, progress=90, message="正在組合完美菜單...")
+        await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=90, message="正在組合完美菜單...")
         
         # Override recommendation_id with job_id
         recommendations.recommendation_id = job_id
+        recommendations.profile_is_stale = firestore_service.is_profile_stale(profile)
         result_dict = recommendations.model_dump(mode='json')
         
         # Complete (100%)
-        job_manager.update_status(
+        await job_manager.update_status_async(
             job_id, 
             JobStatus.COMPLETED, 
             progress=100, 
@@ -101,7 +121,7 @@ async def process_recommendation_job(job_id: str, user_input: UserInputV2):
         
     except Exception as e:
         print(f"[JobWorker] Job {job_id} failed: {e}")
-        job_manager.update_status(
+        await job_manager.update_status_async(
             job_id, 
             JobStatus.FAILED, 
             error=str(e)
@@ -119,18 +139,44 @@ async def recommend_dishes_v2(user_input: UserInputV2):
         print(f"[RecommendAPI] Unexpected error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {str(e)}")
 
+async def _scheduler_lane(user_input: UserInputV2) -> str:
+    """Warm lane when a (possibly stale) profile exists, otherwise the job may run the cold start pipeline"""
+    if user_input.place_id == 'mock-place-id':
+        return "warm"
+    if user_input.place_id and await firestore_service.get_restaurant_profile_async(user_input.place_id, allow_stale=True):
+        return "warm"
+    return "cold"
+
+def _too_many_requests(e: SchedulerSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Server is busy, please retry later",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @router.post("/recommend/v2/async")
-async def recommend_dishes_v2_async(user_input: UserInputV2, background_tasks: BackgroundTasks):
+async def recommend_dishes_v2_async(user_input: UserInputV2):
     """Asynchronous V2 Recommendation API"""
     try:
+        lane = await _scheduler_lane(user_input)
+        # Reject before creating the job when the lane is already full
+        job_scheduler.check_capacity(lane)
+
         # Create job
-        job_id = job_manager.create_job(user_input.model_dump(mode='json'))
+        job_id = await job_manager.create_job_async(user_input.model_dump(mode='json'))
         
-        # Start background task
-        background_tasks.add_task(process_recommendation_job, job_id, user_input)
+        # Queue on the scheduler (bounded workers per lane)
+        try:
+            job_scheduler.submit(lane, lambda: process_recommendation_job(job_id, user_input), label=job_id)
+        except SchedulerSaturated:
+            await job_manager.update_status_async(job_id, JobStatus.FAILED, error="Server is busy, please retry later")
+            raise
         
         return {"job_id": job_id, "status": "pending", "message": "Recommendation job started"}
         
+    except SchedulerSaturated as e:
+        print(f"[RecommendAPI] Async start rejected: {e}")
+        raise _too_many_requests(e)
     except Exception as e:
         print(f"[RecommendAPI] Async start error: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to start job: {str(e)}")
@@ -138,12 +184,56 @@ async def recommend_dishes_v2_async(user_input: UserInputV2, background_tasks: B
 @router.get("/recommend/v2/status/{job_id}")
 async def get_job_status(job_id: str):
     """Get status of a recommendation job"""
-    job = job_manager.get_job(job_id)
+    job = await job_manager.get_job_async(job_id)
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
     
     return job
 
+def _job_event(job: dict) -> dict:
+    """Format a job snapshot/update as an SSE event (event name = job status)"""
+    return {"event": job.get("status", "processing"), "data": json.dumps(jsonable_encoder(job), ensure_ascii=False)}
+
+@router.get("/recommend/v2/stream/{job_id}")
+async def stream_job_status(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of a recommendation job's progress.
+    Sends the current snapshot, then every status update pushed by job_manager,
+    and closes after the completed/failed event (which carries result/error).
+    """
+    # Subscribe before reading the snapshot so no update can slip in between
+    queue = job_manager.events.subscribe(job_id)
+    try:
+        job = await job_manager.get_job_async(job_id)
+    except Exception:
+        job_manager.events.unsubscribe(job_id, queue)
+        raise
+    if not job:
+        job_manager.events.unsubscribe(job_id, queue)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    async def event_generator():
+        try:
+            last = job
+            yield _job_event(last)
+
+            while last.get("status") not in TERMINAL_STATUSES:
+                if await request.is_disconnected():
+                    break
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=JOB_STREAM_RESYNC_SECONDS)
+                except asyncio.TimeoutError:
+                    # Nothing published here: the job may be running on another instance
+                    update = await job_manager.get_job_async(job_id)
+                    if not update or (update.get("status"), update.get("progress")) == (last.get("status"), last.get("progress")):
+                        continue
+                last = update
+                yield _job_event(last)
+        finally:
+            job_manager.events.unsubscribe(job_id, queue)
+
+    return EventSourceResponse(event_generator(), ping=JOB_STREAM_PING_SECONDS)
+
 @router.get("/recommend/v2/alternatives", response_model=List[MenuItemV2])
 async def get_alternatives(
     recommendation_id: str = Query(..., description="Job ID / Recommendation ID"),
@@ -153,15 +243,21 @@ async def get_alternatives(
     """Get alternative dishes for a category"""
     
     # 1. Look up job to get context (place_id)
-    job = job_manager.get_job(recommendation_id)
+    job = await job_manager.get_job_async(recommendation_id)
     
     place_id = None
     restaurant_name = None
+    user_input = None
     
     if job and "user_input" in job:
         user_input_data = job["user_input"]
         place_id = user_input_data.get("place_id")
         restaurant_name = user_input_data.get("restaurant_name")
+        try:
+            # Same hard filter as the original recommendation
+            user_input = UserInputV2(**user_input_data)
+        except Exception as e:
+            print(f"[RecommendAPI] Alternatives: Could not restore user input: {e}")
     
     if not place_id and not restaurant_name:
         # If we can't find context, return empty list
@@ -177,7 +273,7 @@ async def get_alternatives(
     
     # 3. Get alternatives
     service = RecommendationService()
-    return service.get_alternatives(category, exclude, profile)
+    return service.get_alternatives(category, exclude, profile, user_input=user_input)
 
 @router.get("/recommend/v2/health")
 async def health_check():
@@ -198,11 +294,30 @@ async def health_check():
 
     return job
 
+@router.get("/recommend/v2/metrics")
+async def get_metrics():
+    """In-process performance counters for this instance"""
+    return {
+        "cold_start": RestaurantService.cold_start_stats(),
+        "profile_refresh": RestaurantService.refresh_stats(),
+        "profile_cache": firestore_service.get_profile_cache_stats(),
+        "recommendation_cache": get_result_cache_stats(),
+        "menu_matrix_cache": get_menu_matrix_cache_stats(),
+        "llm": get_llm_stats(),
+        "agent_rules": get_rules_stats(),
+        "http": get_http_stats(),
+        "image_fetch": get_image_fetch_stats(),
+        "image_fingerprint": get_image_fingerprint_stats(),
+        "firestore_io": get_firestore_io_stats(),
+        "job_events": job_manager.events.stats(),
+        "job_writes": job_manager.write_stats(),
+        "scheduler": job_scheduler.stats()
+    }
+
 @router.post("/recommend/v2/prefetch", status_code=202)
 async def prefetch_restaurant(
     restaurant_name: str = Query(..., description="Restaurant name"),
-    place_id: Optional[str] = Query(None, description="Google Place ID"),
-    background_tasks: BackgroundTasks = BackgroundTasks()
+    place_id: Optional[str] = Query(None, description="Google Place ID")
 ):
     """
     Prefetch restaurant data to speed up future recommendations.
@@ -214,7 +329,7 @@ async def prefetch_restaurant(
         # Check if already in cache
         from services import firestore_service
         if place_id:
-            cached_profile = firestore_service.get_restaurant_profile(place_id)
+            cached_profile = await firestore_service.get_restaurant_profile_async(place_id)
             if cached_profile:
                 return {"status": "cached", "message": f"{restaurant_name} is already in cache"}
         
@@ -223,19 +338,23 @@ async def prefetch_restaurant(
             try:
                 print(f"[Prefetch] Starting background Cold Start for: {restaurant_name}")
                 from services.restaurant_service import RestaurantService
-                await RestaurantService.get_or_create_profile(restaurant_name, place_id)
+                with llm_priority(PRIORITY_BACKGROUND):
+                    await RestaurantService.get_or_create_profile(restaurant_name, place_id)
                 print(f"[Prefetch] Completed for: {restaurant_name}")
             except Exception as e:
                 print(f"[Prefetch] Failed for {restaurant_name}: {e}")
                 # Don't raise - this is background, failure is OK
         
-        background_tasks.add_task(prefetch_task)
+        job_scheduler.submit("prefetch", prefetch_task, label=restaurant_name)
         
         return {
             "status": "prefetching",
             "message": f"Started background prefetch for {restaurant_name}"
         }
         
+    except SchedulerSaturated as e:
+        print(f"[Prefetch] Rejected: {e}")
+        raise _too_many_requests(e)
     except Exception as e:
         print(f"[Prefetch] Error: {e}")
         return {"status": "error", "message": str(e)}
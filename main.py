@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 import firebase_admin
 from firebase_admin import credentials
 
@@ -20,10 +21,17 @@ from auth.google_auth import verify_google_token
 from agent.data_fetcher import fetch_place_autocomplete
 from api.v1.restaurant import router as v1_restaurant_router
 from api.v1.recommend_v2 import router as v2_recommend_router
+from services.http_clients import close_clients
 
 USE_MOCK_EXTERNAL = os.getenv("USE_MOCK_EXTERNAL", "").lower() in ("true", "1", "yes")
 
-app = FastAPI(title="AI Dining Agent API", version="4.1")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Shared outbound HTTP pools live for the whole process
+    await close_clients()
+
+app = FastAPI(title="AI Dining Agent API", version="4.1", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -93,7 +101,7 @@ from services.job_manager import job_manager
 @app.get("/v2/recommendations/status/{job_id}")
 async def get_job_status_legacy(job_id: str):
     """Legacy endpoint for backward compatibility with existing frontend"""
-    job = job_manager.get_job(job_id)
+    job = await job_manager.get_job_async(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
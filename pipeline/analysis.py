@@ -5,6 +5,7 @@ import google.generativeai as genai
 from collections import Counter
 from typing import List, Dict, Any, Tuple
 from dotenv import load_dotenv
+from services import llm_gateway
 import re
 
 load_dotenv()
@@ -14,8 +15,9 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 # Initialize Flash model for tagging
+FLASH_MODEL_NAME = 'gemini-1.5-flash'
 try:
-    FLASH_MODEL = genai.GenerativeModel('gemini-1.5-flash')
+    FLASH_MODEL = genai.GenerativeModel(FLASH_MODEL_NAME)
 except Exception as e:
     print(f"Error initializing Gemini 1.5 Flash model for analysis: {e}")
     FLASH_MODEL = None
@@ -67,9 +69,11 @@ async def dish_tagger(dish_name: str, review_snippets: List[str]) -> List[str]:
     Output: ["必點", "香酥", "粒粒分明", "人氣"]
     """
     try:
-        response = await FLASH_MODEL.generate_content_async(
+        response = await llm_gateway.generate_content_async(
             prompt,
-            generation_config={"response_mime_type": "application/json"}
+            model_name=FLASH_MODEL_NAME,
+            generation_config={"response_mime_type": "application/json"},
+            call_site="analysis.dish_tagger"
         )
         tags = json.loads(response.text)
         if isinstance(tags, list) and all(isinstance(tag, str) for tag in tags):
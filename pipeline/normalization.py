@@ -5,6 +5,7 @@ import json
 import google.generativeai as genai
 from typing import List, Dict, Any, Tuple
 from dotenv import load_dotenv
+from services import llm_gateway
 
 load_dotenv()
 
@@ -13,8 +14,9 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 # Initialize Flash model for category normalization
+FLASH_MODEL_NAME = 'gemini-1.5-flash'
 try:
-    FLASH_MODEL = genai.GenerativeModel('gemini-1.5-flash')
+    FLASH_MODEL = genai.GenerativeModel(FLASH_MODEL_NAME)
 except Exception as e:
     print(f"Error initializing Gemini 1.5 Flash model for normalization: {e}")
     FLASH_MODEL = None
@@ -92,9 +94,11 @@ async def normalize_category(original_category: str) -> str:
         Example: "今日推薦" -> "other"
         """
         try:
-            response = await FLASH_MODEL.generate_content_async(
+            response = await llm_gateway.generate_content_async(
                 prompt,
-                generation_config={"response_mime_type": "text/plain"}
+                model_name=FLASH_MODEL_NAME,
+                generation_config={"response_mime_type": "text/plain"},
+                call_site="normalization.normalize_category"
             )
             standardized = response.text.strip().lower()
             if standardized in STANDARD_CATEGORIES.values():
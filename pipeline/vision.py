@@ -4,10 +4,10 @@ import json
 import google.generativeai as genai
 from typing import List, Dict, Any, Tuple, Optional
 from dotenv import load_dotenv
-from schemas.restaurant_profile import MenuItem, Evidence
-import requests
-from PIL import Image
-import io
+from schemas.restaurant_profile import MenuItem
+from services import llm_gateway
+from services.image_fetcher import FetchedImage, fetch_image, IMAGE_OCR_MAX_DIMENSION
+from services import image_fingerprint
 import re
 
 load_dotenv()
@@ -17,70 +17,91 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 # Initialize models
+FLASH_MODEL_NAME = 'gemini-1.5-flash'
+PRO_VISION_MODEL_NAME = 'gemini-2.5-flash-image' # Corrected model name for vision tasks
 try:
-    FLASH_MODEL = genai.GenerativeModel('gemini-1.5-flash')
-    PRO_VISION_MODEL = genai.GenerativeModel('gemini-2.5-flash-image') # Corrected model name for vision tasks
+    FLASH_MODEL = genai.GenerativeModel(FLASH_MODEL_NAME)
+    PRO_VISION_MODEL = genai.GenerativeModel(PRO_VISION_MODEL_NAME)
 except Exception as e:
     print(f"Error initializing Gemini models: {e}")
     FLASH_MODEL = None
     PRO_VISION_MODEL = None
 
+# Images downloaded and decoded at once; Gemini calls are bounded by llm_gateway
+VISION_MAX_PARALLELISM = int(os.getenv("VISION_MAX_PARALLELISM", "8"))
 
-async def image_filter(image_urls: List[str]) -> List[Tuple[Image.Image, str]]:
+
+async def image_filter(image_urls: List[str], max_parallelism: int = VISION_MAX_PARALLELISM) -> List[FetchedImage]:
     """
-    Filters a list of image URLs, returning a list of tuples containing
-    PIL Image objects and their original URLs for those identified as restaurant menus.
+    Filters a list of image URLs, returning the downloaded images identified as restaurant menus.
+    Downloads go through the shared async client and decode/resize runs in worker threads,
+    at most max_parallelism at a time, so the event loop is never blocked.
+    Near-duplicate photos are dropped and photos classified before are answered from cache.
     """
     if not PRO_VISION_MODEL:
         print("Error: Gemini 1.5 Pro Vision model not initialized for image filtering.")
         return []
 
     print(f"Filtering {len(image_urls)} images for menus using Gemini 1.5 Pro Vision...")
+    semaphore = asyncio.Semaphore(max(1, max_parallelism))
+
+    async def download(url: str) -> Optional[FetchedImage]:
+        # Download and downscale once, at OCR resolution, since menu_extractor_ocr reuses it
+        async with semaphore:
+            return await fetch_image(url, max_dimension=IMAGE_OCR_MAX_DIMENSION)
 
-    async def filter_single_image(url: str) -> Optional[Tuple[Image.Image, str]]:
+    async def filter_single_image(image: FetchedImage) -> Optional[FetchedImage]:
         prompt = "Is this image a restaurant menu? Answer YES or NO. Only output YES or NO."
+        url = image.url
         try:
-            # Download the image
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            img = Image.open(io.BytesIO(response.content))
-            
+            cached = image_fingerprint.classification_cache.get([image.fingerprint]) if image.fingerprint else None
+            if cached is not None:
+                return image if cached else None
+
             # Send to Gemini
-            gemini_response = await PRO_VISION_MODEL.generate_content_async(
-                [prompt, img],
-                generation_config={"response_mime_type": "text/plain"}
+            gemini_response = await llm_gateway.generate_content_async(
+                [prompt, image.to_part()],
+                model_name=PRO_VISION_MODEL_NAME,
+                generation_config={"response_mime_type": "text/plain"},
+                call_site="vision.image_filter"
             )
             print(f"Gemini image_filter response for {url}: '{gemini_response.text.strip()}'")
             
-            if gemini_response.text and gemini_response.text.strip().upper() == "YES":
-                return img, url
+            is_menu = bool(gemini_response.text) and gemini_response.text.strip().upper() == "YES"
+            if image.fingerprint:
+                image_fingerprint.classification_cache.set([image.fingerprint], is_menu)
+            if is_menu:
+                return image
         except Exception as e:
             print(f"Error filtering image {url}: {e}")
         return None
 
-    tasks = [filter_single_image(url) for url in image_urls]
-    filtered_results = await asyncio.gather(*tasks)
+    downloaded = await asyncio.gather(*(download(url) for url in image_urls))
+    images = image_fingerprint.dedupe([image for image in downloaded if image is not None],
+                                      key=lambda image: image.fingerprint)
+    filtered_results = await asyncio.gather(*(filter_single_image(image) for image in images))
     
     menus = [result for result in filtered_results if result is not None]
     print(f"Identified {len(menus)} menu images.")
     return menus
 
 
-async def menu_extractor_ocr(menu_images_with_urls: List[Tuple[Image.Image, str]]) -> List[MenuItem]:
+async def menu_extractor_ocr(menu_images: List[FetchedImage]) -> List[MenuItem]:
     """
-    Extracts menu items from a list of PIL Image objects.
+    Extracts menu items from the menu images returned by image_filter.
     """
     if not PRO_VISION_MODEL: # Using Pro Vision model
         print("Error: Gemini 1.5 Pro Vision model not initialized for OCR.")
         return []
-    if not menu_images_with_urls:
+    if not menu_images:
         return []
 
-    print(f"Extracting menu items from {len(menu_images_with_urls)} menu images using Gemini 1.5 Pro Vision...")
+    print(f"Extracting menu items from {len(menu_images)} menu images using Gemini 1.5 Pro Vision...")
 
     all_menu_items: List[MenuItem] = []
 
-    for img, url in menu_images_with_urls:
+    for image in menu_images:
+        url = image.url
         prompt = """
         From this restaurant menu image, extract all individual menu items.
         For each item, identify its dish name, price (integer only, if available), and a general category (e.g., Appetizer, Main Course, Drink, Dessert, Soup).
@@ -102,35 +123,44 @@ async def menu_extractor_ocr(menu_images_with_urls: List[Tuple[Image.Image, str]
         If no menu items can be extracted, return an empty JSON array `[]` wrapped in a markdown code block ````json\n[]\n```.
         """
         try:
-            response = await PRO_VISION_MODEL.generate_content_async(
-                [prompt, img]
-                # Removed generation_config={"response_mime_type": "application/json"}
-            )
-            
-            response_text = response.text
-            print(f"Gemini menu_extractor_ocr raw response for {url}: '{response_text.strip()}'")
-            json_match = re.search(r"```json\n(.*?)```", response_text, re.DOTALL)
-            
-            if json_match:
-                json_string = json_match.group(1)
-                extracted_items_raw = json.loads(json_string)
+            # The same photo file may have been OCR'd for another restaurant or an earlier refresh
+            cached = image_fingerprint.ocr_cache.get([image.fingerprint]) if image.fingerprint else None
+            if cached is not None:
+                print(f"OCR cache hit for {url}")
+                extracted_items_raw = cached
             else:
-                print(f"Warning: No JSON markdown block found in Gemini response: {response_text[:200]}...")
-                extracted_items_raw = []
+                response = await llm_gateway.generate_content_async(
+                    [prompt, image.to_part()],
+                    model_name=PRO_VISION_MODEL_NAME,
+                    # Removed generation_config={"response_mime_type": "application/json"}
+                    call_site="vision.menu_extractor_ocr"
+                )
+                
+                response_text = response.text
+                print(f"Gemini menu_extractor_ocr raw response for {url}: '{response_text.strip()}'")
+                json_match = re.search(r"```json\n(.*?)```", response_text, re.DOTALL)
+                
+                if json_match:
+                    json_string = json_match.group(1)
+                    extracted_items_raw = json.loads(json_string)
+                    if image.fingerprint and isinstance(extracted_items_raw, list):
+                        image_fingerprint.ocr_cache.set([image.fingerprint], extracted_items_raw)
+                else:
+                    print(f"Warning: No JSON markdown block found in Gemini response: {response_text[:200]}...")
+                    extracted_items_raw = []
             
             for i, item_raw in enumerate(extracted_items_raw):
+                item_raw = dict(item_raw)  # Cached lists are shared; ids below are per-call
                 item_raw['id'] = item_raw.get('id') or f"d_{len(all_menu_items) + i + 1:02d}"
                 item_raw['price'] = int(item_raw['price']) if 'price' in item_raw else 0
                 
                 menu_item = MenuItem(
                     name=item_raw['name'],
                     price=item_raw['price'],
-                    original_category=item_raw.get('category', '其他'),
-                    standard_category=item_raw.get('category', '其他'), # Placeholder
+                    category=item_raw.get('category', '其他'),
                     description=item_raw.get('description'),
-                    tags=[],
                     id=item_raw['id'],
-                    evidence=Evidence(image_url=url, ocr_confidence=1.0) # Assume 1.0 confidence
+                    image_url=url
                 )
                 all_menu_items.append(menu_item)
             
@@ -150,9 +180,8 @@ if __name__ == "__main__":
         print("Note: Live testing requires actual image URLs and API quota.")
         # Example to test:
         # test_url = "URL_TO_A_MENU_IMAGE"
-        # response = requests.get(test_url)
-        # img = Image.open(io.BytesIO(response.content))
-        # extracted = await menu_extractor_ocr([(img, test_url)])
+        # menus = await image_filter([test_url])
+        # extracted = await menu_extractor_ocr(menus)
         # print(extracted)
 
     asyncio.run(test_vision())
\ No newline at end of file
@@ -15,6 +15,7 @@ from pipeline.analysis import perform_keyword_analysis, dish_tagger
 
 from schemas.restaurant_profile import RestaurantProfile, Meta, ProfileStatus, MenuItem, PrecomputedSetItem, Evidence
 from services.firestore_service import db # Assuming db is initialized there
+from services.pipeline.mentions import ReviewMentionIndex
 
 async def run_pipeline(place_id: str):
     """
@@ -45,8 +46,8 @@ async def run_pipeline(place_id: str):
         # Step 2: Vision - Filter images and extract menu items
         print(f"[{place_id}] Step 2: Vision - Filtering images and extracting menu...")
         all_image_urls = scraped_data.get("images", [])
-        menu_images_with_urls = await image_filter(all_image_urls)
-        raw_menu_items = await menu_extractor_ocr(menu_images_with_urls)
+        menu_images = await image_filter(all_image_urls)
+        raw_menu_items = await menu_extractor_ocr(menu_images)
         
         # Step 3: Normalization - Clean price and standardize category
         print(f"[{place_id}] Step 3: Normalization - Cleaning data...")
@@ -60,9 +61,12 @@ async def run_pipeline(place_id: str):
         print(f"[{place_id}] Step 4: Analysis - Processing reviews and tagging dishes...")
         reviews_text_list = [r.get("text", "") for r in scraped_data.get("reviews", []) if r.get("text")]
         
+        # One pass over all reviews instead of a substring scan per dish
+        mentions = ReviewMentionIndex([item.name for item in processed_menu_items]).scan(reviews_text_list)
+
         final_menu_items: List[MenuItem] = []
         for item in processed_menu_items:
-            relevant_snippets = [snippet for snippet in reviews_text_list if item.name in snippet]
+            relevant_snippets = mentions.review_texts(item.name)
             item.tags.extend(await dish_tagger(item.name, relevant_snippets))
             final_menu_items.append(item)
 
@@ -0,0 +1,97 @@
+"""
+Allergen vocabulary and packed hard-filter bits for DishAttributes
+
+Free-text allergens ("peanuts", "花生", "shrimp") are normalized to canonical
+names, and the binary hard-filter attributes plus the allergens are packed into
+one integer (DishAttributes.filter_mask) so filtering is a bitwise test.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Binary attributes (bits 0-4)
+SPICY = 1 << 0
+VEGAN = 1 << 1
+BEEF = 1 << 2
+PORK = 1 << 3
+SEAFOOD = 1 << 4
+
+# Canonical allergen -> synonyms (English terms match whole words, optional plural).
+# Chinese has no word boundaries, so single characters that are also parts of unrelated
+# compounds (魚 in 魷魚, 奶 in 椰奶, 貝 in 貝果) are only listed as explicit compounds
+ALLERGEN_VOCABULARY: Dict[str, Tuple[str, ...]] = {
+    "peanut": ("peanut", "花生"),
+    "tree_nut": ("nut", "tree nut", "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "堅果", "核桃", "杏仁", "腰果", "開心果"),
+    "milk": ("milk", "dairy", "lactose", "cheese", "cream", "牛奶", "鮮奶", "奶粉", "煉乳", "乳製品", "乳糖", "乳酪", "起司", "奶油", "優格"),
+    "egg": ("egg", "蛋"),
+    "gluten": ("gluten", "wheat", "flour", "麩質", "小麥", "麵粉"),
+    "soy": ("soy", "soybean", "tofu", "大豆", "黃豆", "豆腐", "醬油"),
+    "shellfish": ("shellfish", "shrimp", "prawn", "crab", "lobster", "crustacean", "甲殼", "蝦", "蟹", "龍蝦"),
+    "mollusc": ("mollusc", "mollusk", "clam", "oyster", "mussel", "scallop", "squid", "octopus", "cuttlefish", "abalone",
+                "貝類", "扇貝", "干貝", "蛤", "蚵", "牡蠣", "魷魚", "花枝", "章魚", "墨魚", "鮑魚"),
+    "fish": ("fish", "salmon", "tuna", "cod", "魚類", "魚肉", "魚片", "魚排", "魚湯", "魚丸", "魚漿", "魚露", "魚卵",
+             "鮭魚", "鮪魚", "鱈魚", "鯛魚", "鱸魚", "虱目魚", "鯖魚", "秋刀魚", "鰻魚", "石斑", "吳郭魚", "旗魚", "生魚片"),
+    "sesame": ("sesame", "芝麻", "麻油"),
+}
+
+# Phrases that contain a synonym but are not that allergen; removed before matching it
+ALLERGEN_EXCLUSIONS: Dict[str, Tuple[str, ...]] = {
+    "milk": ("coconut milk", "coconut cream", "almond milk", "soy milk", "oat milk", "rice milk"),
+    "fish": ("魷魚", "章魚", "墨魚", "鮑魚"),
+}
+
+# Allergen bits start above the binary attributes
+ALLERGEN_BITS: Dict[str, int] = {name: 1 << (8 + i) for i, name in enumerate(ALLERGEN_VOCABULARY)}
+ALLERGEN_MASK = sum(ALLERGEN_BITS.values())
+
+
+def _synonym_pattern(term: str) -> str:
+    if term.isascii():
+        return rf"\b{re.escape(term)}(?:e?s)?\b"
+    return re.escape(term)
+
+
+def _compile(terms: Tuple[str, ...]) -> "re.Pattern":
+    return re.compile("|".join(_synonym_pattern(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+
+_ALLERGEN_PATTERNS: List[Tuple[str, "re.Pattern", Optional["re.Pattern"]]] = [
+    (name, _compile(terms), _compile(ALLERGEN_EXCLUSIONS[name]) if name in ALLERGEN_EXCLUSIONS else None)
+    for name, terms in ALLERGEN_VOCABULARY.items()
+]
+
+
+def normalize_allergens(text: str) -> List[str]:
+    """Canonical allergens mentioned in free text (may be several, e.g. "蝦蟹貝類")"""
+    text = text or ""
+    found = []
+    for name, pattern, exclusions in _ALLERGEN_PATTERNS:
+        if pattern.search(exclusions.sub(" ", text) if exclusions else text):
+            found.append(name)
+    return found
+
+
+def allergen_mask(allergens: Iterable[str]) -> int:
+    """Bits for every canonical allergen found in the given allergen strings"""
+    mask = 0
+    for allergen in allergens:
+        for name in normalize_allergens(allergen):
+            mask |= ALLERGEN_BITS[name]
+    return mask
+
+
+def attribute_mask(is_spicy: bool, is_vegan: bool, contains_beef: bool, contains_pork: bool,
+                   contains_seafood: bool, allergens: Iterable[str]) -> int:
+    """Pack hard-filter attributes and allergens into one integer"""
+    mask = allergen_mask(allergens)
+    if is_spicy:
+        mask |= SPICY
+    if is_vegan:
+        mask |= VEGAN
+    if contains_beef:
+        mask |= BEEF
+    if contains_pork:
+        mask |= PORK
+    if contains_seafood:
+        mask |= SEAFOOD
+    return mask
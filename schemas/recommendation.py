@@ -60,6 +60,10 @@ class UserInputV2(BaseModel):
         description="Dining occasion: friends (聚餐), family (家庭), date (約會), business (商務), fitness (健身減脂), all_signatures (招牌全制霸)"
     )
     language: str = Field("zh-TW", description="User's preferred language (e.g., 'zh-TW', 'en-US', 'ja-JP')")
+    ranking_mode: Optional[Literal["llm", "local", "auto"]] = Field(
+        None,
+        description="llm (Gemini ranking), local (deterministic, no LLM call), auto (local unless personalized, LLM when not overloaded); null uses the server default"
+    )
 
 class MenuItemV2(BaseModel):
     dish_id: Optional[str] = Field(None, description="Corresponding menu item ID")
@@ -91,6 +95,9 @@ class RecommendationResponseV2(BaseModel):
     category_summary: Dict[str, int] = Field(..., description="Count of dishes per category (e.g., {'冷菜': 1, '熱菜': 2})")
     currency: str = Field("TWD", description="Currency code (e.g., TWD, JPY, USD)")
 
+    # Response metadata
+    profile_is_stale: bool = Field(False, description="True if served from a restaurant profile past its TTL (a background refresh is running)")
+
 class AddOnRequest(BaseModel):
     category: str = Field(..., description="Requested category for the add-on")
     count: int = Field(1, description="Number of dishes to add", ge=1)
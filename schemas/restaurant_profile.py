@@ -1,9 +1,11 @@
 # In: schemas/restaurant_profile.py
 
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional, Literal
 from datetime import datetime
 
+from schemas.allergens import attribute_mask
+
 
 class DishAttributes(BaseModel):
     """AI-generated dish attributes for filtering and ranking"""
@@ -28,6 +30,18 @@ class DishAttributes(BaseModel):
     sentiment_score: float = Field(default=0.0, ge=-1.0, le=1.0)
     highlight_review: Optional[str] = None
 
+    # Packed hard-filter bits (schemas/allergens.py), derived from the fields above
+    filter_mask: int = 0
+
+    @model_validator(mode="after")
+    def _pack_filter_mask(self):
+        # Always recomputed, so masks stored with older vocabularies are refreshed on load
+        self.filter_mask = attribute_mask(
+            self.is_spicy, self.is_vegan, self.contains_beef, self.contains_pork,
+            self.contains_seafood, self.allergens
+        )
+        return self
+
 
 class MenuItemAnalysis(BaseModel):
     """Legacy structure - will be deprecated in favor of DishAttributes"""
@@ -61,4 +75,6 @@ class RestaurantProfile(BaseModel):
     trust_level: Literal["high", "medium", "low"]
     menu_source_url: Optional[str]
     menu_items: List[MenuItem]
-    review_summary: str # 整體評價摘要
\ No newline at end of file
+    review_summary: str # 整體評價摘要
+    # Category -> menu_items indices, best first (services/pipeline/rankings.py); built at assembly
+    category_rankings: Dict[str, List[int]] = Field(default_factory=dict)
@@ -0,0 +1,114 @@
+"""
+Benchmark: pairwise regex dish-name matching vs DishNameIndex
+
+Matches N menu names against N LLM-returned names the way
+MenuIntelligence._apply_attributes used to (normalize both sides with re.sub
+inside the inner loop, first containment hit wins) and with
+services.pipeline.matching.DishNameIndex. Names are synthetic CJK dish names;
+a share of the returned names are reformatted (spacing, punctuation, suffixes)
+so the fuzzy paths are exercised, and a share are missing entirely.
+
+Usage:
+    python scripts/benchmark_dish_matching.py --items 500 --runs 5
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pipeline.matching import DishNameIndex
+
+PROTEINS = ["牛肉", "豬肉", "雞肉", "鮮蝦", "花枝", "鴨肉", "羊肉", "豆腐", "蛤蜊", "鮭魚"]
+STYLES = ["紅燒", "清蒸", "三杯", "宮保", "椒鹽", "蔥爆", "糖醋", "麻辣", "塔香", "沙茶"]
+DISHES = ["麵", "飯", "湯", "鍋", "煲", "捲", "餃", "粥"]
+
+
+def build_names(count: int, seed: int):
+    rng = random.Random(seed)
+    menu, seen = [], set()
+    while len(menu) < count:
+        name = f"{rng.choice(STYLES)}{rng.choice(PROTEINS)}{rng.choice(DISHES)}{len(menu)}"
+        if name not in seen:
+            seen.add(name)
+            menu.append(name)
+
+    returned = []
+    for name in menu:
+        roll = rng.random()
+        if roll < 0.6:
+            returned.append(name)                    # Exact
+        elif roll < 0.75:
+            returned.append(f"{name[:2]} {name[2:]}")  # Spacing
+        elif roll < 0.85:
+            returned.append(f"{name}（大）")           # Suffix: menu name contained in returned name
+        elif roll < 0.9:
+            returned.append(name[1:])                 # Truncated: returned name contained in menu name
+        # else: the LLM skipped the dish
+    rng.shuffle(returned)
+    return menu, returned
+
+
+def match_pairwise(menu, returned):
+    attribute_map = {name: name for name in returned}
+    matched = {}
+    for item_name in menu:
+        if item_name in attribute_map:
+            matched[item_name] = attribute_map[item_name]
+            continue
+        normalized_item_name = re.sub(r'[^\w]', '', item_name.lower())
+        for gemini_dish_name, attrs in attribute_map.items():
+            normalized_gemini_name = re.sub(r'[^\w]', '', gemini_dish_name.lower())
+            if (normalized_item_name == normalized_gemini_name or
+                normalized_item_name in normalized_gemini_name or
+                normalized_gemini_name in normalized_item_name):
+                matched[item_name] = attrs
+                break
+    return matched
+
+
+def match_indexed(menu, returned):
+    index = DishNameIndex((name, name) for name in returned)
+    matched = {}
+    for item_name in menu:
+        found = index.get(item_name)
+        if found is not None:
+            matched[item_name] = found
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    menu, returned = build_names(args.items, args.seed)
+
+    print(f"{'='*70}")
+    print(f"Dish matching benchmark: {len(menu)} menu names x {len(returned)} returned names, {args.runs} run(s)")
+    print(f"{'='*70}")
+
+    results = {}
+    for label, fn in (("pairwise", match_pairwise), ("indexed", match_indexed)):
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            matched = fn(menu, returned)
+            timings.append(time.perf_counter() - started)
+        results[label] = statistics.median(timings)
+        print(f"{label:<9}: median {results[label] * 1000:9.2f} ms | matched {len(matched)}/{len(menu)}")
+
+    print(f"{'-'*70}")
+    print(f"indexed  : {results['pairwise'] / results['indexed']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: blocking vs offloaded Firestore access under concurrent load
+
+Simulates a Firestore round trip with a blocking sleep and serves it from two
+FastAPI routes: one calling the client directly inside `async def` (old
+behaviour) and one going through services.firestore_async.run_firestore.
+Requests are driven concurrently through httpx's ASGI transport, so no
+credentials or network are required.
+
+Usage:
+    python scripts/benchmark_firestore_async.py --requests 200 --concurrency 50 --latency-ms 40
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from services.firestore_async import run_firestore, FIRESTORE_MAX_CONCURRENCY
+
+
+def build_app(latency_s: float) -> FastAPI:
+    app = FastAPI()
+
+    def fake_document_get():
+        time.sleep(latency_s)  # Stand-in for doc_ref.get()
+        return {"status": "processing", "progress": 45}
+
+    @app.get("/blocking")
+    async def blocking():
+        return fake_document_get()
+
+    @app.get("/offloaded")
+    async def offloaded():
+        return await run_firestore(fake_document_get)
+
+    return app
+
+
+async def run_load(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    app = build_app(args.latency_ms / 1000)
+    transport = httpx.ASGITransport(app=app)
+
+    print(f"{'='*70}")
+    print(f"Firestore access benchmark: {args.requests} requests, concurrency {args.concurrency}, "
+          f"simulated round trip {args.latency_ms:.0f} ms, pool size {FIRESTORE_MAX_CONCURRENCY}")
+    print(f"{'='*70}")
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, path in (("Before (blocking in event loop)", "/blocking"),
+                            ("After  (offloaded, bounded pool)", "/offloaded")):
+            result = await run_load(client, path, args.requests, args.concurrency)
+            print(f"{label}: {result['throughput_rps']:8.1f} req/s | "
+                  f"p50 {result['p50_ms']:8.1f} ms | p99 {result['p99_ms']:8.1f} ms | "
+                  f"total {result['elapsed_s']:.2f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
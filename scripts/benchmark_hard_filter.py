@@ -0,0 +1,149 @@
+"""
+Benchmark: per-item preference parsing vs compiled bitmask hard filter
+
+Runs the previous RecommendationService._hard_filter logic (lowercase and
+compare every preference for every item, print every rejection) and the
+compiled filter in agent/hard_filter.py over a synthetic menu. Printed output
+of the old version goes to an in-memory buffer, so terminal speed is not measured.
+
+Usage:
+    python scripts/benchmark_hard_filter.py --items 1000 --runs 20
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.hard_filter import compile_hard_filter
+from schemas.recommendation import UserInputV2, BudgetV2
+from schemas.restaurant_profile import MenuItem, DishAttributes
+
+ALLERGENS = ["peanuts", "shrimp", "milk", "gluten", "egg", "soy", "sesame", "crab"]
+
+
+def build_menu(count: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        MenuItem(
+            name=f"菜色{i}",
+            price=rng.randint(60, 900),
+            analysis=DishAttributes(
+                is_spicy=rng.random() < 0.3,
+                is_vegan=rng.random() < 0.15,
+                contains_beef=rng.random() < 0.2,
+                contains_pork=rng.random() < 0.3,
+                contains_seafood=rng.random() < 0.25,
+                allergens=rng.sample(ALLERGENS, rng.randint(0, 2)),
+            ) if rng.random() < 0.95 else None
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_hard_filter(menu_items, user_input):
+    """Previous implementation, kept verbatim apart from being a function"""
+    filtered = []
+    for item in menu_items:
+        has_analysis = item.analysis is not None
+        skip = False
+        if has_analysis:
+            for pref in user_input.preferences:
+                pref_lower = pref.lower()
+                if pref_lower in ['no_spicy', 'not_spicy', '不辣', '微辣']:
+                    if item.analysis.is_spicy:
+                        print(f"[HardFilter] Rejected {item.name} - is spicy")
+                        skip = True
+                        break
+                if pref_lower in ['no_beef', '不吃牛', '不要牛肉']:
+                    if item.analysis.contains_beef:
+                        print(f"[HardFilter] Rejected {item.name} - contains beef")
+                        skip = True
+                        break
+                if pref_lower in ['no_pork', '不吃豬', '不要豬肉']:
+                    if item.analysis.contains_pork:
+                        print(f"[HardFilter] Rejected {item.name} - contains pork")
+                        skip = True
+                        break
+                if pref_lower in ['no_seafood', '不吃海鮮', '不要海鮮']:
+                    if item.analysis.contains_seafood:
+                        print(f"[HardFilter] Rejected {item.name} - contains seafood")
+                        skip = True
+                        break
+                if pref_lower in ['vegan', '素食', '全素']:
+                    if not item.analysis.is_vegan:
+                        print(f"[HardFilter] Rejected {item.name} - not vegan")
+                        skip = True
+                        break
+        if skip:
+            continue
+        if has_analysis and user_input.preferences:
+            allergen_keywords = ['allergy', 'allergic', '過敏']
+            for pref in user_input.preferences:
+                if any(keyword in pref.lower() for keyword in allergen_keywords):
+                    allergen = pref.lower().split('to')[-1].strip() if 'to' in pref.lower() else pref
+                    if any(allergen in a.lower() for a in item.analysis.allergens):
+                        print(f"[HardFilter] Rejected {item.name} - contains allergen: {allergen}")
+                        skip = True
+                        break
+        if skip:
+            continue
+        if user_input.budget:
+            max_price = user_input.budget.amount
+            if max_price and item.price and item.price > max_price:
+                print(f"[HardFilter] Rejected {item.name} - price ${item.price} > max ${max_price}")
+                continue
+        filtered.append(item)
+    print(f"[HardFilter] Kept {len(filtered)} items after filtering")
+    return filtered
+
+
+def compiled_hard_filter(menu_items, user_input):
+    kept, _ = compile_hard_filter(user_input).apply(menu_items)
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    menu = build_menu(args.items, args.seed)
+    user_input = UserInputV2(
+        restaurant_name="Benchmark",
+        dining_style="Shared",
+        party_size=4,
+        budget=BudgetV2(type="Per_Person", amount=600),
+        preferences=["不辣", "no_beef", "allergic to peanuts", "Group", "Local"],
+    )
+
+    print(f"{'='*70}")
+    print(f"Hard filter benchmark: {len(menu)} items, preferences {user_input.preferences}, {args.runs} run(s)")
+    print(f"{'='*70}")
+
+    results = {}
+    for label, fn in (("legacy", legacy_hard_filter), ("compiled", compiled_hard_filter)):
+        timings = []
+        for _ in range(args.runs):
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                kept = fn(menu, user_input)
+                timings.append(time.perf_counter() - started)
+        results[label] = statistics.median(timings)
+        print(f"{label:<9}: median {results[label] * 1000:8.3f} ms | kept {len(kept)}/{len(menu)}")
+
+    print(f"{'-'*70}")
+    print(f"compiled : {results['legacy'] / results['compiled']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
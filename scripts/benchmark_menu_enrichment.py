@@ -0,0 +1,139 @@
+"""
+Benchmark: menu enrichment modes (sequential / concurrent / fused)
+
+Times RestaurantPipeline.enrich_menu, the cold-start stage that turns parsed
+menu items into items with review insights and DishAttributes, in each
+MENU_ENRICHMENT_MODE. Data acquisition and menu parsing are identical across
+modes, so the difference here is the difference in cold-start wall time.
+
+By default Gemini is simulated: each call sleeps base + per_item * items seconds
+(illustrative defaults, override with the flags) and returns well-formed JSON.
+With --live the real API is used (needs GEMINI_API_KEY; the LLM cache is disabled).
+
+Usage:
+    python scripts/benchmark_menu_enrichment.py --items 40 --runs 3
+    python scripts/benchmark_menu_enrichment.py --live --items 20 --runs 1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Simulated latency per call site: (base seconds, seconds per menu item)
+SIMULATED_LATENCY = {
+    "InsightEngine.fuse_reviews": (6.0, 0.03),          # gemini-2.5-pro
+    "MenuIntelligence.analyze_dish_batch": (3.0, 0.06),  # gemini-2.5-flash
+    "MenuIntelligence.enrich_menu": (3.5, 0.08),         # gemini-2.5-flash, both outputs
+}
+
+
+def build_inputs(item_count: int):
+    from schemas.pipeline import ParsedMenuItem, RawReview
+
+    categories = ["主菜", "湯品", "小吃", "甜點", "飲料"]
+    menu_items = [
+        ParsedMenuItem(name=f"測試菜色{i}", price=80 + i * 10, category=categories[i % len(categories)], description=None)
+        for i in range(item_count)
+    ]
+    reviews = [
+        RawReview(text=f"測試菜色{i % item_count}很好吃，份量剛好，推薦", rating=4 + i % 2)
+        for i in range(20)
+    ]
+    return menu_items, reviews
+
+
+def install_simulated_llm(menu_items, time_scale: float):
+    from services import llm_gateway
+    from services.llm_gateway import LLMResponse
+
+    attributes = {
+        "is_spicy": False, "is_vegan": False, "contains_beef": False, "contains_pork": True,
+        "contains_seafood": False, "allergens": [], "flavors": ["savory"], "textures": ["tender"],
+        "temperature": "hot", "cooking_method": "braised", "suitable_occasions": ["group_share"],
+        "is_signature": False, "sentiment_score": 0.5, "highlight_review": None,
+    }
+
+    def prompt_names(contents):
+        # Chunked dish analysis only sends part of the menu; answer for the dishes in the prompt
+        try:
+            menu_json = contents.split("## 菜單資料\n", 1)[1].split("\n", 1)[0]
+            return [entry["name"] for entry in json.loads(menu_json)]
+        except (IndexError, ValueError, KeyError, TypeError):
+            return [item.name for item in menu_items]
+
+    async def fake_generate_content_async(contents, model_name, generation_config=None, call_site="unknown", **kwargs):
+        names = prompt_names(contents)
+        base, per_item = SIMULATED_LATENCY[call_site]
+        await asyncio.sleep((base + per_item * len(names)) * time_scale)
+
+        if call_site == "InsightEngine.fuse_reviews":
+            payload = {
+                "menu_insights": [{"dish_name": n, "sentiment": "positive", "summary": "好吃", "mention_count": 1} for n in names],
+                "overall_summary": "整體評價正面。",
+            }
+        elif call_site == "MenuIntelligence.analyze_dish_batch":
+            payload = {"dish_attributes": [{"dish_name": n, **attributes} for n in names]}
+        else:
+            payload = {
+                "dishes": [{"dish_name": n, "sentiment": "positive", "review_summary": "好吃", "mention_count": 1, **attributes} for n in names],
+                "overall_summary": "整體評價正面。",
+            }
+        return LLMResponse(text=json.dumps(payload, ensure_ascii=False))
+
+    llm_gateway.generate_content_async = fake_generate_content_async
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Multiply simulated latencies (1.0 = real time)")
+    parser.add_argument("--live", action="store_true", help="Call the real Gemini API")
+    args = parser.parse_args()
+
+    if args.live:
+        os.environ["LLM_CACHE_ENABLED"] = "false"  # Otherwise later modes hit cached prompts
+    else:
+        os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("APIFY_API_TOKEN", "benchmark")  # Providers are constructed but not used
+
+    from services.pipeline.orchestrator import RestaurantPipeline, MENU_ENRICHMENT_MODES
+
+    menu_items, reviews = build_inputs(args.items)
+    if not args.live:
+        install_simulated_llm(menu_items, args.time_scale)
+
+    print(f"{'='*70}")
+    print(f"Menu enrichment benchmark: {args.items} items, {len(reviews)} reviews, {args.runs} run(s), "
+          f"{'live Gemini' if args.live else f'simulated Gemini (time scale {args.time_scale})'}")
+    print(f"{'='*70}")
+
+    results = {}
+    for mode in MENU_ENRICHMENT_MODES:
+        pipeline = RestaurantPipeline(enrichment_mode=mode)
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            final_menu, _ = await pipeline.enrich_menu(menu_items, reviews)
+            timings.append(time.perf_counter() - started)
+        with_attributes = sum(1 for item in final_menu if item.analysis)
+        with_insights = sum(1 for item in final_menu if item.ai_insight)
+        results[mode] = statistics.median(timings)
+        print(f"{mode:<11}: median {results[mode]:7.2f} s | attributes {with_attributes}/{len(final_menu)} | "
+              f"insights {with_insights}/{len(final_menu)}")
+
+    baseline = results["sequential"]
+    print(f"{'-'*70}")
+    for mode in MENU_ENRICHMENT_MODES[1:]:
+        print(f"{mode:<11}: {baseline - results[mode]:+7.2f} s saved vs sequential ({baseline / results[mode]:.2f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
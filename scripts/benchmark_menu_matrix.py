@@ -0,0 +1,149 @@
+"""
+Benchmark: per-item Pydantic ranking passes vs the columnar MenuMatrix
+
+For menus of several sizes, times the ranking hot paths both ways:
+- fallback scoring + sort (score_menu_item over MenuItem objects vs matrix.rank)
+- hard filter with budget (CompiledHardFilter.apply vs apply_matrix)
+- per-category alternatives rankings (sort per category vs matrix.category_rankings)
+- balance analysis of the whole menu (keyword checks per dish vs matrix.balance)
+
+The matrix is built once per cached profile; its build time is reported
+separately and is not included in the per-request numbers.
+
+Usage:
+    python scripts/benchmark_menu_matrix.py --sizes 50 500 5000 --runs 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.hard_filter import compile_hard_filter
+from schemas.recommendation import UserInputV2, BudgetV2
+from schemas.restaurant_profile import MenuItem, DishAttributes, MenuItemAnalysis
+from services.pipeline.menu_matrix import (
+    MenuMatrix, FRIED_KEYWORDS, VEGETABLE_CATEGORY_KEYWORDS, VEGETABLE_NAME_KEYWORDS,
+    SOUP_CATEGORY_KEYWORDS, STAPLE_CATEGORY_KEYWORDS, STAPLE_NAME_KEYWORDS
+)
+from services.pipeline.rankings import score_menu_item
+
+CATEGORIES = ["主菜", "湯品", "蔬菜", "主食", "小吃", "甜點", "飲料"]
+NAMES = ["炸雞", "青菜", "牛肉麵", "炒飯", "酸辣湯", "滷肉", "豆花", "烤魚"]
+ALLERGENS = ["peanuts", "shrimp", "milk", "gluten", "egg", "soy"]
+
+
+def build_menu(count: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        MenuItem(
+            name=f"{rng.choice(NAMES)}{i}",
+            price=rng.randint(40, 900),
+            category=rng.choice(CATEGORIES),
+            is_popular=rng.random() < 0.15,
+            is_risky=rng.random() < 0.05,
+            analysis=DishAttributes(
+                is_spicy=rng.random() < 0.3,
+                contains_beef=rng.random() < 0.2,
+                contains_pork=rng.random() < 0.3,
+                allergens=rng.sample(ALLERGENS, rng.randint(0, 2)),
+                sentiment_score=round(rng.uniform(-1, 1), 2),
+            ),
+            ai_insight=MenuItemAnalysis(
+                sentiment=rng.choice(["positive", "neutral", "negative"]),
+                summary="-",
+                mention_count=rng.randint(0, 8),
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def python_category_rankings(menu_items):
+    rankings = {}
+    for index in sorted(range(len(menu_items)), key=lambda i: (-score_menu_item(menu_items[i]), i)):
+        rankings.setdefault(menu_items[index].category, []).append(index)
+    return rankings
+
+
+def python_balance(menu_items):
+    categories = {}
+    fried = 0
+    for item in menu_items:
+        categories[item.category] = categories.get(item.category, 0) + 1
+        if any(word in item.name.lower() for word in FRIED_KEYWORDS):
+            fried += 1
+    return {
+        "categories": categories,
+        "dish_count": len(menu_items),
+        "has_vegetable": any(any(k in i.category for k in VEGETABLE_CATEGORY_KEYWORDS)
+                             or any(k in i.name for k in VEGETABLE_NAME_KEYWORDS) for i in menu_items),
+        "has_soup": any(any(k in i.category for k in SOUP_CATEGORY_KEYWORDS) for i in menu_items),
+        "has_staple": any(any(k in i.category for k in STAPLE_CATEGORY_KEYWORDS)
+                          or any(k in i.name for k in STAPLE_NAME_KEYWORDS) for i in menu_items),
+        "greasy_ratio": fried / len(menu_items) if menu_items else 0.0,
+    }
+
+
+def median_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    hard_filter = compile_hard_filter(UserInputV2(
+        restaurant_name="Benchmark", dining_style="Shared", party_size=4,
+        budget=BudgetV2(type="Per_Person", amount=500),
+        preferences=["不辣", "no_beef", "allergic to peanuts"],
+    ))
+
+    print(f"{'='*78}")
+    print(f"MenuMatrix benchmark: sizes {args.sizes}, {args.runs} run(s), median ms per call")
+    print(f"{'='*78}")
+    print(f"{'items':>6} | {'operation':<20} | {'objects':>9} | {'matrix':>9} | {'speed-up':>8}")
+    print(f"{'-'*78}")
+
+    for size in args.sizes:
+        menu = build_menu(size, args.seed)
+        build_ms = median_ms(lambda: MenuMatrix(menu), max(1, args.runs // 4))
+        matrix = MenuMatrix(menu)
+        all_rows = matrix.rank()
+
+        # Sanity: both sides compute the same thing
+        assert [menu[r] for r in matrix.rank()] == sorted(menu, key=score_menu_item, reverse=True)
+        assert hard_filter.apply_matrix(matrix)[0] == [item for item in menu if hard_filter.allows(item)]
+        assert matrix.category_rankings() == python_category_rankings(menu)
+        assert matrix.balance(all_rows) == python_balance(menu)
+
+        cases = (
+            ("fallback score+sort", lambda: sorted(menu, key=score_menu_item, reverse=True),
+             lambda: [menu[r] for r in matrix.rank()]),
+            ("hard filter+budget", lambda: [item for item in menu if hard_filter.allows(item)], lambda: hard_filter.apply_matrix(matrix)),
+            ("category rankings", lambda: python_category_rankings(menu), matrix.category_rankings),
+            ("balance analysis", lambda: python_balance(menu), lambda: matrix.balance(all_rows)),
+        )
+        for label, objects_fn, matrix_fn in cases:
+            objects_ms = median_ms(objects_fn, args.runs)
+            matrix_ms = median_ms(matrix_fn, args.runs)
+            print(f"{size:>6} | {label:<20} | {objects_ms:9.3f} | {matrix_ms:9.3f} | {objects_ms / matrix_ms:7.1f}x")
+        print(f"{size:>6} | {'(matrix build, once)':<20} | {'':>9} | {build_ms:9.3f} |")
+        print(f"{'-'*78}")
+
+
+if __name__ == "__main__":
+    main()
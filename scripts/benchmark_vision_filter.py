@@ -0,0 +1,198 @@
+"""
+Benchmark: pipeline.vision.image_filter, blocking vs async downloads
+
+Serves generated menu-sized JPEG fixtures from a local HTTP server (with a fixed
+per-request delay standing in for CDN latency) and times:
+
+  legacy  the previous image_filter: requests.get + Image.open inside coroutines,
+          PIL images handed to the model SDK (which encodes them on the event loop)
+  async   the current image_filter: shared httpx client, decode/resize in worker
+          threads, VISION_MAX_PARALLELISM downloads in flight
+
+Gemini is simulated with a fixed sleep per call. Besides wall time, a heartbeat
+task measures the longest event-loop stall, i.e. how long every other request
+served by the same process would have been frozen.
+
+Usage:
+    python scripts/benchmark_vision_filter.py --images 16 --runs 3
+    python scripts/benchmark_vision_filter.py --images 32 --parallelism 4 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+
+
+def build_fixtures(count: int, width: int, height: int):
+    import random
+    from PIL import Image, ImageDraw
+
+    fixtures = {}
+    for i in range(count):
+        rng = random.Random(i)
+        image = Image.new("RGB", (width, height), (250, 248, 240))
+        draw = ImageDraw.Draw(image)
+        for _ in range(60):
+            # Distinct text-like blocks per image (not near-duplicates, not trivially compressible)
+            x, y = rng.randrange(width - 200), rng.randrange(height - 40)
+            shade = rng.randrange(0, 120)
+            draw.rectangle([x, y, x + rng.randrange(80, 600), y + rng.randrange(12, 40)], fill=(shade, shade, shade))
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=90)
+        fixtures[f"/menu_{i}.jpg"] = out.getvalue()
+    return fixtures
+
+
+def start_server(fixtures, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = fixtures[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def install_simulated_llm(llm_latency: float):
+    from services import llm_gateway
+
+    class Response:
+        text = "YES"
+
+    async def fake_generate_content_async(contents, model_name, generation_config=None, call_site="unknown", **kwargs):
+        for part in contents:
+            if hasattr(part, "save"):
+                # The SDK turns PIL images into an inline blob synchronously before sending
+                part.convert("RGB").save(io.BytesIO(), format="JPEG")
+        await asyncio.sleep(llm_latency)
+        return Response()
+
+    llm_gateway.generate_content_async = fake_generate_content_async
+
+
+async def legacy_image_filter(image_urls):
+    """image_filter as it was: blocking download and decode inside the coroutines"""
+    import requests
+    from PIL import Image
+    from pipeline import vision
+    from services import llm_gateway
+
+    async def filter_single_image(url):
+        try:
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            img = Image.open(io.BytesIO(response.content))
+            gemini_response = await llm_gateway.generate_content_async(
+                ["Is this image a restaurant menu?", img],
+                model_name=vision.PRO_VISION_MODEL_NAME,
+                call_site="vision.image_filter"
+            )
+            if gemini_response.text.strip().upper() == "YES":
+                return img, url
+        except Exception as e:
+            print(f"Error filtering image {url}: {e}")
+        return None
+
+    results = await asyncio.gather(*(filter_single_image(url) for url in image_urls))
+    return [r for r in results if r is not None]
+
+
+async def measure(filter_fn, urls):
+    """Returns (seconds, menus found, longest event-loop stall in ms)"""
+    stall = {"max": 0.0}
+    done = asyncio.Event()
+
+    async def heartbeat():
+        interval = 0.005
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            stall["max"] = max(stall["max"], time.perf_counter() - start - interval)
+
+    beat = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    menus = await filter_fn(urls)
+    elapsed = time.perf_counter() - start
+    done.set()
+    await beat
+    return elapsed, len(menus), stall["max"] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vision image_filter (blocking vs async)")
+    parser.add_argument("--images", type=int, default=16, help="Number of fixture images")
+    parser.add_argument("--width", type=int, default=2400)
+    parser.add_argument("--height", type=int, default=3200)
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated CDN latency per download (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Simulated Gemini latency per call (s)")
+    parser.add_argument("--parallelism", type=int, default=None, help="VISION_MAX_PARALLELISM (default: env/8)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    from pipeline import vision
+    from services import image_fingerprint
+    from services.http_clients import close_clients
+
+    parallelism = args.parallelism or vision.VISION_MAX_PARALLELISM
+    fixtures = build_fixtures(args.images, args.width, args.height)
+    server, base = start_server(fixtures, args.latency)
+    urls = [f"{base}{path}" for path in fixtures]
+    install_simulated_llm(args.llm_latency)
+    if vision.PRO_VISION_MODEL is None:
+        vision.PRO_VISION_MODEL = object()
+
+    async def current_filter(image_urls):
+        # Measure fetch + decode, not repeat-photo cache hits from the previous run
+        image_fingerprint.classification_cache.clear()
+        try:
+            return await vision.image_filter(image_urls, max_parallelism=parallelism)
+        finally:
+            await close_clients()
+
+    print("=" * 60)
+    print(f"Vision image_filter benchmark: {args.images} images "
+          f"({args.width}x{args.height}, {sum(map(len, fixtures.values())) // 1024} KB total)")
+    print(f"Download latency {args.latency}s, Gemini latency {args.llm_latency}s, parallelism {parallelism}")
+    print("=" * 60)
+
+    results = {}
+    for name, fn in (("legacy", legacy_image_filter), ("async", current_filter)):
+        runs = [asyncio.run(measure(fn, urls)) for _ in range(args.runs)]
+        results[name] = runs
+        times = [r[0] for r in runs]
+        stalls = [r[2] for r in runs]
+        print(f"{name:<8} {statistics.median(times):7.2f}s median  "
+              f"menus={runs[0][1]:<3} max loop stall {statistics.median(stalls):8.1f} ms")
+
+    server.shutdown()
+    legacy = statistics.median(r[0] for r in results["legacy"])
+    current = statistics.median(r[0] for r in results["async"])
+    print("-" * 60)
+    print(f"Speedup: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Async Firestore Access - keeps blocking Firestore round trips off the event loop
+
+firestore_service, JobManager, MemoryAgent and the web search cache each hold a
+synchronous client (google-cloud-firestore and firebase_admin, with different
+projects/databases). Rather than re-plumbing three AsyncClients, every blocking
+call is offloaded to one shared, bounded thread pool: at most
+FIRESTORE_MAX_CONCURRENCY round trips run at once, extra calls queue in the pool.
+"""
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+FIRESTORE_MAX_CONCURRENCY = int(os.getenv("FIRESTORE_MAX_CONCURRENCY", "16"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=FIRESTORE_MAX_CONCURRENCY,
+    thread_name_prefix="firestore"
+)
+
+_stats = {
+    "calls": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "total_latency_ms": 0.0,
+}
+
+
+async def run_firestore(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking Firestore call on the shared pool and await its result
+
+    Args:
+        fn: Blocking callable, e.g. doc_ref.get or doc_ref.set
+        *args, **kwargs: Passed through to fn
+
+    Returns:
+        Whatever fn returns (exceptions are re-raised in the caller)
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+
+    _stats["calls"] += 1
+    _stats["in_flight"] += 1
+    _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_executor, call)
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+        _stats["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+
+def get_firestore_io_stats() -> Dict[str, Any]:
+    """Call counts and average latency (queueing included) of offloaded Firestore calls"""
+    calls = _stats["calls"]
+    return {
+        "calls": calls,
+        "errors": _stats["errors"],
+        "in_flight": _stats["in_flight"],
+        "peak_in_flight": _stats["peak_in_flight"],
+        "max_concurrency": FIRESTORE_MAX_CONCURRENCY,
+        "avg_latency_ms": round(_stats["total_latency_ms"] / calls, 2) if calls else 0.0,
+    }
@@ -6,6 +6,8 @@ from typing import Optional
 from dotenv import load_dotenv
 
 from schemas.restaurant_profile import RestaurantProfile
+from services.memory_cache import BoundedTTLCache
+from services.firestore_async import run_firestore
 
 load_dotenv()
 
@@ -17,18 +19,68 @@ except Exception as e:
     db = None
 
 RESTAURANTS_COLLECTION = "restaurants"
-CACHE_TTL_DAYS = 7  # Time-to-live for cache is 7 days as per v4.1 spec
-
-def get_restaurant_profile(place_id: str) -> Optional[RestaurantProfile]:
+# Soft TTL: profiles older than this are stale (served only when the caller allows it, then refreshed)
+CACHE_TTL_DAYS = float(os.getenv("PROFILE_SOFT_TTL_DAYS", "7"))  # 7 days as per v4.1 spec
+# Hard maximum age: profiles older than this are never served
+CACHE_MAX_STALE_DAYS = float(os.getenv("PROFILE_MAX_STALE_DAYS", "30"))
+
+# In-process L1 tier in front of Firestore (per instance). Entries never outlive CACHE_MAX_STALE_DAYS.
+PROFILE_L1_MAX_ENTRIES = int(os.getenv("PROFILE_L1_MAX_ENTRIES", "256"))
+PROFILE_L1_MAX_BYTES = int(os.getenv("PROFILE_L1_MAX_BYTES", "0"))  # 0 = bounded by entry count only
+PROFILE_L1_TTL_SECONDS = int(os.getenv("PROFILE_L1_TTL_SECONDS", "600"))
+
+_profile_l1 = BoundedTTLCache(
+    name="restaurant_profile",
+    max_entries=PROFILE_L1_MAX_ENTRIES,
+    default_ttl=PROFILE_L1_TTL_SECONDS,
+    max_bytes=PROFILE_L1_MAX_BYTES,
+    size_of=lambda profile: len(profile.model_dump_json())
+)
+
+def _age_days(updated_at: datetime.datetime) -> float:
+    """Age of a profile timestamp in (fractional) days"""
+    # Ensure timezone awareness for comparison
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (now - updated_at).total_seconds() / 86400
+
+
+def is_profile_stale(profile: RestaurantProfile) -> bool:
+    """Whether a profile is past the soft TTL (CACHE_TTL_DAYS)."""
+    return _age_days(profile.updated_at) >= CACHE_TTL_DAYS
+
+
+def get_restaurant_profile(place_id: str, allow_stale: bool = False) -> Optional[RestaurantProfile]:
     """
     Retrieves a restaurant profile from Firestore if it exists and is not stale.
+    Recently read profiles are served from the in-process L1 tier; the returned
+    object is shared between callers and must be treated as read-only.
 
     Args:
         place_id: The Google Place ID of the restaurant.
+        allow_stale: Also return profiles past the soft TTL (up to CACHE_MAX_STALE_DAYS).
+            Use is_profile_stale() to tell them apart.
 
     Returns:
         A RestaurantProfile Pydantic object if a valid cache entry is found, otherwise None.
     """
+    profile = _profile_l1.get(place_id)
+    if profile is None:
+        profile = _load_restaurant_profile(place_id)
+    return _apply_soft_ttl(place_id, profile, allow_stale)
+
+
+def _apply_soft_ttl(place_id: str, profile: Optional[RestaurantProfile], allow_stale: bool) -> Optional[RestaurantProfile]:
+    """Hides profiles past the soft TTL unless the caller accepts stale data"""
+    if profile is not None and not allow_stale and is_profile_stale(profile):
+        print(f"Cache STALE for place_id: {place_id} (TTL: {CACHE_TTL_DAYS} days)")
+        return None
+    return profile
+
+
+def _load_restaurant_profile(place_id: str) -> Optional[RestaurantProfile]:
+    """Reads a profile from Firestore (any age up to CACHE_MAX_STALE_DAYS) and stores it in L1."""
     if not db:
         print("Firestore is not available. Cannot get profile.")
         return None
@@ -49,21 +101,21 @@ def get_restaurant_profile(place_id: str) -> Optional[RestaurantProfile]:
             print(f"Cache INVALID (no timestamp) for place_id: {place_id}")
             return None
 
-        # Ensure timezone awareness for comparison
-        if updated_at.tzinfo is None:
-            updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+        age_days = _age_days(updated_at)
 
-        now = datetime.datetime.now(datetime.timezone.utc)
-        age = now - updated_at
-
-        if age.days >= CACHE_TTL_DAYS:
-            print(f"Cache EXPIRED for place_id: {place_id} (age: {age.days} days, TTL: {CACHE_TTL_DAYS} days)")
+        if age_days >= CACHE_MAX_STALE_DAYS:
+            print(f"Cache EXPIRED for place_id: {place_id} (age: {int(age_days)} days, max age: {CACHE_MAX_STALE_DAYS} days)")
             return None
         
-        print(f"Cache HIT for place_id: {place_id} (age: {age.days} days)")
+        print(f"Cache HIT for place_id: {place_id} (age: {int(age_days)} days)")
         
         # Parse data into the Pydantic model to ensure type safety
-        return RestaurantProfile(**data)
+        profile = RestaurantProfile(**data)
+
+        # Keep it in L1, but never past the hard maximum age
+        remaining_seconds = (CACHE_MAX_STALE_DAYS - age_days) * 86400
+        _profile_l1.set(place_id, profile, ttl=min(PROFILE_L1_TTL_SECONDS, remaining_seconds))
+        return profile
 
     except Exception as e:
         print(f"Error reading restaurant profile from Firestore for place_id {place_id}: {e}")
@@ -95,12 +147,46 @@ def save_restaurant_profile(profile: RestaurantProfile) -> bool:
         data_to_save = profile.model_dump()
         
         doc_ref.set(data_to_save)
+        invalidate_restaurant_profile(profile.place_id)
         print(f"Successfully saved profile for place_id: {profile.place_id} to Firestore.")
         return True
     except Exception as e:
         print(f"Error writing restaurant profile to Firestore for place_id {profile.place_id}: {e}")
         return False
 
+async def get_restaurant_profile_async(place_id: str, allow_stale: bool = False) -> Optional[RestaurantProfile]:
+    """
+    Non-blocking get_restaurant_profile for async request handlers.
+    L1 hits are answered on the event loop; misses go to Firestore on the shared I/O pool.
+    """
+    profile = _profile_l1.get(place_id)
+    if profile is None:
+        profile = await run_firestore(_load_restaurant_profile, place_id)
+    return _apply_soft_ttl(place_id, profile, allow_stale)
+
+
+async def save_restaurant_profile_async(profile: RestaurantProfile) -> bool:
+    """Non-blocking save_restaurant_profile for async callers."""
+    return await run_firestore(save_restaurant_profile, profile)
+
+
+def invalidate_restaurant_profile(place_id: str) -> bool:
+    """
+    Drops a profile from the in-process L1 tier.
+
+    Args:
+        place_id: The Google Place ID of the restaurant.
+
+    Returns:
+        True if an L1 entry was removed.
+    """
+    return _profile_l1.invalidate(place_id)
+
+
+def get_profile_cache_stats() -> dict:
+    """Returns hit/miss/eviction counters of the L1 profile tier."""
+    return _profile_l1.stats()
+
 # You can add a simple test block if needed
 if __name__ == "__main__":
     
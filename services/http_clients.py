@@ -0,0 +1,182 @@
+"""
+Shared HTTP Clients - process-lifetime httpx.AsyncClient pools per provider
+One keep-alive pool per outbound provider (Serper, Jina, Google APIs, image CDNs),
+so repeat calls reuse TLS connections instead of handshaking every request.
+Clients are created lazily and closed by the FastAPI lifespan.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+HTTP_DEFAULT_TIMEOUT_SECONDS = float(os.getenv("HTTP_DEFAULT_TIMEOUT_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_MAX_CONNECTIONS_PER_POOL = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_POOL", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("true", "1", "yes")
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Timeout and pool size of one provider's client"""
+    timeout: float = HTTP_DEFAULT_TIMEOUT_SECONDS
+    max_connections: int = HTTP_MAX_CONNECTIONS_PER_POOL
+    http2: bool = True
+
+
+# Pool name -> config; call sites pick the pool for the provider they talk to
+POOLS: Dict[str, PoolConfig] = {
+    "serper": PoolConfig(timeout=10),
+    "jina": PoolConfig(timeout=45),
+    "google_maps": PoolConfig(timeout=10),
+    "google_search": PoolConfig(timeout=10),
+    # Many CDN hosts (lh3.googleusercontent.com, fbcdn, ...) share one larger pool
+    "images": PoolConfig(timeout=30, max_connections=HTTP_MAX_CONNECTIONS_PER_POOL * 2),
+    "default": PoolConfig(),
+}
+
+
+class _HostStats:
+    __slots__ = ("requests", "responses", "errors", "new_connections", "http2", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.http2 = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+
+class HttpClientRegistry:
+    """
+    Lazily created AsyncClient per pool name
+
+    Clients are bound to the event loop that created them; a call from another
+    loop (scripts and tests running several asyncio.run()) gets a fresh client.
+    """
+
+    def __init__(self, pools: Dict[str, PoolConfig]):
+        self.pools = pools
+        self._clients: Dict[str, Tuple[httpx.AsyncClient, Optional[asyncio.AbstractEventLoop]]] = {}
+        self._hosts: Dict[str, _HostStats] = {}
+        self._clients_created = 0
+
+    def get(self, pool: str = "default") -> httpx.AsyncClient:
+        """The shared client for a pool (unknown names use the default pool config)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        entry = self._clients.get(pool)
+        if entry is not None and not entry[0].is_closed and entry[1] is loop:
+            return entry[0]
+
+        client = self._create(self.pools.get(pool, self.pools["default"]))
+        self._clients[pool] = (client, loop)
+        self._clients_created += 1
+        return client
+
+    def _create(self, config: PoolConfig) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=HTTP2_ENABLED and _H2_AVAILABLE and config.http2,
+            timeout=httpx.Timeout(config.timeout, connect=min(config.timeout, HTTP_CONNECT_TIMEOUT_SECONDS)),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_connections,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+
+    def _host(self, request: httpx.Request) -> _HostStats:
+        host = request.url.host
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = _HostStats()
+        return stats
+
+    async def _on_request(self, request: httpx.Request):
+        stats = self._host(request)
+        stats.requests += 1
+        request.extensions["http_clients_start"] = time.perf_counter()
+
+        async def trace(event: str, info: Dict[str, Any]):
+            # httpcore emits connect_tcp only when the pool had no reusable connection
+            if event == "connection.connect_tcp.complete":
+                stats.new_connections += 1
+
+        request.extensions["trace"] = trace
+
+    async def _on_response(self, response: httpx.Response):
+        request = response.request
+        stats = self._host(request)
+        stats.responses += 1
+        # Time to response headers (bodies are streamed by the caller)
+        elapsed = time.perf_counter() - request.extensions.get("http_clients_start", time.perf_counter())
+        stats.latency_total += elapsed
+        stats.latency_max = max(stats.latency_max, elapsed)
+        if response.http_version == "HTTP/2":
+            stats.http2 += 1
+        if response.status_code >= 400:
+            stats.errors += 1
+
+    async def aclose(self):
+        """Close every client created on the current loop (others cannot be awaited here)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        clients, self._clients = self._clients, {}
+        for client, client_loop in clients.values():
+            if client_loop is loop and not client.is_closed:
+                await client.aclose()
+        print(f"[HttpClients] Closed {len(clients)} client(s)")
+
+    def stats(self) -> Dict[str, Any]:
+        hosts = {}
+        for host, s in self._hosts.items():
+            hosts[host] = {
+                "requests": s.requests,
+                "responses": s.responses,
+                "error_responses": s.errors,
+                "new_connections": s.new_connections,
+                "connection_reuse_rate": 1 - s.new_connections / s.requests if s.requests else 0.0,
+                "http2_responses": s.http2,
+                "avg_latency_ms": s.latency_total / s.responses * 1000 if s.responses else 0.0,
+                "max_latency_ms": s.latency_max * 1000,
+            }
+        return {
+            "pools_open": sorted(name for name, (client, _) in self._clients.items() if not client.is_closed),
+            "clients_created": self._clients_created,
+            "http2_enabled": HTTP2_ENABLED and _H2_AVAILABLE,
+            "hosts": hosts,
+        }
+
+
+http_clients = HttpClientRegistry(POOLS)
+
+
+def get_client(pool: str = "default") -> httpx.AsyncClient:
+    """Shared AsyncClient for a provider pool; do not close it (the app lifespan does)"""
+    return http_clients.get(pool)
+
+
+async def close_clients():
+    await http_clients.aclose()
+
+
+def get_http_stats() -> Dict[str, Any]:
+    """Per-host request counts, connection reuse, HTTP/2 share and latency"""
+    return http_clients.stats()
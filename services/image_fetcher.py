@@ -0,0 +1,183 @@
+"""
+Image Fetcher - bounded-concurrency image downloads prepared for Gemini Vision
+Streams each image with a byte cap, rejects non-images by content-type before
+reading the body, and downscales/re-encodes to JPEG off the event loop so the
+base64 payload sent to the model stays small.
+"""
+
+import asyncio
+import base64
+import io
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from services.http_clients import get_client
+from services.image_fingerprint import ImageFingerprint, fingerprint
+
+IMAGE_FETCH_CONCURRENCY = int(os.getenv("IMAGE_FETCH_CONCURRENCY", "8"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Longest side after downscaling: classification only needs a glance, OCR needs legible text
+IMAGE_CLASSIFY_MAX_DIMENSION = int(os.getenv("IMAGE_CLASSIFY_MAX_DIMENSION", "768"))
+IMAGE_OCR_MAX_DIMENSION = int(os.getenv("IMAGE_OCR_MAX_DIMENSION", "1600"))
+
+# Served without a useful content-type by some CDNs; the decoder decides
+_UNTYPED_CONTENT_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+
+_stats = {
+    "fetched": 0,
+    "rejected_content_type": 0,
+    "rejected_too_large": 0,
+    "rejected_undecodable": 0,
+    "failed": 0,
+    "re_encoded": 0,
+    "bytes_downloaded": 0,
+    "bytes_prepared": 0,
+}
+
+
+class ImageRejected(Exception):
+    """The URL did not yield a usable image (wrong type, too large, undecodable)"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+@dataclass
+class FetchedImage:
+    """A downloaded image ready for the model (JPEG unless left untouched)"""
+    url: str
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    fingerprint: Optional[ImageFingerprint] = None
+
+    def to_part(self) -> Dict[str, str]:
+        """Gemini inline image part"""
+        return {"mime_type": self.mime_type, "data": base64.b64encode(self.data).decode("utf-8")}
+
+
+def prepare_image(raw: bytes, max_dimension: int, quality: int = IMAGE_JPEG_QUALITY) -> tuple:
+    """
+    Decode, apply EXIF orientation, downscale to max_dimension and re-encode as JPEG
+    Small JPEGs that need no change are passed through as-is.
+    Returns (data, mime_type, width, height); CPU-bound, run it in a thread.
+    """
+    try:
+        image = Image.open(io.BytesIO(raw))
+        source_format, source_size = image.format, image.size
+        if source_format == "JPEG" and max(source_size) > max_dimension:
+            # Let the JPEG decoder skip detail we would throw away (DCT scaling). draft() keeps
+            # both sides >= the requested size, so ask for the aspect-correct target, not a square
+            scale = max_dimension / max(source_size)
+            image.draft("RGB", (max(1, int(source_size[0] * scale)), max(1, int(source_size[1] * scale))))
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageRejected("undecodable", f"not a decodable image: {e}")
+
+    upright = image.getexif().get(0x0112, 1) == 1  # EXIF Orientation
+    oriented = image if upright else ImageOps.exif_transpose(image)
+    width, height = oriented.size
+    needs_resize = max(width, height) > max_dimension
+    if source_format == "JPEG" and not needs_resize and upright and image.size == source_size:
+        return raw, "image/jpeg", width, height
+
+    if needs_resize:
+        oriented.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    if oriented.mode != "RGB":
+        # Flatten transparency onto white (menus are dark text on light backgrounds)
+        rgba = oriented.convert("RGBA")
+        flat = Image.new("RGB", rgba.size, (255, 255, 255))
+        flat.paste(rgba, mask=rgba.getchannel("A"))
+        oriented = flat
+    out = io.BytesIO()
+    oriented.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue(), "image/jpeg", oriented.width, oriented.height
+
+
+def _prepare_and_fingerprint(raw: bytes, max_dimension: int) -> tuple:
+    data, mime_type, width, height = prepare_image(raw, max_dimension)
+    return data, mime_type, width, height, fingerprint(raw, preview=data)
+
+
+async def _download(client: httpx.AsyncClient, url: str, max_bytes: int) -> bytes:
+    async with client.stream("GET", url, follow_redirects=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if not content_type.startswith("image/") and content_type not in _UNTYPED_CONTENT_TYPES:
+            raise ImageRejected("content_type", f"content-type {content_type}")
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ImageRejected("too_large", f"{declared} bytes declared (limit {max_bytes})")
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageRejected("too_large", f"over {max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+async def fetch_image(
+    url: str,
+    max_dimension: int = IMAGE_OCR_MAX_DIMENSION,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    client: Optional[httpx.AsyncClient] = None
+) -> Optional[FetchedImage]:
+    """Download and prepare one image; None (logged) if it cannot be used"""
+    client = client or get_client("images")
+    try:
+        raw = await _download(client, url, max_bytes)
+        _stats["bytes_downloaded"] += len(raw)
+        data, mime_type, width, height, fp = await asyncio.to_thread(_prepare_and_fingerprint, raw, max_dimension)
+    except ImageRejected as e:
+        _stats[f"rejected_{e.reason}"] += 1
+        print(f"[ImageFetcher] Skipped {url[:60]}: {e}")
+        return None
+    except Exception as e:
+        _stats["failed"] += 1
+        print(f"[ImageFetcher] Failed to download image {url[:60]}: {e}")
+        return None
+
+    _stats["fetched"] += 1
+    _stats["bytes_prepared"] += len(data)
+    if data is not raw:
+        _stats["re_encoded"] += 1
+    return FetchedImage(
+        url=url, data=data, mime_type=mime_type, width=width, height=height,
+        original_bytes=len(raw), fingerprint=fp
+    )
+
+
+async def fetch_images(
+    urls: Sequence[str],
+    max_dimension: int = IMAGE_OCR_MAX_DIMENSION,
+    concurrency: int = IMAGE_FETCH_CONCURRENCY,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    client: Optional[httpx.AsyncClient] = None
+) -> List[FetchedImage]:
+    """Download urls with at most `concurrency` in flight; usable images in input order"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(url: str) -> Optional[FetchedImage]:
+        async with semaphore:
+            return await fetch_image(url, max_dimension=max_dimension, max_bytes=max_bytes, client=client)
+
+    results = await asyncio.gather(*(fetch(url) for url in urls))
+    images = [image for image in results if image is not None]
+    print(f"[ImageFetcher] {len(images)}/{len(urls)} images ready "
+          f"({sum(i.original_bytes for i in images) // 1024} KB → {sum(len(i.data) for i in images) // 1024} KB)")
+    return images
+
+
+def get_image_fetch_stats() -> Dict[str, Any]:
+    return dict(_stats)
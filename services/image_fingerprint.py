@@ -0,0 +1,159 @@
+"""
+Image Fingerprint - content + perceptual hashes for menu photos
+Google Maps photo sets repeat heavily (the same menu board shot by many reviewers,
+re-crawled on every refresh). A SHA-256 of the downloaded bytes identifies exact
+copies: is_menu / OCR results are cached by it across restaurants. A 256-bit dHash
+plus the aspect ratio drops re-encoded / resized copies within one batch only;
+different pages of a text menu share a layout, so perceptual matches are never
+used to reuse results.
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from PIL import Image
+
+from services.memory_cache import BoundedTTLCache
+
+IMAGE_DHASH_SIZE = 16  # 16x16 gradient bits -> 256-bit hash (8x8 cannot tell menu pages apart)
+# Hamming distance (of 256 bits) at or below which two images in a batch count as the same photo
+IMAGE_DUPLICATE_MAX_DISTANCE = int(os.getenv("IMAGE_DUPLICATE_MAX_DISTANCE", "6"))
+# Relative aspect ratio difference tolerated between copies (resizes keep it, crops do not)
+IMAGE_DUPLICATE_MAX_ASPECT_DELTA = float(os.getenv("IMAGE_DUPLICATE_MAX_ASPECT_DELTA", "0.02"))
+IMAGE_CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CLASSIFICATION_CACHE_MAX_ENTRIES", "20000"))
+IMAGE_CLASSIFICATION_CACHE_TTL_SECONDS = float(os.getenv("IMAGE_CLASSIFICATION_CACHE_TTL_SECONDS", str(30 * 86400)))
+IMAGE_OCR_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_OCR_CACHE_MAX_ENTRIES", "2000"))
+IMAGE_OCR_CACHE_MAX_BYTES = int(os.getenv("IMAGE_OCR_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+IMAGE_OCR_CACHE_TTL_SECONDS = float(os.getenv("IMAGE_OCR_CACHE_TTL_SECONDS", str(7 * 86400)))
+
+T = TypeVar("T")
+
+_stats = {"fingerprinted": 0, "batches_deduped": 0, "duplicates_dropped": 0}
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    """Exact (sha256 of the original bytes) and perceptual (dHash, aspect ratio) identity of an image"""
+    sha256: str
+    dhash: int
+    aspect: float  # width / height
+
+    def distance(self, other: "ImageFingerprint") -> int:
+        """Hamming distance between the perceptual hashes (0 = same picture)"""
+        return (self.dhash ^ other.dhash).bit_count()
+
+    def is_duplicate_of(self, other: "ImageFingerprint", max_distance: int = IMAGE_DUPLICATE_MAX_DISTANCE) -> bool:
+        if self.sha256 == other.sha256:
+            return True
+        if abs(math.log(self.aspect / other.aspect)) > IMAGE_DUPLICATE_MAX_ASPECT_DELTA:
+            return False
+        return self.distance(other) <= max_distance
+
+
+def dhash(image: Image.Image, hash_size: int = IMAGE_DHASH_SIZE) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale copy"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def fingerprint(raw: bytes, preview: Optional[bytes] = None) -> ImageFingerprint:
+    """
+    Fingerprint an image; CPU-bound, run it in a thread
+    raw is the file as downloaded; preview, if given, is a smaller encoding of the same
+    picture (e.g. prepare_image output) that is cheaper to decode for the dHash.
+    """
+    image = Image.open(io.BytesIO(preview if preview is not None else raw))
+    width, height = image.size
+    if image.format == "JPEG":
+        image.draft("L", (IMAGE_DHASH_SIZE * 8, IMAGE_DHASH_SIZE * 8))
+    _stats["fingerprinted"] += 1
+    return ImageFingerprint(
+        sha256=hashlib.sha256(raw).hexdigest(), dhash=dhash(image), aspect=width / max(1, height)
+    )
+
+
+def dedupe(items: Sequence[T], key: Callable[[T], Optional[ImageFingerprint]],
+           max_distance: int = IMAGE_DUPLICATE_MAX_DISTANCE) -> List[T]:
+    """Keep the first of each group of near-duplicates within one batch, in input order (no fingerprint: always kept)"""
+    kept: List[T] = []
+    seen: List[ImageFingerprint] = []
+    for item in items:
+        fp = key(item)
+        if fp is not None:
+            if any(fp.is_duplicate_of(other, max_distance) for other in seen):
+                continue
+            seen.append(fp)
+        kept.append(item)
+
+    dropped = len(items) - len(kept)
+    _stats["batches_deduped"] += 1
+    _stats["duplicates_dropped"] += dropped
+    if dropped:
+        print(f"[ImageFingerprint] Dropped {dropped}/{len(items)} near-duplicate images")
+    return kept
+
+
+class FingerprintCache:
+    """
+    Results keyed by a set of images (one image, or an OCR batch), bounded LRU with TTL
+
+    Keys are the sha256s of the downloaded bytes only: a perceptual match may be a
+    different page of the same menu (or another restaurant's menu on the same template).
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float, max_bytes: int = 0):
+        self._cache = BoundedTTLCache(
+            name,
+            max_entries=max_entries,
+            default_ttl=ttl,
+            max_bytes=max_bytes,
+            size_of=lambda value: len(json.dumps(value, ensure_ascii=False).encode("utf-8")),
+        )
+
+    def _key(self, fingerprints: Sequence[ImageFingerprint]) -> tuple:
+        return tuple(sorted({fp.sha256 for fp in fingerprints}))
+
+    def get(self, fingerprints: Sequence[ImageFingerprint]) -> Optional[Any]:
+        if not fingerprints:
+            return None
+        return self._cache.get(self._key(fingerprints))
+
+    def set(self, fingerprints: Sequence[ImageFingerprint], value: Any) -> None:
+        if fingerprints:
+            self._cache.set(self._key(fingerprints), value)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# is_menu per image, shared by MenuParser._classify_images and pipeline.vision.image_filter
+classification_cache = FingerprintCache(
+    "image_classifications", IMAGE_CLASSIFICATION_CACHE_MAX_ENTRIES, IMAGE_CLASSIFICATION_CACHE_TTL_SECONDS
+)
+# Raw OCR item dicts per image (pipeline.vision) or per OCR batch (MenuParser.parse_from_images)
+ocr_cache = FingerprintCache(
+    "image_ocr", IMAGE_OCR_CACHE_MAX_ENTRIES, IMAGE_OCR_CACHE_TTL_SECONDS,
+    max_bytes=IMAGE_OCR_CACHE_MAX_BYTES
+)
+
+
+def get_image_fingerprint_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "classification_cache": classification_cache.stats(),
+        "ocr_cache": ocr_cache.stats(),
+    }
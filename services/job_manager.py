@@ -1,8 +1,32 @@
+import asyncio
+import math
+import os
+import time
 import uuid
+from collections import deque
 from datetime import datetime, timezone
 from firebase_admin import firestore
 from enum import Enum
-from typing import Dict, Any, Optional
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Set, Tuple
+
+from services.firestore_async import run_firestore
+from services.memory_cache import BoundedTTLCache
+
+# Write-behind: intermediate progress updates of a job are merged and written to
+# Firestore at most once per window; completed/failed are always written at once
+JOB_PROGRESS_FLUSH_SECONDS = float(os.getenv("JOB_PROGRESS_FLUSH_SECONDS", "2"))
+# How long finished jobs stay readable from memory (results, alternatives lookups)
+JOB_FINISHED_RETENTION_SECONDS = float(os.getenv("JOB_FINISHED_RETENTION_SECONDS", "900"))
+
+# Scheduler lanes: (workers, max queued jobs). Warm starts are cheap (~2s), cold
+# starts hold Apify runs and several Gemini calls, prefetch (also stale profile
+# refreshes) is best effort.
+SCHEDULER_LANES = {
+    "warm": (int(os.getenv("JOB_WARM_WORKERS", "8")), int(os.getenv("JOB_WARM_QUEUE", "64"))),
+    "cold": (int(os.getenv("JOB_COLD_WORKERS", "2")), int(os.getenv("JOB_COLD_QUEUE", "16"))),
+    "prefetch": (int(os.getenv("JOB_PREFETCH_WORKERS", "1")), int(os.getenv("JOB_PREFETCH_QUEUE", "8"))),
+}
+SCHEDULER_MAX_RETRY_AFTER = int(os.getenv("JOB_MAX_RETRY_AFTER_SECONDS", "60"))
 
 class JobStatus(Enum):
     PENDING = "pending"
@@ -10,9 +34,80 @@ class JobStatus(Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+TERMINAL_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+
+class JobEventBroker:
+    """
+    In-process pub/sub of job status changes (feeds the SSE progress stream)
+
+    Each subscriber gets its own bounded asyncio.Queue bound to the loop it
+    subscribed from. publish() is safe to call from any thread: events are
+    handed to the subscriber's loop with call_soon_threadsafe.
+    """
+
+    def __init__(self, max_queue_size: int = 64):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers.setdefault(job_id, []).append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id, [])
+        self._subscribers[job_id] = [(loop, q) for loop, q in subscribers if q is not queue]
+        if not self._subscribers[job_id]:
+            self._subscribers.pop(job_id, None)
+
+    def publish(self, job_id: str, event: Dict[str, Any]):
+        self._stats["published"] += 1
+        for loop, queue in list(self._subscribers.get(job_id, [])):
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                pass  # Subscriber's loop is closed
+
+    def _deliver(self, queue: asyncio.Queue, event: Dict[str, Any]):
+        if queue.full():
+            # Slow consumer: drop the oldest update, the newest one supersedes it
+            queue.get_nowait()
+            self._stats["dropped"] += 1
+        queue.put_nowait(event)
+        self._stats["delivered"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._stats,
+            "subscribers": sum(len(subs) for subs in self._subscribers.values()),
+        }
+
 class JobManager:
+    """
+    Recommendation job store
+
+    The in-memory state of jobs created on this instance is authoritative and
+    serves reads; Firestore (when available) is written behind for other
+    instances and restarts. The async API collapses progress updates within
+    JOB_PROGRESS_FLUSH_SECONDS into one write and flushes terminal states
+    immediately; the sync API writes through.
+    """
+
     def __init__(self):
         self.memory_store = {}
+        self.events = JobEventBroker()
+        # Finished jobs leave memory_store (Firestore mode) but stay readable here for a while
+        self._finished = BoundedTTLCache("finished_jobs", max_entries=2048, default_ttl=JOB_FINISHED_RETENTION_SECONDS)
+        # Write-behind state, per job
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._flush_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flush_locks: Dict[str, asyncio.Lock] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._write_counts: Dict[str, Dict[str, int]] = {}
+        self._write_totals = {"jobs": 0, "updates": 0, "writes": 0, "write_errors": 0}
+        self._recent_write_counts = deque(maxlen=50)
         try:
             self.db = firestore.client()
             self.collection = self.db.collection('recommendation_jobs')
@@ -34,13 +129,29 @@ class JobManager:
         }
         
         if self.collection:
+            # Written through: the job must be visible to other instances right away
             self.collection.document(job_id).set(job_data)
-        else:
-            self.memory_store[job_id] = job_data
+            self._write_counts[job_id] = {"updates": 0, "writes": 0}
+            self._last_flush[job_id] = time.monotonic()
+        self.memory_store[job_id] = dict(job_data)
             
         return job_id
 
     def update_status(self, job_id: str, status: JobStatus, progress: int = 0, message: str = "", result: Optional[Dict] = None, error: Optional[str] = None):
+        update_data = self._build_update(status, progress, message, result, error)
+        self._publish(job_id, update_data)
+        self._apply(job_id, update_data)
+
+        if self.collection:
+            counts = self._write_counts.setdefault(job_id, {"updates": 0, "writes": 0})
+            counts["updates"] += 1
+            counts["writes"] += 1
+            self._write_update(job_id, update_data)
+
+        if update_data["status"] in TERMINAL_STATUSES:
+            self._finish(job_id)
+
+    def _build_update(self, status: JobStatus, progress: int, message: str, result: Optional[Dict], error: Optional[str]) -> Dict[str, Any]:
         update_data = {
             "status": status.value,
             "updated_at": datetime.now(timezone.utc),
@@ -53,20 +164,242 @@ class JobManager:
         
         if error:
             update_data["error"] = error
-            
-        if self.collection:
-            self.collection.document(job_id).update(update_data)
-        elif job_id in self.memory_store:
+
+        return update_data
+
+    def _publish(self, job_id: str, update_data: Dict[str, Any]):
+        """Notify stream subscribers of this instance before the (slower) Firestore write"""
+        self.events.publish(job_id, {"job_id": job_id, **update_data})
+
+    def _apply(self, job_id: str, update_data: Dict[str, Any]):
+        if job_id in self.memory_store:
             self.memory_store[job_id].update(update_data)
 
+    def _write_update(self, job_id: str, update_data: Dict[str, Any]):
+        self.collection.document(job_id).update(update_data)
+
+    def _finish(self, job_id: str):
+        """Drop write-behind state of a finished job and record its write counters"""
+        timer = self._flush_timers.pop(job_id, None)
+        if timer:
+            timer.cancel()
+        self._pending.pop(job_id, None)
+        self._last_flush.pop(job_id, None)
+        self._flush_locks.pop(job_id, None)
+
+        if self.collection and job_id in self.memory_store:
+            self._finished.set(job_id, self.memory_store.pop(job_id))
+
+        counts = self._write_counts.pop(job_id, None)
+        if counts:
+            saved = counts["updates"] - counts["writes"]
+            self._write_totals["jobs"] += 1
+            self._write_totals["updates"] += counts["updates"]
+            self._write_totals["writes"] += counts["writes"]
+            self._recent_write_counts.append({"job_id": job_id, **counts, "saved": saved})
+            print(f"[JobManager] Job {job_id} finished: {counts['updates']} updates, {counts['writes']} writes ({saved} saved)")
+
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.memory_store.get(job_id) or self._finished.get(job_id)
+        if job:
+            return dict(job)
+
         if self.collection:
             doc = self.collection.document(job_id).get()
             if doc.exists:
                 return doc.to_dict()
-            return None
-        else:
-            return self.memory_store.get(job_id)
+        return None
+
+    def write_stats(self) -> Dict[str, Any]:
+        """Firestore writes avoided by write-behind, in total and for recently finished jobs"""
+        return {
+            **self._write_totals,
+            "saved": self._write_totals["updates"] - self._write_totals["writes"],
+            "flush_window_seconds": JOB_PROGRESS_FLUSH_SECONDS,
+            "pending_jobs": len(self._pending),
+            "recent_jobs": list(self._recent_write_counts),
+        }
+
+    # --- Non-blocking variants for async handlers (Firestore I/O runs on the shared pool) ---
+
+    async def create_job_async(self, user_input: Dict[str, Any]) -> str:
+        return await run_firestore(self.create_job, user_input)
+
+    async def update_status_async(self, job_id: str, status: JobStatus, progress: int = 0, message: str = "", result: Optional[Dict] = None, error: Optional[str] = None):
+        update_data = self._build_update(status, progress, message, result, error)
+        self._publish(job_id, update_data)
+        self._apply(job_id, update_data)
+
+        if not self.collection:
+            if update_data["status"] in TERMINAL_STATUSES:
+                self._finish(job_id)
+            return
+
+        self._write_counts.setdefault(job_id, {"updates": 0, "writes": 0})["updates"] += 1
+        self._pending.setdefault(job_id, {}).update(update_data)
+
+        if update_data["status"] in TERMINAL_STATUSES:
+            timer = self._flush_timers.pop(job_id, None)
+            if timer:
+                timer.cancel()
+            try:
+                await self._flush(job_id)
+            finally:
+                self._finish(job_id)
+            return
+
+        if job_id not in self._flush_timers:
+            elapsed = time.monotonic() - self._last_flush.get(job_id, 0.0)
+            delay = max(0.0, JOB_PROGRESS_FLUSH_SECONDS - elapsed)
+            self._flush_timers[job_id] = asyncio.get_running_loop().call_later(delay, self._start_flush, job_id)
+
+    def _start_flush(self, job_id: str):
+        """Timer callback: write the merged pending progress of a job in the background"""
+        self._flush_timers.pop(job_id, None)
+
+        async def flush():
+            try:
+                await self._flush(job_id)
+            except Exception as e:
+                print(f"[JobManager] Deferred write failed for job {job_id}: {e}")
+
+        task = asyncio.create_task(flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, job_id: str):
+        # One write per job at a time, so a late progress write can't land after the final state
+        lock = self._flush_locks.setdefault(job_id, asyncio.Lock())
+        async with lock:
+            update_data = self._pending.pop(job_id, None)
+            if not update_data:
+                return
+            self._last_flush[job_id] = time.monotonic()
+            if job_id in self._write_counts:
+                self._write_counts[job_id]["writes"] += 1
+            try:
+                await run_firestore(self._write_update, job_id, update_data)
+            except Exception:
+                self._write_totals["write_errors"] += 1
+                raise
+
+    async def get_job_async(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.memory_store.get(job_id) or self._finished.get(job_id)
+        if job:
+            return dict(job)
+        return await run_firestore(self.get_job, job_id)
+
+class SchedulerSaturated(Exception):
+    """Raised when a scheduler lane's queue is full; carries a Retry-After hint in seconds"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"Scheduler lane '{lane}' is saturated, retry after {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+class JobScheduler:
+    """
+    Bounded asyncio job queues with a fixed worker pool per lane
+
+    Lanes keep cheap warm-start jobs from queuing behind cold starts and
+    prefetches. A full lane rejects new work with SchedulerSaturated instead of
+    starting unbounded pipeline runs. Workers start lazily on the running loop.
+    """
+
+    def __init__(self, lanes: Dict[str, Tuple[int, int]] = None):
+        self.lanes = dict(lanes or SCHEDULER_LANES)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._stats = {
+            lane: {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "running": 0,
+                   "total_wait_ms": 0.0, "max_wait_ms": 0.0, "total_run_ms": 0.0}
+            for lane in self.lanes
+        }
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First use (or a new event loop): build queues and start the worker pools
+        self._loop = loop
+        self._queues = {lane: asyncio.Queue(maxsize=limit) for lane, (_, limit) in self.lanes.items()}
+        self._workers = [
+            loop.create_task(self._worker(lane))
+            for lane, (workers, _) in self.lanes.items()
+            for _ in range(workers)
+        ]
+        print("[JobScheduler] Started lanes: " + ", ".join(f"{lane}={w} workers/{q} queued" for lane, (w, q) in self.lanes.items()))
+
+    def check_capacity(self, lane: str):
+        """Raise SchedulerSaturated if the lane cannot accept another job right now"""
+        self._ensure_started()
+        if self._queues[lane].full():
+            self._stats[lane]["rejected"] += 1
+            raise SchedulerSaturated(lane, self._retry_after(lane))
+
+    def submit(self, lane: str, fn: Callable[[], Awaitable[Any]], label: str = ""):
+        """Queue a coroutine function on a lane (raises SchedulerSaturated when the lane is full)"""
+        self._ensure_started()
+        try:
+            self._queues[lane].put_nowait((time.monotonic(), fn, label))
+        except asyncio.QueueFull:
+            self._stats[lane]["rejected"] += 1
+            raise SchedulerSaturated(lane, self._retry_after(lane))
+        self._stats[lane]["submitted"] += 1
+
+    def _retry_after(self, lane: str) -> int:
+        """Rough time until a queue slot frees up: queued jobs x mean run time / workers"""
+        stats = self._stats[lane]
+        finished = stats["completed"] + stats["failed"]
+        mean_run_s = stats["total_run_ms"] / finished / 1000 if finished else 5.0
+        workers, _ = self.lanes[lane]
+        estimate = mean_run_s * (self._queues[lane].qsize() + 1) / max(workers, 1)
+        return max(1, min(SCHEDULER_MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    async def _worker(self, lane: str):
+        queue = self._queues[lane]
+        stats = self._stats[lane]
+        while True:
+            enqueued_at, fn, label = await queue.get()
+            started = time.monotonic()
+            wait_ms = (started - enqueued_at) * 1000
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+            stats["running"] += 1
+            try:
+                await fn()
+                stats["completed"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"[JobScheduler] {lane} job {label} failed: {e}")
+            finally:
+                stats["running"] -= 1
+                stats["total_run_ms"] += (time.monotonic() - started) * 1000
+                queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-lane queue depth, utilisation and wait/run times"""
+        result = {}
+        for lane, (workers, limit) in self.lanes.items():
+            stats = self._stats[lane]
+            started = stats["completed"] + stats["failed"] + stats["running"]
+            finished = stats["completed"] + stats["failed"]
+            result[lane] = {
+                "workers": workers,
+                "queue_limit": limit,
+                "queue_depth": self._queues[lane].qsize() if lane in self._queues else 0,
+                "running": stats["running"],
+                "submitted": stats["submitted"],
+                "rejected": stats["rejected"],
+                "completed": stats["completed"],
+                "failed": stats["failed"],
+                "avg_wait_ms": round(stats["total_wait_ms"] / started, 1) if started else 0.0,
+                "max_wait_ms": round(stats["max_wait_ms"], 1),
+                "avg_run_ms": round(stats["total_run_ms"] / finished, 1) if finished else 0.0,
+            }
+        return result
 
-# Global instance
+# Global instances
 job_manager = JobManager()
+job_scheduler = JobScheduler()
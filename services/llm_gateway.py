@@ -0,0 +1,445 @@
+"""
+LLM Gateway - single entry point for Gemini generate_content calls
+
+Responses are cached under a hash of (model name, generation config, model
+options, contents) in a bounded in-memory tier and, when LLM_CACHE_DIR is set,
+an on-disk tier with its own TTL, so retries, profile refreshes and reruns of an
+identical prompt don't hit the API again. Counters per call site report hit
+rate, tokens used and tokens saved.
+
+Calls that miss the cache pass through one process-wide limiter: at most
+LLM_MAX_IN_FLIGHT concurrent requests within requests-per-minute and
+tokens-per-minute budgets. Waiting calls are served interactive-first; code
+doing background work (prefetch, profile refresh) runs under
+`llm_priority(PRIORITY_BACKGROUND)`.
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+
+from services.memory_cache import BoundedTTLCache
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Optional persistent tier (e.g. a mounted volume); disabled when empty
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+LLM_CACHE_DISK_TTL_SECONDS = float(os.getenv("LLM_CACHE_DISK_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Limiter budgets (0 disables the RPM/TPM budget)
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+# Output tokens assumed per call until the real usage is known
+LLM_ESTIMATED_OUTPUT_TOKENS = int(os.getenv("LLM_ESTIMATED_OUTPUT_TOKENS", "1024"))
+# Pause dispatching for this long after the API answers 429 (ResourceExhausted)
+LLM_RATE_LIMIT_COOLDOWN_SECONDS = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN_SECONDS", "5"))
+# llm_overloaded(): all slots busy and at least this many calls queued
+LLM_OVERLOAD_QUEUE_DEPTH = int(os.getenv("LLM_OVERLOAD_QUEUE_DEPTH", "4"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Run LLM calls made in this block (and tasks created in it) at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass
+class LLMResponse:
+    """Text of a generate_content response plus token usage (drop-in for `response.text`)"""
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cache_tier: Optional[str] = None  # "memory" / "disk" when served from cache
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+
+_memory = BoundedTTLCache(
+    "llm_responses",
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    default_ttl=LLM_CACHE_TTL_SECONDS,
+    max_bytes=LLM_CACHE_MAX_BYTES,
+    size_of=lambda response: len(response.text.encode("utf-8"))
+)
+
+_call_sites: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+    "calls": 0, "hits": 0, "disk_hits": 0, "errors": 0,
+    "tokens_used": 0, "tokens_saved": 0, "total_latency_ms": 0.0, "queue_wait_ms": 0.0,
+})
+
+
+def _hash_part(h, part: Any) -> None:
+    """Feed one piece of `contents` into the hash (length-prefixed so parts can't run together)"""
+    if isinstance(part, str):
+        data = part.encode("utf-8")
+        h.update(b"s%d:" % len(data))
+        h.update(data)
+    elif isinstance(part, (bytes, bytearray)):
+        h.update(b"b%d:" % len(part))
+        h.update(part)
+    elif isinstance(part, dict):
+        # Inline blobs, e.g. {"mime_type": "image/jpeg", "data": <base64 or bytes>}
+        h.update(b"d%d:" % len(part))
+        for key in sorted(part):
+            _hash_part(h, str(key))
+            _hash_part(h, part[key])
+    elif isinstance(part, (list, tuple)):
+        h.update(b"l%d:" % len(part))
+        for item in part:
+            _hash_part(h, item)
+    elif hasattr(part, "tobytes") and hasattr(part, "size"):
+        # PIL images
+        _hash_part(h, f"image:{getattr(part, 'mode', '')}:{part.size}")
+        _hash_part(h, part.tobytes())
+    else:
+        _hash_part(h, repr(part))
+
+
+def cache_key(model_name: str, generation_config: Any, contents: Any, model_options: Optional[Dict[str, Any]] = None) -> str:
+    """Stable hash of everything that determines a response"""
+    h = hashlib.sha256()
+    _hash_part(h, model_name)
+    _hash_part(h, json.dumps(generation_config, sort_keys=True, default=str, ensure_ascii=False))
+    _hash_part(h, json.dumps(model_options or {}, sort_keys=True, default=str, ensure_ascii=False))
+    _hash_part(h, contents)
+    return h.hexdigest()
+
+
+class _TokenBucket:
+    """Continuously refilled budget of `per_minute` units (disabled when per_minute <= 0)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def clamp(self, amount: float) -> float:
+        # A single call bigger than the whole budget may still run once the bucket is full
+        return min(amount, self.capacity) if self.enabled else 0
+
+    def seconds_until(self, amount: float, now: float) -> float:
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float):
+        if self.enabled:
+            self._refill(now)
+            self.level -= amount  # May go negative after a usage correction; refills over time
+
+
+class LLMRateLimiter:
+    """
+    Priority admission control for LLM API calls
+
+    A call is admitted when an in-flight slot is free and both the request and
+    token buckets can cover it; otherwise it waits in a priority queue (FIFO
+    within a priority). Token usage is estimated up front and corrected with
+    the real usage on release.
+    """
+
+    def __init__(self, max_in_flight: int, requests_per_minute: float, tokens_per_minute: float):
+        self.max_in_flight = max_in_flight
+        self.requests = _TokenBucket(requests_per_minute)
+        self.tokens = _TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self._waiters: List[tuple] = []  # heap of (priority, seq, future, tokens)
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._cooldown_until = 0.0
+        self._stats = {"rate_limited_responses": 0, "peak_in_flight": 0, "peak_queue": 0}
+        self._wait_ms = {p: deque(maxlen=1000) for p in _PRIORITY_NAMES}
+        self._admitted = {p: 0 for p in _PRIORITY_NAMES}
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use or a new event loop: waiters of the old loop can't be woken anyway
+            self._loop = loop
+            self._waiters = []
+            self._timer = None
+            self.in_flight = 0
+
+    async def acquire(self, tokens: int, priority: int) -> float:
+        """Wait for admission; returns the time spent queued in ms"""
+        self._bind()
+        tokens = self.tokens.clamp(tokens)
+        started = time.monotonic()
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, tokens))
+        self._stats["peak_queue"] = max(self._stats["peak_queue"], len(self._waiters))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(tokens, tokens)  # Admitted just before the caller went away
+            raise
+
+        waited_ms = (time.monotonic() - started) * 1000
+        self._wait_ms[priority].append(waited_ms)
+        self._admitted[priority] += 1
+        return waited_ms
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None, rate_limited: bool = False):
+        """Free the in-flight slot and settle the token estimate against real usage"""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if actual_tokens is not None and actual_tokens != estimated_tokens:
+            self.tokens.take(actual_tokens - estimated_tokens, now)
+        if rate_limited:
+            self._stats["rate_limited_responses"] += 1
+            self._cooldown_until = now + LLM_RATE_LIMIT_COOLDOWN_SECONDS
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._waiters and self.in_flight < self.max_in_flight:
+            priority, _, future, tokens = self._waiters[0]
+            if future.done():  # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+
+            delay = max(
+                self._cooldown_until - now,
+                self.requests.seconds_until(1, now),
+                self.tokens.seconds_until(tokens, now),
+            )
+            if delay > 0:
+                # Head of the queue must wait for budget; lower priorities stay behind it
+                if self._timer is None:
+                    self._timer = self._loop.call_later(delay, self._on_timer)
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.in_flight += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self.in_flight)
+            future.set_result(None)
+
+    def saturated(self, max_queue: int) -> bool:
+        """Cooling down after a 429, or every slot busy with at least max_queue calls waiting"""
+        if time.monotonic() < self._cooldown_until:
+            return True
+        queued = sum(1 for _, _, future, _ in self._waiters if not future.done())
+        return self.in_flight >= self.max_in_flight and queued >= max_queue
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        queue_wait = {}
+        for priority, name in _PRIORITY_NAMES.items():
+            samples = sorted(self._wait_ms[priority])
+            queue_wait[name] = {
+                "admitted": self._admitted[priority],
+                "queued": sum(1 for p, _, f, _ in self._waiters if p == priority and not f.done()),
+                "p50_ms": round(samples[len(samples) // 2], 1) if samples else 0.0,
+                "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 1) if samples else 0.0,
+                "max_ms": round(samples[-1], 1) if samples else 0.0,
+            }
+        return {
+            **self._stats,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "queue_wait": queue_wait,
+        }
+
+
+_limiter = LLMRateLimiter(LLM_MAX_IN_FLIGHT, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+
+
+def _estimate_tokens(contents: Any) -> int:
+    """Rough prompt size (~3 characters per token, ~258 tokens per image) plus expected output"""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    prompt_tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            prompt_tokens += len(part) // 3 + 1
+        else:
+            prompt_tokens += 258
+    return prompt_tokens + LLM_ESTIMATED_OUTPUT_TOKENS
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    # google.api_core.exceptions.ResourceExhausted (HTTP 429)
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests") or getattr(error, "code", None) == 429
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(LLM_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _disk_get(key: str) -> Optional[LLMResponse]:
+    path = _disk_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > LLM_CACHE_DISK_TTL_SECONDS:
+            os.remove(path)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return LLMResponse(text=data["text"], prompt_tokens=data.get("prompt_tokens", 0), output_tokens=data.get("output_tokens", 0))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _disk_set(key: str, response: LLMResponse) -> None:
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"text": response.text, "prompt_tokens": response.prompt_tokens, "output_tokens": response.output_tokens}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)  # Atomic, concurrent writers can't leave a torn file
+    except OSError as e:
+        print(f"[LLMGateway] Disk cache write failed: {e}")
+
+
+def _usage(response) -> tuple:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0
+
+
+async def generate_content_async(
+    contents: Any,
+    model_name: str,
+    generation_config: Optional[Any] = None,
+    call_site: str = "unknown",
+    use_cache: bool = True,
+    **model_options
+) -> LLMResponse:
+    """
+    Cached replacement for `genai.GenerativeModel(...).generate_content_async(contents)`
+
+    Args:
+        contents: Prompt string or list of parts (text, inline image dicts, PIL images)
+        model_name: Gemini model name
+        generation_config: Passed to GenerativeModel
+        call_site: Label for metrics, e.g. "MenuParser.parse_from_text"
+        use_cache: False to bypass the cache (no lookup, response not stored)
+        **model_options: Other GenerativeModel kwargs (system_instruction, safety_settings, ...)
+
+    Returns:
+        LLMResponse. Blocked/empty responses raise here, as `response.text` would
+    """
+    site = _call_sites[call_site]
+    site["calls"] += 1
+
+    key = None
+    if use_cache and LLM_CACHE_ENABLED:
+        key = cache_key(model_name, generation_config, contents, model_options)
+        cached = _memory.get(key)
+        tier = "memory"
+        if cached is None and LLM_CACHE_DIR:
+            cached = await asyncio.to_thread(_disk_get, key)
+            tier = "disk"
+            if cached is not None:
+                _memory.set(key, cached)
+                site["disk_hits"] += 1
+        if cached is not None:
+            site["hits"] += 1
+            site["tokens_saved"] += cached.total_tokens
+            return dataclasses.replace(cached, cache_tier=tier)
+
+    estimated_tokens = _estimate_tokens(contents)
+    site["queue_wait_ms"] += await _limiter.acquire(estimated_tokens, _priority.get())
+
+    model = genai.GenerativeModel(model_name, generation_config=generation_config, **model_options)
+    started = time.perf_counter()
+    actual_tokens = None
+    rate_limited = False
+    try:
+        response = await model.generate_content_async(contents)
+        text = response.text
+        prompt_tokens, output_tokens = _usage(response)
+        if prompt_tokens or output_tokens:
+            actual_tokens = prompt_tokens + output_tokens
+    except Exception as e:
+        site["errors"] += 1
+        rate_limited = _is_rate_limit_error(e)
+        raise
+    finally:
+        _limiter.release(estimated_tokens, actual_tokens, rate_limited=rate_limited)
+        site["total_latency_ms"] += (time.perf_counter() - started) * 1000
+
+    result = LLMResponse(text=text, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+    site["tokens_used"] += result.total_tokens
+
+    if key is not None:
+        _memory.set(key, result)
+        if LLM_CACHE_DIR:
+            await asyncio.to_thread(_disk_set, key, result)
+
+    return result
+
+
+def llm_overloaded() -> bool:
+    """Whether new interactive calls would queue behind LLM_OVERLOAD_QUEUE_DEPTH others (or a 429 cooldown)"""
+    return _limiter.saturated(LLM_OVERLOAD_QUEUE_DEPTH)
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Cache occupancy, hit rate and token counters per call site, and limiter queue times"""
+    call_sites = {}
+    for name, site in sorted(_call_sites.items()):
+        misses = site["calls"] - site["hits"]
+        call_sites[name] = {
+            "calls": site["calls"],
+            "hits": site["hits"],
+            "disk_hits": site["disk_hits"],
+            "errors": site["errors"],
+            "hit_rate": round(site["hits"] / site["calls"], 4) if site["calls"] else 0.0,
+            "tokens_used": site["tokens_used"],
+            "tokens_saved": site["tokens_saved"],
+            "avg_latency_ms": round(site["total_latency_ms"] / misses, 1) if misses else 0.0,
+            "avg_queue_wait_ms": round(site["queue_wait_ms"] / misses, 1) if misses else 0.0,
+        }
+    return {
+        "cache": {**_memory.stats(), "enabled": LLM_CACHE_ENABLED, "disk_dir": LLM_CACHE_DIR or None},
+        "call_sites": call_sites,
+        "limiter": _limiter.stats(),
+    }
@@ -0,0 +1,115 @@
+"""
+Bounded In-Memory Cache - LRU eviction with per-entry TTL
+Shared by the in-process cache tiers (profiles, recommendation results, LLM responses)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class BoundedTTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and hit/miss/eviction counters
+
+    Bounded by entry count and, optionally, by total size in bytes
+    (sizes are computed by `size_of` only when `max_bytes` is set).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 256,
+        default_ttl: float = 600.0,
+        max_bytes: int = 0,
+        size_of: Optional[Callable[[Any], int]] = None
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._size_of = size_of
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None if missing/expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def peek(self, key: Hashable) -> bool:
+        """Whether a live entry exists, without touching LRU order or counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Insert or replace an entry, evicting least-recently-used entries as needed"""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        size = self._size_of(value) if (self.max_bytes and self._size_of) else 0
+        if self.max_bytes and size > self.max_bytes:
+            return  # Larger than the whole cache, not worth keeping
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._total_bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes and self._total_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop an entry; returns True if one was present"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            self._stats["invalidations"] += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller must hold the lock
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of counters and occupancy"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
@@ -1,6 +1,7 @@
 import os
 import asyncio
-import httpx
+from services.http_clients import get_client
+from services.image_fetcher import fetch_images, IMAGE_OCR_MAX_DIMENSION
 import json
 from serpapi import GoogleSearch
 import google.generativeai as genai
@@ -9,6 +10,7 @@ from dotenv import load_dotenv
 from typing import List, Optional, Dict, Any
 
 from schemas.restaurant_profile import MenuItem
+from services import llm_gateway
 
 load_dotenv()
 
@@ -67,16 +69,16 @@ class MenuScraper:
             return None
         print(f"Fetching content from {url} using Jina Reader...")
         try:
-            async with httpx.AsyncClient() as client:
-                headers = {"Authorization": f"Bearer {JINA_API_KEY}"}
-                jina_reader_endpoint = f"https://r.jina.ai/{url}"
-                response = await client.get(jina_reader_endpoint, headers=headers, timeout=45)
-                response.raise_for_status()
-                content = response.text
-                if content:
-                    print(f"Successfully extracted content from {url} via Jina Reader.")
-                    return content
-                return None
+            client = get_client("jina")
+            headers = {"Authorization": f"Bearer {JINA_API_KEY}"}
+            jina_reader_endpoint = f"https://r.jina.ai/{url}"
+            response = await client.get(jina_reader_endpoint, headers=headers)
+            response.raise_for_status()
+            content = response.text
+            if content:
+                print(f"Successfully extracted content from {url} via Jina Reader.")
+                return content
+            return None
         except Exception as e:
             print(f"Error fetching content with Jina Reader: {e}")
             return None
@@ -145,8 +147,9 @@ class MenuScraper:
         """
         try:
             genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            response = await model.generate_content_async(prompt)
+            response = await llm_gateway.generate_content_async(
+                prompt, model_name='gemini-2.0-flash-exp', call_site="menu_scraper.text"
+            )
             menu_data_raw = response.text
             if menu_data_raw.startswith("```json"):
                 menu_data_raw = menu_data_raw[len("```json"):
@@ -219,24 +222,9 @@ class MenuScraper:
         images_to_process = image_urls[:5]
 
         try:
-            # Download images
-            import base64
-            image_data = []
-            async with httpx.AsyncClient() as client:
-                for idx, url in enumerate(images_to_process):
-                    try:
-                        print(f"Downloading image {idx+1}/{len(images_to_process)}: {url[:60]}...")
-                        response = await client.get(url, timeout=30)
-                        response.raise_for_status()
-                        # Encode image as base64 string for Gemini API
-                        image_base64 = base64.b64encode(response.content).decode('utf-8')
-                        image_data.append({
-                            'mime_type': 'image/jpeg',
-                            'data': image_base64
-                        })
-                    except Exception as e:
-                        print(f"Failed to download image {idx+1}: {e}")
-                        continue
+            # Download images (bounded parallelism, downscaled for OCR)
+            images = await fetch_images(images_to_process, max_dimension=IMAGE_OCR_MAX_DIMENSION)
+            image_data = [image.to_part() for image in images]
 
             if not image_data:
                 print("No images could be downloaded.")
@@ -280,7 +268,6 @@ class MenuScraper:
 
             # Use Gemini Vision API
             genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-2.5-flash')  # Stable version with vision support
 
             # Prepare content with images
             content_parts = [prompt]
@@ -290,7 +277,10 @@ class MenuScraper:
                     'data': img['data']
                 })
 
-            response = await model.generate_content_async(content_parts)
+            # Stable version with vision support
+            response = await llm_gateway.generate_content_async(
+                content_parts, model_name='gemini-2.5-flash', call_site="menu_scraper.vision"
+            )
 
             menu_data_raw = response.text
             print(f"Gemini Vision response received. Parsing...")
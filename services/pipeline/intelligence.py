@@ -5,13 +5,24 @@ Handles menu parsing (text/vision) and review fusion using Gemini
 
 import os
 import json
-import base64
-import httpx
+import asyncio
+from services.image_fetcher import fetch_images, IMAGE_CLASSIFY_MAX_DIMENSION, IMAGE_OCR_MAX_DIMENSION
+from services import image_fingerprint
 import google.generativeai as genai
 from typing import List, Optional
 
 from schemas.pipeline import ParsedMenuItem, RawReview
+from services import llm_gateway
 from schemas.restaurant_profile import MenuItem, MenuItemAnalysis, DishAttributes
+from services.pipeline.matching import DishNameIndex
+
+# Dish attribute analysis: menus are cut into chunks of about this many tokens
+# (prompt + expected output), so long menus don't get truncated responses
+MENU_ANALYSIS_CHUNK_TOKEN_BUDGET = int(os.getenv("MENU_ANALYSIS_CHUNK_TOKEN_BUDGET", "8000"))
+MENU_ANALYSIS_OUTPUT_TOKENS_PER_ITEM = int(os.getenv("MENU_ANALYSIS_OUTPUT_TOKENS_PER_ITEM", "150"))
+MENU_ANALYSIS_MAX_CONCURRENCY = int(os.getenv("MENU_ANALYSIS_MAX_CONCURRENCY", "4"))
+MENU_ANALYSIS_CHUNK_RETRIES = int(os.getenv("MENU_ANALYSIS_CHUNK_RETRIES", "2"))
+MENU_ANALYSIS_RETRY_BACKOFF_SECONDS = float(os.getenv("MENU_ANALYSIS_RETRY_BACKOFF_SECONDS", "1"))
 
 
 class MenuParser:
@@ -39,9 +50,6 @@ class MenuParser:
         try:
             print(f"[MenuParser] Parsing menu from text ({len(content)} chars)")
 
-            # Use stable text model
-            model = genai.GenerativeModel('gemini-2.5-flash')
-
             prompt = f"""
 你是一個專業的菜單分析助手。請從以下文字中提取菜單資訊，並以 JSON 格式回傳。
 
@@ -63,7 +71,10 @@ class MenuParser:
 {content[:5000]}
 """
 
-            response = await model.generate_content_async(prompt)
+            # Use stable text model
+            response = await llm_gateway.generate_content_async(
+                prompt, model_name='gemini-2.5-flash', call_site="MenuParser.parse_from_text"
+            )
             menu_text = response.text
 
             # Clean response
@@ -116,34 +127,26 @@ class MenuParser:
         try:
             print(f"[MenuParser] Stage 1: Classifying {len(image_urls)} images to find menus")
             
-            # Use lightweight model for classification
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            # Download all images (in parallel, downscaled for a quick look)
+            images = await fetch_images(image_urls, max_dimension=IMAGE_CLASSIFY_MAX_DIMENSION)
+            # The same menu board is often photographed by many reviewers
+            images = image_fingerprint.dedupe(images, key=lambda image: image.fingerprint)
             
-            # Download all images
-            image_data = []
-            async with httpx.AsyncClient() as client:
-                for idx, url in enumerate(image_urls):
-                    try:
-                        print(f"[MenuParser] Downloading image {idx+1}/{len(image_urls)} for classification")
-                        response = await client.get(url, timeout=30)
-                        response.raise_for_status()
-                        
-                        # Encode to base64
-                        image_base64 = base64.b64encode(response.content).decode('utf-8')
-                        image_data.append({
-                            'url': url,
-                            'data': {
-                                'mime_type': 'image/jpeg',
-                                'data': image_base64
-                            }
-                        })
-                    except Exception as e:
-                        print(f"[MenuParser] Failed to download image {url[:60]}: {e}")
-                        continue
-            
-            if not image_data:
+            if not images:
                 print(f"[MenuParser] No images successfully downloaded")
                 return []
+
+            # Byte-identical photos seen before (other restaurants, earlier refreshes) skip Gemini
+            is_menu = {}
+            image_data = []
+            for image in images:
+                cached = image_fingerprint.classification_cache.get([image.fingerprint]) if image.fingerprint else None
+                if cached is None:
+                    image_data.append({'url': image.url, 'data': image.to_part(), 'fingerprint': image.fingerprint})
+                else:
+                    is_menu[image.url] = cached
+            if is_menu:
+                print(f"[MenuParser] {len(is_menu)} images classified from cache, {len(image_data)} to classify")
             
             # Build classification prompt
             classification_prompt = """
@@ -174,7 +177,6 @@ class MenuParser:
             
             # BATCH PROCESSING: Process images in batches of 5 to avoid quota limits
             BATCH_SIZE = 5
-            all_menu_urls = []
             
             for batch_start in range(0, len(image_data), BATCH_SIZE):
                 batch_end = min(batch_start + BATCH_SIZE, len(image_data))
@@ -188,8 +190,10 @@ class MenuParser:
                     content_parts.append(img_data['data'])
                 
                 try:
-                    # Call Gemini for classification
-                    response = await model.generate_content_async(content_parts)
+                    # Call Gemini for classification (lightweight model)
+                    response = await llm_gateway.generate_content_async(
+                        content_parts, model_name='gemini-2.0-flash-exp', call_site="MenuParser._classify_images"
+                    )
                     
                     result_text = response.text
                     print(f"[MenuParser] Batch {batch_start//BATCH_SIZE + 1} raw response length: {len(result_text)}")
@@ -210,15 +214,17 @@ class MenuParser:
                     print(f"[MenuParser] Batch {batch_start//BATCH_SIZE + 1} has {classifications_count} classifications")
                     
                     for classification in result.get("classifications", []):
-                        if classification.get("is_menu", False):
-                            idx = classification.get("image_index", -1)
+                        idx = classification.get("image_index", -1)
+                        if not (isinstance(idx, int) and 0 <= idx < len(batch)):
+                            continue
+                        menu = bool(classification.get("is_menu", False))
+                        is_menu[batch[idx]['url']] = menu
+                        if batch[idx]['fingerprint']:
+                            image_fingerprint.classification_cache.set([batch[idx]['fingerprint']], menu)
+                        if menu:
                             confidence = classification.get("confidence", 0)
                             reason = classification.get("reason", "")
-                            
-                            if 0 <= idx < len(batch):
-                                url = batch[idx]['url']
-                                all_menu_urls.append(url)
-                                print(f"[MenuParser] ✓ Batch image {idx+1} is menu (confidence: {confidence:.2f}) - {reason}")
+                            print(f"[MenuParser] ✓ Batch image {idx+1} is menu (confidence: {confidence:.2f}) - {reason}")
                 
                 except json.JSONDecodeError as json_error:
                     print(f"[MenuParser] JSON parsing error in batch: {json_error}")
@@ -226,7 +232,7 @@ class MenuParser:
                     # Fallback: treat all images in this batch as potential menus
                     print(f"[MenuParser] Fallback: treating all {len(batch)} images in batch as potential menus")
                     for img_data in batch:
-                        all_menu_urls.append(img_data['url'])
+                        is_menu[img_data['url']] = True
                 except Exception as batch_error:
                     print(f"[MenuParser] Error processing batch: {batch_error}")
                     import traceback
@@ -234,8 +240,9 @@ class MenuParser:
                     # Fallback: treat all images in this batch as potential menus
                     print(f"[MenuParser] Fallback: treating all {len(batch)} images in batch as potential menus")
                     for img_data in batch:
-                        all_menu_urls.append(img_data['url'])
+                        is_menu[img_data['url']] = True
             
+            all_menu_urls = [image.url for image in images if is_menu.get(image.url)]
             print(f"[MenuParser] Found {len(all_menu_urls)} menu images out of {len(image_urls)} total")
             return all_menu_urls
             
@@ -278,38 +285,24 @@ class MenuParser:
             # Stage 2: OCR on menu images only
             print(f"[MenuParser] Stage 2: OCR on {len(menu_image_urls)} menu images")
             
-            # Use Gemini 2.5 Flash for OCR
-            model = genai.GenerativeModel('gemini-2.5-flash')
-
             # Download and encode menu images (max 5 for API limits)
             images_to_process = menu_image_urls[:5]
-            image_parts = []
-
-            async with httpx.AsyncClient() as client:
-                for idx, url in enumerate(images_to_process):
-                    try:
-                        print(f"[MenuParser] Downloading menu image {idx+1}/{len(images_to_process)} for OCR")
-                        response = await client.get(url, timeout=30)
-                        response.raise_for_status()
-
-                        # Encode to base64
-                        image_base64 = base64.b64encode(response.content).decode('utf-8')
-
-                        image_parts.append({
-                            'mime_type': 'image/jpeg',
-                            'data': image_base64
-                        })
-
-                    except Exception as e:
-                        print(f"[MenuParser] Failed to download image {url[:60]}: {e}")
-                        continue
+            images = await fetch_images(images_to_process, max_dimension=IMAGE_OCR_MAX_DIMENSION)
+            image_parts = [image.to_part() for image in images]
 
             if not image_parts:
                 print(f"[MenuParser] No menu images successfully downloaded for OCR")
                 return []
 
-            # Build OCR prompt
-            text_prompt = """
+            # Byte-identical menu photos were OCR'd before: reuse the items
+            fingerprints = [image.fingerprint for image in images if image.fingerprint]
+            cacheable = len(fingerprints) == len(images)
+            menu_items_raw = image_fingerprint.ocr_cache.get(fingerprints) if cacheable else None
+            if menu_items_raw is not None:
+                print(f"[MenuParser] OCR cache hit for {len(image_parts)} menu images")
+            else:
+                # Build OCR prompt
+                text_prompt = """
 你是一個專業的菜單 OCR 助手。請從這些菜單圖片中提取所有菜色資訊，並以 JSON 格式回傳。
 
 重要規則：
@@ -330,24 +323,28 @@ class MenuParser:
 請仔細分析以下菜單圖片，提取所有菜色資訊：
 """
 
-            # Build content parts (text + images)
-            content_parts = [text_prompt] + image_parts
+                # Build content parts (text + images)
+                content_parts = [text_prompt] + image_parts
 
-            # Call Gemini Vision API for OCR
-            print(f"[MenuParser] Calling Gemini Vision for OCR with {len(image_parts)} menu images")
-            response = await model.generate_content_async(content_parts)
+                # Call Gemini Vision API for OCR
+                print(f"[MenuParser] Calling Gemini Vision for OCR with {len(image_parts)} menu images")
+                response = await llm_gateway.generate_content_async(
+                    content_parts, model_name='gemini-2.5-flash', call_site="MenuParser.parse_from_images"
+                )
 
-            menu_text = response.text
-            print(f"[MenuParser] OCR response length: {len(menu_text)}")
+                menu_text = response.text
+                print(f"[MenuParser] OCR response length: {len(menu_text)}")
 
-            # Clean response
-            if menu_text.startswith("```json"):
-                menu_text = menu_text[len("```json"):].strip()
-            if menu_text.endswith("```"):
-                menu_text = menu_text[:-len("```")].strip()
+                # Clean response
+                if menu_text.startswith("```json"):
+                    menu_text = menu_text[len("```json"):].strip()
+                if menu_text.endswith("```"):
+                    menu_text = menu_text[:-len("```")].strip()
 
-            # Parse JSON
-            menu_items_raw = json.loads(menu_text)
+                # Parse JSON
+                menu_items_raw = json.loads(menu_text)
+                if cacheable and isinstance(menu_items_raw, list):
+                    image_fingerprint.ocr_cache.set(fingerprints, menu_items_raw)
 
             # Convert to ParsedMenuItem objects
             menu_items = []
@@ -418,11 +415,6 @@ class MenuParser:
                 }
             }
             
-            model = genai.GenerativeModel(
-                model_name='gemini-2.5-flash',
-                generation_config=generation_config
-            )
-            
             # Prepare review text
             review_texts = []
             for review in reviews[:50]:  # Increased from 30 to 50 for better coverage
@@ -453,7 +445,12 @@ class MenuParser:
 6. 如果無法確定分類，使用「推薦」
 """
             
-            response = await model.generate_content_async(prompt)
+            response = await llm_gateway.generate_content_async(
+                prompt,
+                model_name='gemini-2.5-flash',
+                generation_config=generation_config,
+                call_site="MenuParser.extract_from_reviews"
+            )
             result_text = response.text
             
             print(f"[MenuParser] Review extraction response length: {len(result_text)}")
@@ -525,8 +522,6 @@ class InsightEngine:
             # Filter out reviews with None text and use first 15 valid reviews
             review_texts = [f"({r.rating}★) {r.text}" for r in reviews if r.text][:15]
 
-            model = genai.GenerativeModel('gemini-2.5-pro')
-
             prompt = f"""
 你是一個專業的餐廳評價分析師。請分析顧客評論，並將評論中提到的菜色與標準菜單進行對應。
 
@@ -568,7 +563,9 @@ class InsightEngine:
 }}
 """
 
-            response = await model.generate_content_async(prompt)
+            response = await llm_gateway.generate_content_async(
+                prompt, model_name='gemini-2.5-pro', call_site="InsightEngine.fuse_reviews"
+            )
             result_text = response.text
 
             # Clean response
@@ -676,6 +673,11 @@ class MenuIntelligence:
         - Soft ranking (contextual attributes like flavors, textures)
         - Value assessment (sentiment_score, is_signature)
 
+        Large menus are split into chunks that fit MENU_ANALYSIS_CHUNK_TOKEN_BUDGET,
+        analyzed with bounded concurrency and merged back in menu order. A failed
+        chunk is retried on its own (split in half if its output was truncated);
+        if it keeps failing its items are returned without analysis.
+
         Args:
             menu_items: List of menu items with basic info (name, price, category)
             reviews: Customer reviews for sentiment analysis
@@ -689,35 +691,129 @@ class MenuIntelligence:
             if not menu_items:
                 return []
 
-            # Use stable text model
-            model = genai.GenerativeModel('gemini-2.5-flash')
+            # Filter out reviews with None text and use first 15 valid reviews
+            review_texts = [f"({r.rating}★) {r.text}" for r in reviews if r.text][:15]
 
-            # Build menu data for analysis
-            menu_data = []
-            for item in menu_items:
-                item_dict = {
-                    "name": item.name,
-                    "price": item.price,
-                    "category": item.category,
-                    "description": item.description
-                }
+            chunks = self._chunk_menu(menu_items)
+            print(f"[MenuIntelligence] Split menu into {len(chunks)} chunk(s) of up to {max(len(c) for c in chunks)} items")
 
-                # Add existing AI insights if available
-                if item.ai_insight:
-                    item_dict["review_sentiment"] = item.ai_insight.sentiment
-                    item_dict["review_summary"] = item.ai_insight.summary
-                    item_dict["mention_count"] = item.ai_insight.mention_count
+            semaphore = asyncio.Semaphore(MENU_ANALYSIS_MAX_CONCURRENCY)
+            chunk_results = await asyncio.gather(*(
+                self._analyze_chunk(chunk, review_texts, semaphore, label=f"{idx + 1}/{len(chunks)}")
+                for idx, chunk in enumerate(chunks)
+            ))
 
-                menu_data.append(item_dict)
+            # Chunks are contiguous slices, so concatenating keeps the menu order
+            enhanced_items = [item for chunk_items in chunk_results for item in chunk_items]
 
-            # Filter out reviews with None text and use first 15 valid reviews
-            review_texts = [f"({r.rating}★) {r.text}" for r in reviews if r.text][:15]
+            analyzed = sum(1 for item in enhanced_items if item.analysis)
+            print(f"[MenuIntelligence] Generated attributes for {analyzed}/{len(enhanced_items)} items")
+            return enhanced_items
 
-            prompt = f"""
+        except Exception as e:
+            print(f"[MenuIntelligence] Error analyzing dishes: {e}")
+            import traceback
+            traceback.print_exc()
+            return menu_items  # Return original items if analysis fails
+
+    @staticmethod
+    def _menu_entry(item: MenuItem) -> dict:
+        """Compact per-dish input for the analysis prompt (empty fields omitted)"""
+        item_dict = {
+            "name": item.name,
+            "price": item.price,
+            "category": item.category,
+            "description": item.description
+        }
+
+        # Add existing AI insights if available
+        if item.ai_insight:
+            item_dict["review_sentiment"] = item.ai_insight.sentiment
+            item_dict["review_summary"] = item.ai_insight.summary
+            item_dict["mention_count"] = item.ai_insight.mention_count
+
+        return {key: value for key, value in item_dict.items() if value is not None}
+
+    def _chunk_menu(self, menu_items: List[MenuItem]) -> List[List[MenuItem]]:
+        """
+        Cut the menu into contiguous chunks whose estimated prompt + output tokens
+        stay within MENU_ANALYSIS_CHUNK_TOKEN_BUDGET (at least one item per chunk)
+        """
+        chunks = []
+        current = []
+        current_tokens = 0
+        for item in menu_items:
+            entry_chars = len(json.dumps(self._menu_entry(item), ensure_ascii=False, separators=(",", ":")))
+            item_tokens = entry_chars // 3 + 1 + MENU_ANALYSIS_OUTPUT_TOKENS_PER_ITEM
+            if current and current_tokens + item_tokens > MENU_ANALYSIS_CHUNK_TOKEN_BUDGET:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += item_tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _analyze_chunk(
+        self,
+        items: List[MenuItem],
+        review_texts: List[str],
+        semaphore: asyncio.Semaphore,
+        label: str
+    ) -> List[MenuItem]:
+        """Analyze one chunk with retries; returns the chunk's items in input order"""
+        prompt = self._build_analysis_prompt([self._menu_entry(item) for item in items], review_texts)
+
+        for attempt in range(MENU_ANALYSIS_CHUNK_RETRIES + 1):
+            try:
+                async with semaphore:
+                    response = await llm_gateway.generate_content_async(
+                        prompt,
+                        model_name='gemini-2.5-flash',
+                        generation_config={"response_mime_type": "application/json"},
+                        call_site="MenuIntelligence.analyze_dish_batch",
+                        # A retry must not be answered with the cached response that just failed
+                        use_cache=attempt == 0
+                    )
+                result_text = response.text
+
+                # Clean response
+                if result_text.startswith("```json"):
+                    result_text = result_text[len("```json"):].strip()
+                if result_text.endswith("```"):
+                    result_text = result_text[:-len("```")].strip()
+
+                result = json.loads(result_text)
+                attribute_map = self._parse_attribute_map(result.get("dish_attributes", []))
+                return self._apply_attributes(items, attribute_map)
+
+            except json.JSONDecodeError as e:
+                print(f"[MenuIntelligence] Chunk {label} JSON parsing error: {e}")
+                if len(items) > 1:
+                    # Usually a truncated response: halve the chunk instead of resending it
+                    mid = len(items) // 2
+                    print(f"[MenuIntelligence] Splitting chunk {label} ({len(items)} items) in two")
+                    first, second = await asyncio.gather(
+                        self._analyze_chunk(items[:mid], review_texts, semaphore, f"{label}a"),
+                        self._analyze_chunk(items[mid:], review_texts, semaphore, f"{label}b")
+                    )
+                    return first + second
+            except Exception as e:
+                print(f"[MenuIntelligence] Chunk {label} attempt {attempt + 1} failed: {e}")
+
+            if attempt < MENU_ANALYSIS_CHUNK_RETRIES:
+                await asyncio.sleep(MENU_ANALYSIS_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+        print(f"[MenuIntelligence] Chunk {label} failed after retries, leaving {len(items)} items unanalyzed")
+        return list(items)
+
+    @staticmethod
+    def _build_analysis_prompt(menu_data: List[dict], review_texts: List[str]) -> str:
+        prompt = f"""
 你是一個專業的菜單分析專家。請分析以下菜單項目，為每個菜色生成詳細的屬性標籤。
 
 ## 菜單資料
-{json.dumps(menu_data, ensure_ascii=False, indent=2)}
+{json.dumps(menu_data, ensure_ascii=False, separators=(",", ":"))}
 
 ## 顧客評論（參考）
 {chr(10).join(review_texts) if review_texts else "無評論"}
@@ -779,127 +875,230 @@ class MenuIntelligence:
 4. 根據菜色名稱、類別、描述來推測屬性
 5. 若有評論提及該菜色，sentiment_score 和 highlight_review 應反映評論內容
 """
+        return prompt
 
-            response = await model.generate_content_async(prompt)
-            result_text = response.text
+    async def enrich_menu(
+        self,
+        menu_items: List[ParsedMenuItem],
+        reviews: List[RawReview]
+    ) -> Optional[tuple[List[MenuItem], str]]:
+        """
+        Fused menu enrichment: review insights (MenuItemAnalysis) and DishAttributes in one call
 
-            # Clean response
-            if result_text.startswith("```json"):
-                result_text = result_text[len("```json"):].strip()
-            if result_text.endswith("```"):
-                result_text = result_text[:-len("```")].strip()
+        Replaces InsightEngine.fuse_reviews followed by analyze_dish_batch, which send
+        the same menu and reviews to Gemini twice.
 
-            # Parse JSON
-            result = json.loads(result_text)
+        Args:
+            menu_items: Parsed menu items (name, price, category, description)
+            reviews: Customer reviews
 
-            # Build attribute map
-            attribute_map = {}
-            for attr_data in result.get("dish_attributes", []):
-                dish_name = attr_data.get("dish_name")
+        Returns:
+            Tuple of (menu items with ai_insight and analysis, overall review summary),
+            or None if the call fails (callers fall back to the two-call path)
+        """
+        try:
+            print(f"[MenuIntelligence] Fused enrichment of {len(menu_items)} menu items with {len(reviews)} reviews")
+
+            if not menu_items:
+                return [], "No customer reviews available."
+
+            menu_data = [
+                {"name": item.name, "price": item.price, "category": item.category, "description": item.description}
+                for item in menu_items
+            ]
+
+            # A single fused response for a large menu gets truncated; let the caller use the chunked path
+            estimated_tokens = (
+                len(json.dumps(menu_data, ensure_ascii=False, separators=(",", ":"))) // 3
+                + MENU_ANALYSIS_OUTPUT_TOKENS_PER_ITEM * len(menu_items)
+            )
+            if estimated_tokens > MENU_ANALYSIS_CHUNK_TOKEN_BUDGET:
+                print(f"[MenuIntelligence] Menu too large for fused enrichment (~{estimated_tokens} tokens), skipping")
+                return None
+            # Filter out reviews with None text and use first 15 valid reviews
+            review_texts = [f"({r.rating}★) {r.text}" for r in reviews if r.text][:15]
 
+            prompt = f"""
+你是一個專業的餐廳評價與菜單分析專家。請根據菜單與顧客評論，一次完成菜色評價對應與屬性標註。
+
+## 菜單資料
+{json.dumps(menu_data, ensure_ascii=False, separators=(",", ":"))}
+
+## 顧客評論
+{chr(10).join(review_texts) if review_texts else "無評論"}
+
+## 任務
+1. 菜色評價對應：找出評論中提到的菜色，給出 sentiment（positive/negative/neutral）、
+   簡短摘要 review_summary（例如「肉太柴」、「湯頭濃郁」）與提及次數 mention_count；未提及則為 neutral、0 次。
+2. 菜色屬性：
+   - 硬過濾：is_spicy（微辣也算 true）、is_vegan、contains_beef、contains_pork、contains_seafood、allergens
+   - 軟排序：flavors、textures、temperature（hot/cold/room）、cooking_method、suitable_occasions
+   - 價值：is_signature、sentiment_score（-1.0 到 1.0）、highlight_review（一句話，可為 null）
+3. 整體評價摘要 overall_summary：2-3 句話總結用餐體驗，提及最受好評和最受批評的菜色。
+
+## 回傳格式
+{{
+  "dishes": [
+    {{
+      "dish_name": "菜色名稱（必須與輸入完全相同）",
+      "sentiment": "positive",
+      "review_summary": "網友大推，外皮酥脆內餡多汁",
+      "mention_count": 5,
+      "is_spicy": false, "is_vegan": false, "contains_beef": false, "contains_pork": true, "contains_seafood": false,
+      "allergens": ["gluten"],
+      "flavors": ["savory"], "textures": ["crispy"], "temperature": "hot", "cooking_method": "fried",
+      "suitable_occasions": ["group_share"],
+      "is_signature": true, "sentiment_score": 0.8, "highlight_review": "外皮酥脆內餡多汁"
+    }}
+  ],
+  "overall_summary": "整體評價正面..."
+}}
+
+注意：所有菜色都必須回傳（不能遺漏），dish_name 必須與輸入的 name 完全一致；無法判斷的屬性使用保守預設值。
+"""
+
+            response = await llm_gateway.generate_content_async(
+                prompt,
+                model_name='gemini-2.5-flash',
+                generation_config={"response_mime_type": "application/json"},
+                call_site="MenuIntelligence.enrich_menu"
+            )
+            result = json.loads(response.text)
+            dishes = result.get("dishes", [])
+
+            insight_map = {}
+            for dish in dishes:
                 try:
-                    attributes = DishAttributes(
-                        # Hard Filter Attributes
-                        is_spicy=attr_data.get("is_spicy", False),
-                        is_vegan=attr_data.get("is_vegan", False),
-                        contains_beef=attr_data.get("contains_beef", False),
-                        contains_pork=attr_data.get("contains_pork", False),
-                        contains_seafood=attr_data.get("contains_seafood", False),
-                        allergens=attr_data.get("allergens", []),
-                        # Soft Ranking Attributes
-                        flavors=attr_data.get("flavors", []),
-                        textures=attr_data.get("textures", []),
-                        temperature=attr_data.get("temperature", "hot"),
-                        cooking_method=attr_data.get("cooking_method", "unknown"),
-                        suitable_occasions=attr_data.get("suitable_occasions", []),
-                        # Value Attributes
-                        is_signature=attr_data.get("is_signature", False),
-                        sentiment_score=attr_data.get("sentiment_score", 0.0),
-                        highlight_review=attr_data.get("highlight_review")
+                    insight_map[dish.get("dish_name")] = MenuItemAnalysis(
+                        sentiment=dish.get("sentiment", "neutral"),
+                        summary=dish.get("review_summary") or "顧客評論中未特別提及此菜品",
+                        mention_count=dish.get("mention_count", 0)
                     )
-                    attribute_map[dish_name] = attributes
                 except Exception as e:
-                    print(f"[MenuIntelligence] Failed to parse attributes for {dish_name}: {e}")
-                    continue
+                    print(f"[MenuIntelligence] Failed to parse insight for {dish.get('dish_name')}: {e}")
 
-            # Apply attributes to menu items with FUZZY MATCHING
-            enhanced_items = []
-            unmatched_gemini_dishes = set(attribute_map.keys())
-            
+            # Same item construction as InsightEngine.fuse_reviews
+            insight_items = []
             for item in menu_items:
-                matched_attrs = None
-                
-                # Try exact match first
-                if item.name in attribute_map:
-                    matched_attrs = attribute_map[item.name]
-                    unmatched_gemini_dishes.discard(item.name)
-                else:
-                    # Try fuzzy match (case-insensitive, ignore spaces/punctuation)
-                    import re
-                    normalized_item_name = re.sub(r'[^\w]', '', item.name.lower())
-                    
-                    for gemini_dish_name, attrs in attribute_map.items():
-                        normalized_gemini_name = re.sub(r'[^\w]', '', gemini_dish_name.lower())
-                        
-                        # If normalized names match, or one contains the other
-                        if (normalized_item_name == normalized_gemini_name or
-                            normalized_item_name in normalized_gemini_name or
-                            normalized_gemini_name in normalized_item_name):
-                            matched_attrs = attrs
-                            unmatched_gemini_dishes.discard(gemini_dish_name)
-                            print(f"[MenuIntelligence] Fuzzy matched: '{item.name}' ← '{gemini_dish_name}'")
-                            break
-                
-                # If still no match, create conservative fallback attributes
-                if matched_attrs is None:
-                    print(f"[MenuIntelligence] No match for '{item.name}', using fallback attributes")
-                    matched_attrs = DishAttributes(
-                        # Conservative defaults that won't filter out the dish
-                        is_spicy=False,
-                        is_vegan=False,
-                        contains_beef=False,
-                        contains_pork=False,
-                        contains_seafood=False,
-                        allergens=[],
-                        flavors=["savory"],  # Generic flavor
-                        textures=["unknown"],
-                        temperature="hot",
-                        cooking_method="unknown",
-                        suitable_occasions=["casual"],
-                        is_signature=False,  # Conservative: not signature unless Gemini confirms
-                        sentiment_score=0.0,  # Neutral
-                        highlight_review=None
-                    )
-                
-                # Create enhanced MenuItem with analysis
-                enhanced_item = MenuItem(
-                    id=item.id,
+                insight = insight_map.get(item.name) or MenuItemAnalysis(
+                    sentiment="neutral",
+                    summary="顧客評論中未特別提及此菜品",
+                    mention_count=0
+                )
+                insight_items.append(MenuItem(
                     name=item.name,
                     price=item.price,
                     category=item.category,
                     description=item.description,
-                    image_url=item.image_url,
-                    source_type=item.source_type,
-                    is_popular=item.is_popular,
-                    is_risky=item.is_risky,
-                    analysis=matched_attrs,  # Now always populated
-                    ai_insight=item.ai_insight
-                )
-                enhanced_items.append(enhanced_item)
-            
-            # Log any Gemini dishes that didn't match menu items
-            if unmatched_gemini_dishes:
-                print(f"[MenuIntelligence] Gemini analyzed dishes not found in menu: {unmatched_gemini_dishes}")
+                    source_type="dine_in",
+                    is_popular=insight.mention_count >= 3,
+                    is_risky=False,
+                    ai_insight=insight
+                ))
 
-            print(f"[MenuIntelligence] Generated attributes for {len(attribute_map)} items (exact), {len(enhanced_items)} total with fallbacks")
-            return enhanced_items
+            attribute_map = self._parse_attribute_map(dishes)
+            enriched = self._apply_attributes(insight_items, attribute_map)
+            overall_summary = result.get("overall_summary", "Customer reviews analyzed successfully.")
+
+            print(f"[MenuIntelligence] Fused enrichment: {len(insight_map)} insights, {len(attribute_map)} attribute sets")
+            return enriched, overall_summary
 
-        except json.JSONDecodeError as e:
-            print(f"[MenuIntelligence] JSON parsing error: {e}")
-            print(f"[MenuIntelligence] Raw response: {result_text[:500] if 'result_text' in locals() else 'N/A'}")
-            return menu_items  # Return original items if analysis fails
         except Exception as e:
-            print(f"[MenuIntelligence] Error analyzing dishes: {e}")
-            import traceback
-            traceback.print_exc()
-            return menu_items  # Return original items if analysis fails
+            print(f"[MenuIntelligence] Fused enrichment failed: {e}")
+            return None
+
+    @staticmethod
+    def _parse_attribute_map(dish_attributes: List[dict]) -> dict:
+        """Build {dish_name: DishAttributes} from the model's per-dish attribute objects"""
+        attribute_map = {}
+        for attr_data in dish_attributes:
+            dish_name = attr_data.get("dish_name")
+
+            try:
+                attributes = DishAttributes(
+                    # Hard Filter Attributes
+                    is_spicy=attr_data.get("is_spicy", False),
+                    is_vegan=attr_data.get("is_vegan", False),
+                    contains_beef=attr_data.get("contains_beef", False),
+                    contains_pork=attr_data.get("contains_pork", False),
+                    contains_seafood=attr_data.get("contains_seafood", False),
+                    allergens=attr_data.get("allergens", []),
+                    # Soft Ranking Attributes
+                    flavors=attr_data.get("flavors", []),
+                    textures=attr_data.get("textures", []),
+                    temperature=attr_data.get("temperature", "hot"),
+                    cooking_method=attr_data.get("cooking_method", "unknown"),
+                    suitable_occasions=attr_data.get("suitable_occasions", []),
+                    # Value Attributes
+                    is_signature=attr_data.get("is_signature", False),
+                    sentiment_score=attr_data.get("sentiment_score", 0.0),
+                    highlight_review=attr_data.get("highlight_review")
+                )
+                attribute_map[dish_name] = attributes
+            except Exception as e:
+                print(f"[MenuIntelligence] Failed to parse attributes for {dish_name}: {e}")
+                continue
+
+        return attribute_map
+
+    @staticmethod
+    def _apply_attributes(menu_items: List[MenuItem], attribute_map: dict) -> List[MenuItem]:
+        """Attach attributes to menu items (exact, then fuzzy name match, then conservative defaults)"""
+        # Apply attributes to menu items with FUZZY MATCHING (indexed, not pairwise)
+        enhanced_items = []
+        unmatched_gemini_dishes = set(attribute_map.keys())
+        attribute_index = DishNameIndex(attribute_map.items())
+
+        for item in menu_items:
+            matched_attrs = None
+
+            # Exact match first, then case/punctuation-insensitive and containment matches
+            found = attribute_index.match(item.name)
+            if found:
+                gemini_dish_name, matched_attrs = found
+                unmatched_gemini_dishes.discard(gemini_dish_name)
+                if gemini_dish_name != item.name:
+                    print(f"[MenuIntelligence] Fuzzy matched: '{item.name}' ← '{gemini_dish_name}'")
+
+            # If still no match, create conservative fallback attributes
+            if matched_attrs is None:
+                print(f"[MenuIntelligence] No match for '{item.name}', using fallback attributes")
+                matched_attrs = DishAttributes(
+                    # Conservative defaults that won't filter out the dish
+                    is_spicy=False,
+                    is_vegan=False,
+                    contains_beef=False,
+                    contains_pork=False,
+                    contains_seafood=False,
+                    allergens=[],
+                    flavors=["savory"],  # Generic flavor
+                    textures=["unknown"],
+                    temperature="hot",
+                    cooking_method="unknown",
+                    suitable_occasions=["casual"],
+                    is_signature=False,  # Conservative: not signature unless Gemini confirms
+                    sentiment_score=0.0,  # Neutral
+                    highlight_review=None
+                )
+            
+            # Create enhanced MenuItem with analysis
+            enhanced_item = MenuItem(
+                id=item.id,
+                name=item.name,
+                price=item.price,
+                category=item.category,
+                description=item.description,
+                image_url=item.image_url,
+                source_type=item.source_type,
+                is_popular=item.is_popular,
+                is_risky=item.is_risky,
+                analysis=matched_attrs,  # Now always populated
+                ai_insight=item.ai_insight
+            )
+            enhanced_items.append(enhanced_item)
+        
+        # Log any Gemini dishes that didn't match menu items
+        if unmatched_gemini_dishes:
+            print(f"[MenuIntelligence] Gemini analyzed dishes not found in menu: {unmatched_gemini_dishes}")
+
+        return enhanced_items
@@ -0,0 +1,131 @@
+"""
+Dish Name Matching - indexed lookup of LLM-returned dish names against a menu
+Replaces pairwise normalize-and-compare loops with a hash map plus a character n-gram index
+"""
+
+import re
+import unicodedata
+from typing import Dict, Generic, Iterable, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_NON_WORD = re.compile(r"[^\w]")
+
+
+def normalize_dish_name(name: str) -> str:
+    """Case-insensitive, width-insensitive name with spaces and punctuation removed"""
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", name or "").casefold())
+
+
+class DishNameIndex(Generic[T]):
+    """
+    Name -> value index with fuzzy fallbacks
+
+    Lookup order:
+    1. Exact raw name
+    2. Exact normalized name
+    3. Containment either way (query inside a name, or a name inside the query);
+       candidates come from the n-gram index / the query's substrings, not a full scan
+    4. Optional n-gram (Dice) similarity, only when min_similarity is given
+
+    Ties are broken deterministically: smaller length difference first, then the
+    entry added first. Duplicate names keep the first value added.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, T]] = (), ngram: int = 2):
+        self.ngram = ngram
+        self._names: List[str] = []
+        self._values: List[T] = []
+        self._normalized: List[str] = []
+        self._by_name: Dict[str, int] = {}
+        self._by_normalized: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        for name, value in entries:
+            self.add(name, value)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _grams(self, text: str) -> Set[str]:
+        if len(text) < self.ngram:
+            return {text} if text else set()
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def add(self, name: str, value: T):
+        """Add an entry (ignored if the exact name is already indexed)"""
+        if name in self._by_name:
+            return
+        position = len(self._names)
+        normalized = normalize_dish_name(name)
+        self._names.append(name)
+        self._values.append(value)
+        self._normalized.append(normalized)
+        self._by_name[name] = position
+        self._by_normalized.setdefault(normalized, position)
+        for gram in self._grams(normalized):
+            self._postings.setdefault(gram, set()).add(position)
+
+    def _containing(self, query: str) -> Set[int]:
+        """Entries whose normalized name contains the normalized query"""
+        if len(query) < self.ngram:
+            # Too short for the n-gram index (rare: single-character names)
+            return {i for i, normalized in enumerate(self._normalized) if query in normalized}
+        candidates = None
+        for gram in sorted(self._grams(query), key=lambda g: len(self._postings.get(g, ()))):
+            postings = self._postings.get(gram)
+            if not postings:
+                return set()
+            candidates = set(postings) if candidates is None else candidates & postings
+            if not candidates:
+                return set()
+        return {i for i in candidates or () if query in self._normalized[i]}
+
+    def _contained(self, query: str) -> Set[int]:
+        """Entries whose normalized name is a substring of the normalized query"""
+        found = set()
+        length = len(query)
+        for start in range(length):
+            for end in range(start + 1, length + 1):
+                position = self._by_normalized.get(query[start:end])
+                if position is not None:
+                    found.add(position)
+        return found
+
+    def _similar(self, query: str, min_similarity: float) -> Optional[int]:
+        query_grams = self._grams(query)
+        if not query_grams:
+            return None
+        overlap: Dict[int, int] = {}
+        for gram in query_grams:
+            for position in self._postings.get(gram, ()):
+                overlap[position] = overlap.get(position, 0) + 1
+        best, best_key = None, None
+        for position, shared in overlap.items():
+            score = 2 * shared / (len(query_grams) + len(self._grams(self._normalized[position])))
+            key = (-score, position)
+            if score >= min_similarity and (best_key is None or key < best_key):
+                best, best_key = position, key
+        return best
+
+    def match(self, name: str, min_similarity: Optional[float] = None) -> Optional[Tuple[str, T]]:
+        """Best matching (indexed name, value), or None"""
+        position = self._by_name.get(name)
+        if position is None:
+            query = normalize_dish_name(name)
+            if not query:
+                return None
+            position = self._by_normalized.get(query)
+            if position is None:
+                candidates = self._containing(query) | self._contained(query)
+                if candidates:
+                    position = min(candidates, key=lambda i: (abs(len(self._normalized[i]) - len(query)), i))
+                elif min_similarity is not None:
+                    position = self._similar(query, min_similarity)
+        if position is None:
+            return None
+        return self._names[position], self._values[position]
+
+    def get(self, name: str, default: Optional[T] = None, min_similarity: Optional[float] = None) -> Optional[T]:
+        """Value of the best match, or default"""
+        found = self.match(name, min_similarity=min_similarity)
+        return found[1] if found else default
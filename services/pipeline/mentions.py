@@ -0,0 +1,268 @@
+"""
+Review Mentions - which reviews mention which dishes, in one pass over the text
+An Aho-Corasick automaton over normalized menu names replaces per-dish substring scans
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from schemas.restaurant_profile import MenuItem, MenuItemAnalysis
+from services.pipeline.matching import normalize_dish_name
+
+# Same threshold the LLM insight path uses for MenuItem.is_popular
+POPULAR_MENTION_THRESHOLD = 3
+# Shorter derived variants (e.g. a single character) match too much unrelated text;
+# a menu name that is itself that short (粥, 湯) is kept as-is
+MIN_PATTERN_LENGTH = 2
+HIGHLIGHT_MAX_CHARS = 60
+
+_BRACKETED = re.compile(r"[\(（\[【［].*?[\)）\]】］]")
+_SIZE_SUFFIX = re.compile(r"(大|中|小|例|半)(份|碗|盤|杯)?$")
+_SENTENCE_BREAK = re.compile(r"[。！？!?\n；;]")
+
+
+def name_variants(name: str) -> List[str]:
+    """Normalized forms a review might use for a menu name (full name, without brackets / size suffix)"""
+    full_name = normalize_dish_name(name or "")
+    variants = [full_name] if full_name else []
+    for candidate in (name, _BRACKETED.sub("", name or "")):
+        normalized = normalize_dish_name(candidate)
+        for form in (normalized, _SIZE_SUFFIX.sub("", normalized)):
+            if len(form) >= MIN_PATTERN_LENGTH and form not in variants:
+                variants.append(form)
+    return variants
+
+
+class DishMentionStats:
+    """Mentions of one dish across the scanned reviews"""
+
+    def __init__(self, dish_name: str):
+        self.dish_name = dish_name
+        self.mention_count = 0      # Reviews mentioning the dish
+        self.occurrences = 0        # Total mentions (a review can mention a dish twice)
+        self.rating_total = 0
+        self.rated_count = 0
+        self.spans: List[Tuple[int, int, int]] = []  # (review index, start, end) in the original text
+        # Matches inside a longer dish name ("牛肉" in "牛肉麵"): not counted, but the review is relevant
+        self.nested_spans: List[Tuple[int, int, int]] = []
+
+    @property
+    def sentiment_score(self) -> float:
+        """Mean of (rating - 3) / 2 over mentioning reviews, in [-1, 1]"""
+        if not self.rated_count:
+            return 0.0
+        return (self.rating_total / self.rated_count - 3) / 2
+
+    @property
+    def sentiment(self) -> str:
+        score = self.sentiment_score
+        if score >= 0.25:
+            return "positive"
+        if score <= -0.25:
+            return "negative"
+        return "neutral"
+
+
+class ReviewMentions:
+    """Result of ReviewMentionIndex.scan"""
+
+    def __init__(self, texts: List[str], ratings: List[Optional[int]], stats: Dict[str, DishMentionStats],
+                 review_dishes: List[int], reviews: Sequence):
+        self.texts = texts
+        self.ratings = ratings
+        self.stats = stats
+        self._review_dishes = review_dishes  # Distinct dishes mentioned per review
+        self._reviews = reviews
+
+    def for_dish(self, dish_name: str) -> Optional[DishMentionStats]:
+        return self.stats.get(dish_name)
+
+    def review_texts(self, dish_name: str) -> List[str]:
+        """Texts of the reviews mentioning the dish, in review order (including inside a longer dish name)"""
+        stats = self.stats.get(dish_name)
+        if not stats:
+            return []
+        indices = sorted({review_index for review_index, _, _ in stats.spans + stats.nested_spans})
+        return [self.texts[i] for i in indices]
+
+    def snippet(self, review_index: int, start: int, end: int) -> str:
+        """The sentence around a mention, clipped to HIGHLIGHT_MAX_CHARS"""
+        text = self.texts[review_index]
+        left = start
+        while left > 0 and not _SENTENCE_BREAK.match(text[left - 1]) and start - left < HIGHLIGHT_MAX_CHARS // 2:
+            left -= 1
+        right = end
+        while right < len(text) and not _SENTENCE_BREAK.match(text[right]) and right - left < HIGHLIGHT_MAX_CHARS:
+            right += 1
+        return text[left:right].strip()
+
+    def highlight(self, dish_name: str) -> Optional[str]:
+        """Snippet from the highest-rated review mentioning the dish (earliest review on ties)"""
+        stats = self.stats.get(dish_name)
+        if not stats or not stats.spans:
+            return None
+        review_index, start, end = min(
+            stats.spans, key=lambda span: (-(self.ratings[span[0]] or 0), span[0], span[1])
+        )
+        return self.snippet(review_index, start, end)
+
+    def rank_reviews(self) -> list:
+        """
+        Scanned reviews reordered for LLM prompts: reviews mentioning more distinct
+        dishes first, then the rest, original order within ties
+        """
+        order = sorted(range(len(self._reviews)), key=lambda i: (-self._review_dishes[i], i))
+        return [self._reviews[i] for i in order]
+
+    def apply(self, menu_items: List[MenuItem]) -> List[MenuItem]:
+        """
+        Fill mention counts, popularity and highlight reviews from the local scan
+
+        The scan sees every review but only literal name mentions; the LLM sees a
+        sample of reviews but understands paraphrases. Both undercount, so
+        mention_count takes the larger of the two. Dishes the LLM reported as not
+        mentioned get the rating-based sentiment and a snippet instead.
+        """
+        updated = []
+        for item in menu_items:
+            stats = self.stats.get(item.name)
+            if not stats or not stats.mention_count:
+                updated.append(item)
+                continue
+
+            insight = item.ai_insight
+            if insight is None or not insight.mention_count:
+                insight = MenuItemAnalysis(
+                    sentiment=stats.sentiment,
+                    summary=self.highlight(item.name) or (insight.summary if insight else ""),
+                    mention_count=stats.mention_count
+                )
+            elif stats.mention_count > insight.mention_count:
+                insight = insight.model_copy(update={"mention_count": stats.mention_count})
+
+            update = {
+                "ai_insight": insight,
+                "is_popular": item.is_popular or insight.mention_count >= POPULAR_MENTION_THRESHOLD,
+            }
+            if item.analysis is not None and not item.analysis.highlight_review:
+                update["analysis"] = item.analysis.model_copy(update={"highlight_review": self.highlight(item.name)})
+            updated.append(item.model_copy(update=update))
+        return updated
+
+
+class ReviewMentionIndex:
+    """
+    Aho-Corasick automaton over the name variants of one restaurant's menu
+
+    Build once per menu, then scan() any number of reviews in time linear in
+    their length. Review text is matched after the same normalization as dish
+    names (NFKC, casefold, punctuation and spaces skipped). Counts resolve
+    overlapping matches leftmost-longest, so "招牌牛肉麵" is not also counted as
+    "牛肉麵"; the shorter match is still kept (nested_spans) for review_texts.
+    """
+
+    def __init__(self, dish_names: Sequence[str]):
+        self.dish_names = list(dict.fromkeys(dish_names))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, List[int]]]] = [[]]  # (pattern length, dish indices)
+
+        patterns: Dict[str, List[int]] = {}
+        for dish_index, name in enumerate(self.dish_names):
+            for variant in name_variants(name):
+                patterns.setdefault(variant, []).append(dish_index)
+
+        for pattern, dishes in patterns.items():
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = nxt
+            self._output[state].append((len(pattern), dishes))
+        self.pattern_count = len(patterns)
+
+        # Breadth-first failure links; outputs of the failure state are inherited
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def _find(self, text: str) -> List[Tuple[int, int, List[int], bool]]:
+        """
+        Every (start, end, dish indices, nested) in original-text offsets; nested marks
+        matches that lose to an overlapping leftmost-longest one
+        """
+        folded = text.casefold()
+        if unicodedata.is_normalized("NFKC", text) and len(folded) == len(text):
+            # Common case: one normalized character per original character
+            stream = enumerate(folded)
+        else:
+            stream = (
+                (position, char)
+                for position, raw_char in enumerate(text)
+                for char in unicodedata.normalize("NFKC", raw_char).casefold()
+            )
+
+        goto, fail, output = self._goto, self._fail, self._output
+        offsets: List[int] = []  # Original index of each normalized character
+        matches = []
+        state = 0
+        for position, char in stream:
+            if not (char.isalnum() or char == "_"):
+                continue
+            offsets.append(position)
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for length, dishes in output[state]:
+                    matches.append((len(offsets) - length, len(offsets), dishes))
+
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+        found = []
+        covered_until = 0
+        for start, end, dishes in matches:
+            nested = start < covered_until
+            if not nested:
+                covered_until = end
+            found.append((offsets[start], offsets[end - 1] + 1, dishes, nested))
+        return found
+
+    def scan(self, reviews: Sequence) -> ReviewMentions:
+        """Scan reviews (RawReview-like objects with text/rating, or plain strings)"""
+        texts = [getattr(review, "text", review) or "" for review in reviews]
+        ratings = [getattr(review, "rating", None) for review in reviews]
+        stats = {name: DishMentionStats(name) for name in self.dish_names}
+        review_dishes = []
+
+        for review_index, text in enumerate(texts):
+            seen = set()
+            for start, end, dishes, nested in self._find(text) if self.pattern_count else ():
+                for dish_index in dishes:
+                    dish_stats = stats[self.dish_names[dish_index]]
+                    if nested:
+                        dish_stats.nested_spans.append((review_index, start, end))
+                        continue
+                    dish_stats.occurrences += 1
+                    dish_stats.spans.append((review_index, start, end))
+                    if dish_index not in seen:
+                        seen.add(dish_index)
+                        dish_stats.mention_count += 1
+                        if ratings[review_index] is not None:
+                            dish_stats.rating_total += ratings[review_index]
+                            dish_stats.rated_count += 1
+            review_dishes.append(len(seen))
+
+        return ReviewMentions(texts, ratings, stats, review_dishes, reviews)
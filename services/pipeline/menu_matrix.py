@@ -0,0 +1,234 @@
+"""
+Menu Matrix - columnar NumPy view of a profile's menu for ranking hot paths
+Built once per cached profile; scoring, hard filtering and balance checks become array operations
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from schemas.allergens import ALLERGEN_MASK
+from schemas.restaurant_profile import MenuItem, RestaurantProfile
+from services.memory_cache import BoundedTTLCache
+
+MENU_MATRIX_CACHE_MAX_ENTRIES = int(os.getenv("MENU_MATRIX_CACHE_MAX_ENTRIES", "256"))
+MENU_MATRIX_CACHE_TTL_SECONDS = float(os.getenv("MENU_MATRIX_CACHE_TTL_SECONDS", "3600"))
+
+DEFAULT_CATEGORY = "其他"
+
+# Balance keywords (same rules as BalanceCheckerAgent._analyze_menu)
+FRIED_KEYWORDS = ("炸", "fried", "酥")
+VEGETABLE_CATEGORY_KEYWORDS = ("蔬菜",)
+VEGETABLE_NAME_KEYWORDS = ("青菜",)
+SOUP_CATEGORY_KEYWORDS = ("湯",)
+STAPLE_CATEGORY_KEYWORDS = ("主食",)
+STAPLE_NAME_KEYWORDS = ("飯", "麵")
+
+# DishAttributes.suitable_occasions tags packed into occasion_mask
+OCCASION_TAGS = ("group_share", "family", "date", "business", "alcohol_pairing", "casual")
+OCCASION_TAG_BITS = {tag: 1 << i for i, tag in enumerate(OCCASION_TAGS)}
+LIGHT_COOKING_METHODS = ("steamed", "boiled", "raw", "blanched", "poached", "cold")
+
+_SENTIMENT_CODES = {"positive": 1, "negative": -1}
+
+_matrix_cache = BoundedTTLCache("menu_matrix", max_entries=MENU_MATRIX_CACHE_MAX_ENTRIES, default_ttl=MENU_MATRIX_CACHE_TTL_SECONDS)
+
+
+def _contains_any(text: str, keywords: Sequence[str]) -> bool:
+    return any(keyword in text for keyword in keywords)
+
+
+class MenuMatrix:
+    """
+    Column arrays over menu_items (row i is menu_items[i])
+
+    Columns: price, sentiment_score, mention_count, insight sentiment (-1/0/1),
+    popular / risky / signature / has_analysis flags, category codes, the packed
+    hard-filter bitmask, suitable-occasion bitmask and balance flags
+    (vegetable, soup, staple, fried, light).
+    """
+
+    def __init__(self, menu_items: List[MenuItem]):
+        self.menu_items = menu_items
+        n = len(menu_items)
+        self.size = n
+
+        price = np.zeros(n, dtype=np.int64)
+        sentiment_score = np.zeros(n, dtype=np.float64)
+        mention_count = np.zeros(n, dtype=np.int64)
+        insight_sentiment = np.zeros(n, dtype=np.int8)
+        has_insight = np.zeros(n, dtype=bool)
+        has_analysis = np.zeros(n, dtype=bool)
+        is_popular = np.zeros(n, dtype=bool)
+        is_risky = np.zeros(n, dtype=bool)
+        is_signature = np.zeros(n, dtype=bool)
+        filter_mask = np.zeros(n, dtype=np.int64)
+        is_vegetable = np.zeros(n, dtype=bool)
+        is_soup = np.zeros(n, dtype=bool)
+        is_staple = np.zeros(n, dtype=bool)
+        is_fried = np.zeros(n, dtype=bool)
+        occasion_mask = np.zeros(n, dtype=np.int64)
+        is_light = np.zeros(n, dtype=bool)
+
+        self.categories: List[str] = []
+        category_codes: Dict[str, int] = {}
+        codes = np.zeros(n, dtype=np.int32)
+        self._positions: Dict[int, int] = {}
+
+        # The only per-item Python pass; everything downstream works on the columns
+        for i, item in enumerate(menu_items):
+            self._positions[id(item)] = i
+            price[i] = item.price or 0
+            is_popular[i] = item.is_popular
+            is_risky[i] = item.is_risky
+
+            analysis = item.analysis
+            if analysis is not None:
+                has_analysis[i] = True
+                sentiment_score[i] = analysis.sentiment_score or 0.0
+                is_signature[i] = analysis.is_signature
+                filter_mask[i] = analysis.filter_mask
+                for tag in analysis.suitable_occasions:
+                    occasion_mask[i] |= OCCASION_TAG_BITS.get(tag.lower(), 0)
+                is_light[i] = (analysis.cooking_method or "").lower() in LIGHT_COOKING_METHODS
+
+            insight = item.ai_insight
+            if insight is not None:
+                has_insight[i] = True
+                mention_count[i] = insight.mention_count
+                insight_sentiment[i] = _SENTIMENT_CODES.get(insight.sentiment, 0)
+
+            category = item.category or DEFAULT_CATEGORY
+            code = category_codes.get(category)
+            if code is None:
+                code = category_codes[category] = len(self.categories)
+                self.categories.append(category)
+            codes[i] = code
+
+            name = item.name.lower()
+            is_vegetable[i] = _contains_any(category, VEGETABLE_CATEGORY_KEYWORDS) or _contains_any(name, VEGETABLE_NAME_KEYWORDS)
+            is_soup[i] = _contains_any(category, SOUP_CATEGORY_KEYWORDS)
+            is_staple[i] = _contains_any(category, STAPLE_CATEGORY_KEYWORDS) or _contains_any(name, STAPLE_NAME_KEYWORDS)
+            is_fried[i] = _contains_any(name, FRIED_KEYWORDS)
+
+        self.price = price
+        self.sentiment_score = sentiment_score
+        self.mention_count = mention_count
+        self.insight_sentiment = insight_sentiment
+        self.has_insight = has_insight
+        self.has_analysis = has_analysis
+        self.is_popular = is_popular
+        self.is_risky = is_risky
+        self.is_signature = is_signature
+        self.filter_mask = filter_mask
+        self.category_codes = codes
+        self._category_index = category_codes
+        self.is_vegetable = is_vegetable
+        self.is_soup = is_soup
+        self.is_staple = is_staple
+        self.is_fried = is_fried
+        self.occasion_mask = occasion_mask
+        self.is_light = is_light & ~is_fried
+        self.scores = self._score()
+
+    def _score(self) -> np.ndarray:
+        """
+        Vectorized services.pipeline.rankings.score_menu_item
+        (terms added in the same order, so scores and ties match exactly)
+        """
+        score = 10.0 * self.is_popular
+        score = score + 5.0 * self.sentiment_score
+        sentiment_bonus = 3.0 * (self.insight_sentiment == 1) - 5.0 * (self.insight_sentiment == -1)
+        score = score + np.where(self.has_insight, sentiment_bonus, 0.0)
+        score = score + np.where(self.has_insight, 0.5 * np.minimum(self.mention_count, 5), 0.0)
+        return score - 10.0 * self.is_risky
+
+    def rows_for(self, items: Sequence[MenuItem]) -> Optional[np.ndarray]:
+        """Row numbers of these exact item objects, or None if any is not from this menu"""
+        rows = np.empty(len(items), dtype=np.int64)
+        for position, item in enumerate(items):
+            row = self._positions.get(id(item))
+            if row is None or self.menu_items[row] is not item:
+                return None
+            rows[position] = row
+        return rows
+
+    def category_code(self, category: str) -> int:
+        """Code of a category, -1 if the menu has none"""
+        return self._category_index.get(category or DEFAULT_CATEGORY, -1)
+
+    def rank(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Rows (all, or the given ones) ordered best score first, row order on ties"""
+        if rows is None:
+            rows = np.arange(self.size)
+        return rows[np.lexsort((rows, -self.scores[rows]))]
+
+    def category_rankings(self) -> Dict[str, List[int]]:
+        """Category -> rows best first (the RestaurantProfile.category_rankings layout)"""
+        order = np.lexsort((np.arange(self.size), -self.scores, self.category_codes))
+        sorted_codes = self.category_codes[order]
+        splits = np.flatnonzero(np.diff(sorted_codes)) + 1
+        rankings = {}
+        for group in np.split(order, splits) if self.size else ():
+            rankings[self.categories[self.category_codes[group[0]]]] = group.tolist()
+        return rankings
+
+    def hard_filter(self, forbidden: int, required: int, max_price: Optional[int],
+                    unknown_allergens: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+        """
+        Boolean columns for a compiled hard filter: "allowed" plus one per rejection reason
+        (rows without analysis pass the attribute checks, as in CompiledHardFilter.allows)
+        """
+        checked = self.has_analysis
+        violates = ((self.filter_mask & forbidden) != 0) | ((self.filter_mask & required) != required)
+        attribute_reject = checked & violates
+        allergen_reject = attribute_reject & ((self.filter_mask & forbidden & ALLERGEN_MASK) != 0)
+        attribute_reject &= ~allergen_reject
+
+        if unknown_allergens:
+            # Free-text allergies outside the vocabulary: only rows that are still in play
+            for row in np.flatnonzero(checked & ~violates):
+                allergens = self.menu_items[row].analysis.allergens
+                if any(term in allergen.lower() for term in unknown_allergens for allergen in allergens):
+                    allergen_reject[row] = True
+
+        if max_price:
+            budget_reject = ~attribute_reject & ~allergen_reject & (self.price > max_price)
+        else:
+            budget_reject = np.zeros(self.size, dtype=bool)
+
+        return {
+            "allowed": ~(attribute_reject | allergen_reject | budget_reject),
+            "attributes": attribute_reject,
+            "allergens": allergen_reject,
+            "budget": budget_reject,
+        }
+
+    def balance(self, rows: np.ndarray) -> Dict[str, object]:
+        """Composition of a selection of rows: category counts, balance flags, fried ratio"""
+        rows = np.asarray(rows, dtype=np.int64)
+        count = len(rows)
+        codes, counts = np.unique(self.category_codes[rows], return_counts=True)
+        return {
+            "categories": {self.categories[code]: int(c) for code, c in zip(codes, counts)},
+            "dish_count": count,
+            "has_vegetable": bool(self.is_vegetable[rows].any()),
+            "has_soup": bool(self.is_soup[rows].any()),
+            "has_staple": bool(self.is_staple[rows].any()),
+            "greasy_ratio": float(self.is_fried[rows].mean()) if count else 0.0,
+        }
+
+
+def get_menu_matrix(profile: RestaurantProfile) -> MenuMatrix:
+    """MenuMatrix for a profile, cached per profile version (rebuilt if the menu list changed)"""
+    key = (profile.place_id, profile.updated_at.isoformat() if profile.updated_at else None, len(profile.menu_items))
+    matrix = _matrix_cache.get(key)
+    if matrix is None or matrix.menu_items is not profile.menu_items:
+        matrix = MenuMatrix(profile.menu_items)
+        _matrix_cache.set(key, matrix)
+    return matrix
+
+
+def get_menu_matrix_cache_stats() -> Dict[str, int]:
+    return _matrix_cache.stats()
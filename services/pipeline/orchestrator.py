@@ -4,13 +4,25 @@ Controls flow, handles fallbacks, and assembles final restaurant profile
 """
 
 import asyncio
+import inspect
+import os
 from datetime import datetime, timezone
-from typing import Optional, Union, List, Callable
+from typing import Optional, Union, List, Callable, Tuple
 
 from schemas.restaurant_profile import RestaurantProfile, MenuItem
-from schemas.pipeline import ParsedMenuItem, PipelineInput
+from schemas.pipeline import ParsedMenuItem, PipelineInput, RawReview
 from .providers import UnifiedMapProvider, WebSearchProvider
 from .intelligence import MenuParser, InsightEngine, MenuIntelligence
+from .mentions import ReviewMentionIndex
+from .rankings import build_category_rankings
+
+# How review fusion (STEP 3) and dish attributes (STEP 3.5) are produced:
+#   sequential - fuse_reviews, then analyze_dish_batch (default, original behaviour)
+#   concurrent - both calls at once, results merged per dish (opt-in; the attribute
+#                prompt loses the per-dish review insights, see _enrich_concurrent)
+#   fused      - one structured call (opt-in; falls back to concurrent on failure)
+MENU_ENRICHMENT_MODES = ("sequential", "concurrent", "fused")
+MENU_ENRICHMENT_MODE = os.getenv("MENU_ENRICHMENT_MODE", "sequential").lower()
 
 
 class RestaurantPipeline:
@@ -19,13 +31,27 @@ class RestaurantPipeline:
     Coordinates data acquisition, parsing, and fusion
     """
 
-    def __init__(self):
+    def __init__(self, enrichment_mode: Optional[str] = None):
         self.map_provider = UnifiedMapProvider()
         self.web_provider = WebSearchProvider()
         self.menu_parser = MenuParser()
         self.insight_engine = InsightEngine()
         self.menu_intelligence = MenuIntelligence()
 
+        self.enrichment_mode = (enrichment_mode or MENU_ENRICHMENT_MODE).lower()
+        if self.enrichment_mode not in MENU_ENRICHMENT_MODES:
+            print(f"[Pipeline] Unknown MENU_ENRICHMENT_MODE '{self.enrichment_mode}', using sequential")
+            self.enrichment_mode = "sequential"
+
+    @staticmethod
+    async def _report_progress(progress_callback: Optional[Callable], step: int, message: str):
+        """Invoke the progress callback, awaiting it if it is async"""
+        if not progress_callback:
+            return
+        result = progress_callback(step, message)
+        if inspect.isawaitable(result):
+            await result
+
     async def process(
         self, 
         input_data: Union[str, PipelineInput],
@@ -37,6 +63,7 @@ class RestaurantPipeline:
         Args:
             input_data: Name of the restaurant or PipelineInput object
             progress_callback: Optional callback function(step: int, message: str) for progress updates
+                (may be a coroutine function; it is awaited so updates stay in order)
 
         Returns:
             RestaurantProfile or None if processing fails
@@ -55,8 +82,7 @@ class RestaurantPipeline:
 
             # STEP 1: Parallel data acquisition
             print("[Pipeline] STEP 1: Fetching data from external sources...")
-            if progress_callback:
-                progress_callback(1, "正在搜尋餐廳菜單...")
+            await self._report_progress(progress_callback, 1, "正在搜尋餐廳菜單...")
 
             map_task = self.map_provider.fetch_map_data(restaurant_name, place_id=place_id)
             web_task = self.web_provider.search_and_fetch(restaurant_name)
@@ -85,13 +111,11 @@ class RestaurantPipeline:
             print(f"  - Map data: ✓ ({len(map_data.images)} images, {len(map_data.reviews)} reviews)")
             print(f"  - Web content: {'✓' if web_content else '✗'}")
             
-            if progress_callback:
-                progress_callback(2, "正在抓取餐廳評論...")
+            await self._report_progress(progress_callback, 2, "正在抓取餐廳評論...")
 
             # STEP 2: Menu extraction strategy
             print(f"\n[Pipeline] STEP 2: Extracting menu...")
-            if progress_callback:
-                progress_callback(3, "正在解析菜單內容...")
+            await self._report_progress(progress_callback, 3, "正在解析菜單內容...")
 
             menu_items: List[ParsedMenuItem] = []
             trust_level = "low"
@@ -138,25 +162,11 @@ class RestaurantPipeline:
 
             print(f"[Pipeline] Menu extraction complete: {len(menu_items)} items (trust: {trust_level})")
 
-            # STEP 3: Review fusion
-            print(f"\n[Pipeline] STEP 3: Fusing reviews with menu...")
-            if progress_callback:
-                progress_callback(4, "正在融合評論與菜單...")
-
-            enhanced_menu, review_summary = await self.insight_engine.fuse_reviews(
-                menu_items=menu_items,
-                reviews=map_data.reviews
-            )
+            # STEP 3 + 3.5: Review fusion and DishAttributes for recommendation system
+            print(f"\n[Pipeline] STEP 3: Enriching menu with reviews and dish attributes ({self.enrichment_mode})...")
+            await self._report_progress(progress_callback, 4, "正在融合評論與菜單...")
 
-            print(f"[Pipeline] ✓ Review fusion complete")
-
-            # STEP 3.5: Generate DishAttributes for recommendation system
-            print(f"\n[Pipeline] STEP 3.5: Generating dish attributes for recommendations...")
-
-            final_menu = await self.menu_intelligence.analyze_dish_batch(
-                menu_items=enhanced_menu,
-                reviews=map_data.reviews
-            )
+            final_menu, review_summary = await self.enrich_menu(menu_items, map_data.reviews)
 
             items_with_analysis = sum(1 for item in final_menu if item.analysis)
             print(f"[Pipeline] ✓ Dish attributes generated for {items_with_analysis}/{len(final_menu)} items")
@@ -172,7 +182,8 @@ class RestaurantPipeline:
                 trust_level=trust_level,
                 menu_source_url=menu_source_url,
                 menu_items=final_menu,  # Use final_menu with DishAttributes
-                review_summary=review_summary
+                review_summary=review_summary,
+                category_rankings=build_category_rankings(final_menu)
             )
 
             print(f"\n{'='*60}")
@@ -190,6 +201,86 @@ class RestaurantPipeline:
             traceback.print_exc()
             return None
 
+    async def enrich_menu(self, menu_items: List[ParsedMenuItem], reviews: List[RawReview]) -> Tuple[List[MenuItem], str]:
+        """
+        Produce menu items with review insights (ai_insight) and DishAttributes (analysis)
+        using the configured enrichment mode
+
+        Reviews are first scanned locally for dish mentions: reviews that mention
+        dishes are sent to the LLM first, and the local counts / snippets fill in
+        mention_count, is_popular and highlight_review afterwards.
+
+        Returns:
+            Tuple of (final menu items, overall review summary)
+        """
+        mentions = ReviewMentionIndex([item.name for item in menu_items]).scan(reviews)
+        mentioned = sum(1 for stats in mentions.stats.values() if stats.mention_count)
+        print(f"[Pipeline] Local review scan: {mentioned}/{len(menu_items)} dishes mentioned in {len(reviews)} reviews")
+
+        final_menu, review_summary = await self._enrich(menu_items, mentions.rank_reviews())
+        return mentions.apply(final_menu), review_summary
+
+    async def _enrich(self, menu_items: List[ParsedMenuItem], reviews: List[RawReview]) -> Tuple[List[MenuItem], str]:
+        """LLM enrichment in the configured mode"""
+        if self.enrichment_mode == "fused":
+            fused = await self.menu_intelligence.enrich_menu(menu_items, reviews)
+            if fused is not None:
+                return fused
+            print("[Pipeline] Fused enrichment failed, falling back to concurrent calls")
+            return await self._enrich_concurrent(menu_items, reviews)
+
+        if self.enrichment_mode == "concurrent":
+            return await self._enrich_concurrent(menu_items, reviews)
+
+        enhanced_menu, review_summary = await self.insight_engine.fuse_reviews(
+            menu_items=menu_items,
+            reviews=reviews
+        )
+        print(f"[Pipeline] ✓ Review fusion complete")
+
+        final_menu = await self.menu_intelligence.analyze_dish_batch(
+            menu_items=enhanced_menu,
+            reviews=reviews
+        )
+        return final_menu, review_summary
+
+    async def _enrich_concurrent(self, menu_items: List[ParsedMenuItem], reviews: List[RawReview]) -> Tuple[List[MenuItem], str]:
+        """
+        Run review fusion and attribute analysis at the same time, then merge per dish
+
+        Trade-off: analyze_dish_batch gets items without ai_insight, so its prompt lacks
+        review_sentiment / review_summary / mention_count (MenuIntelligence._menu_entry)
+        and is_signature / highlight_review rely on the raw review texts alone.
+        """
+        plain_items = [
+            MenuItem(
+                name=item.name,
+                price=item.price,
+                category=item.category,
+                description=item.description,
+                source_type="dine_in"
+            )
+            for item in menu_items
+        ]
+
+        (enhanced_menu, review_summary), analyzed_menu = await asyncio.gather(
+            self.insight_engine.fuse_reviews(menu_items=menu_items, reviews=reviews),
+            self.menu_intelligence.analyze_dish_batch(menu_items=plain_items, reviews=reviews)
+        )
+
+        # Both lists follow the order of menu_items; fall back to names if a stage dropped items
+        if len(analyzed_menu) == len(enhanced_menu):
+            analyses = [item.analysis for item in analyzed_menu]
+        else:
+            by_name = {item.name: item.analysis for item in analyzed_menu}
+            analyses = [by_name.get(item.name) for item in enhanced_menu]
+
+        final_menu = [
+            item.model_copy(update={"analysis": analysis}) if analysis is not None else item
+            for item, analysis in zip(enhanced_menu, analyses)
+        ]
+        return final_menu, review_summary
+
 
 async def test_pipeline():
     """Test function for local development"""
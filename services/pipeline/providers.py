@@ -3,15 +3,28 @@ Data Acquisition Layer - External API providers
 Handles communication with Apify, Serper, and Jina Reader
 """
 
+import asyncio
 import os
-import httpx
+import zlib
+from services.http_clients import get_client
 from typing import Optional
 from apify_client import ApifyClientAsync
 
 from schemas.pipeline import MapData, WebContent, RawReview
+from services.firestore_async import run_firestore
 from firebase_admin import firestore
 from datetime import datetime, timedelta, timezone
 
+APIFY_MAP_ACTOR = "compass/crawler-google-places"
+MAP_DATA_MAX_REVIEWS = int(os.getenv("MAP_DATA_MAX_REVIEWS", "50"))
+MAP_DATA_RETRY_DELAY_SECONDS = float(os.getenv("MAP_DATA_RETRY_DELAY_SECONDS", "5"))
+# Raw Apify results per place_id; well under the profile soft TTL so refreshes still re-crawl
+MAP_DATA_CACHE_TTL_HOURS = float(os.getenv("MAP_DATA_CACHE_TTL_HOURS", "24"))
+MAP_DATA_CACHE_COLLECTION = "map_data_cache"
+MAP_DATA_CACHE_COMPRESSION_LEVEL = 6
+# Dataset item fields read by UnifiedMapProvider._to_map_data
+MAP_DATA_ITEM_FIELDS = ("placeId", "title", "address", "phone", "totalScore", "reviews")
+
 
 class UnifiedMapProvider:
     """
@@ -19,6 +32,10 @@ class UnifiedMapProvider:
     - Restaurant images
     - Customer reviews
     - Address and contact info
+
+    Results are cached per place_id in Firestore (zlib-compressed JSON) for
+    MAP_DATA_CACHE_TTL_HOURS, so a cold start retried after a downstream failure
+    does not pay for another crawl.
     """
 
     def __init__(self):
@@ -26,152 +43,205 @@ class UnifiedMapProvider:
         if not self.api_token:
             raise ValueError("APIFY_API_TOKEN environment variable not set")
 
+        try:
+            self.db = firestore.client()
+        except Exception:
+            self.db = None
+            print("[UnifiedMapProvider] Warning: Firestore client failed to initialize, map data cache disabled")
+
     async def fetch_map_data(self, restaurant_name: str, place_id: Optional[str] = None) -> Optional[MapData]:
         """
         Fetch restaurant data from Google Maps via Apify
         
         Args:
             restaurant_name: Name of the restaurant to search
-            place_id: Optional Google Place ID for precise lookup
+            place_id: Optional Google Place ID for precise lookup (enables the cache)
             
         Note:
-            - maxImages is set to 0 (no images) for speed optimization
-            - maxReviews is set to 30 for speed optimization
-            - Memory is set to 1024MB (balanced between speed and stability)
+            - Images are not extracted (imageUrls parsing is disabled)
+            - maxReviews is MAP_DATA_MAX_REVIEWS (50); reviews are trimmed to text and rating
+            - Memory is set to 512MB, retried once at 256MB on a memory quota error
 
         Returns:
             MapData object or None if fetch fails
         """
+        if place_id:
+            cached = await self._cache_get(place_id)
+            if cached:
+                return cached
+
+        client = ApifyClientAsync(self.api_token)
+
+        # Prepare run input with optimized memory settings
+        run_input = {
+            "maxImages": 10,
+            "maxReviews": MAP_DATA_MAX_REVIEWS,
+            "maxCrawledPlaces": 1,  # Only crawl the target restaurant
+            "language": "zh-TW",
+            "proxyConfiguration": {"useApifyProxy": True},
+        }
+
+        if place_id:
+            # Use startUrls with Place ID for precision
+            # Format: https://www.google.com/maps/search/?api=1&query=Google&query_place_id={place_id}
+            # This forces Google Maps to open the specific place
+            run_input["startUrls"] = [
+                {"url": f"https://www.google.com/maps/search/?api=1&query=Google&query_place_id={place_id}"}
+            ]
+            print(f"[UnifiedMapProvider] Using Place ID lookup: {place_id}")
+        else:
+            # Fallback to search string
+            run_input["searchStringsArray"] = [restaurant_name]
+            print(f"[UnifiedMapProvider] Using search string: {restaurant_name}")
+
         try:
             print(f"[UnifiedMapProvider] Fetching data for: {restaurant_name} (Place ID: {place_id})")
+            # Reduced memory allocation (512MB instead of default 4GB)
+            data = await self._crawl(client, run_input, place_id, memory_mbytes=512)
 
-            client = ApifyClientAsync(self.api_token)
-
-            # Prepare run input with optimized memory settings
-            run_input = {
-                "maxImages": 10,
-                "maxReviews": 50,  # Increased from 30 to support better review extraction
-                "maxCrawledPlaces": 1,  # Only crawl the target restaurant
-                "language": "zh-TW",
-                "proxyConfiguration": {"useApifyProxy": True},
-            }
-
-            if place_id:
-                # Use startUrls with Place ID for precision
-                # Format: https://www.google.com/maps/search/?api=1&query=Google&query_place_id={place_id}
-                # This forces Google Maps to open the specific place
-                run_input["startUrls"] = [
-                    {"url": f"https://www.google.com/maps/search/?api=1&query=Google&query_place_id={place_id}"}
-                ]
-                print(f"[UnifiedMapProvider] Using Place ID lookup: {place_id}")
-            else:
-                # Fallback to search string
-                run_input["searchStringsArray"] = [restaurant_name]
-                print(f"[UnifiedMapProvider] Using search string: {restaurant_name}")
-
-            # Call the actor with reduced memory allocation (512MB instead of default 4GB)
-            print(f"[UnifiedMapProvider] Calling Apify actor with input: {run_input}")
-            actor_call = await client.actor("compass/crawler-google-places").call(
-                run_input=run_input,
-                memory_mbytes=512  # Reduce memory from 4096MB to 512MB
-            )
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[UnifiedMapProvider] Error fetching data: {error_msg}")
+            
+            # Special handling for Apify quota errors
+            if "exceed the memory limit" not in error_msg:
+                import traceback
+                traceback.print_exc()
+                return None
+
+            print("[UnifiedMapProvider] Apify memory quota exceeded. This might be temporary.")
+            print("[UnifiedMapProvider] Possible causes:")
+            print("  1. Other tasks are running on your Apify account")
+            print("  2. Previous tasks haven't finished yet")
+            print("  3. Multiple concurrent requests")
+            print(f"[UnifiedMapProvider] Waiting {MAP_DATA_RETRY_DELAY_SECONDS:g} seconds and retrying once...")
+            await asyncio.sleep(MAP_DATA_RETRY_DELAY_SECONDS)
+
+            try:
+                # Retry once with even lower memory (256MB)
+                print("[UnifiedMapProvider] Retrying with 256MB memory allocation...")
+                data = await self._crawl(client, run_input, place_id, memory_mbytes=256)
+                print("[UnifiedMapProvider] Retry successful!")
+            except Exception as retry_error:
+                print(f"[UnifiedMapProvider] Retry also failed: {retry_error}")
+                return None
 
-            print(f"[UnifiedMapProvider] Actor call completed. Dataset ID: {actor_call.get('defaultDatasetId', 'N/A')}")
+        if not data:
+            print(f"[UnifiedMapProvider] No data found for {restaurant_name}")
+            return None
 
-            # Fetch results
-            dataset_client = client.dataset(actor_call["defaultDatasetId"])
-            items = []
-            async for item in dataset_client.iterate_items():
-                items.append(item)
+        map_data = self._to_map_data(data, restaurant_name)
+        print(f"[UnifiedMapProvider] Success: {len(map_data.images)} images, {len(map_data.reviews)} reviews")
+        if place_id and map_data.place_id != place_id:
+            # First-item fallback: another place's data must not be cached under the requested place_id
+            print(f"[UnifiedMapProvider] Not caching: got {map_data.place_id or 'unknown place'} for {place_id}")
+        else:
+            await self._cache_set(map_data.place_id, map_data)
+        return map_data
 
-            print(f"[UnifiedMapProvider] Retrieved {len(items)} items from dataset")
+    async def _crawl(self, client: ApifyClientAsync, run_input: dict, place_id: Optional[str],
+                     memory_mbytes: int) -> Optional[dict]:
+        """Run the actor and return its first dataset item matching place_id (first item otherwise)"""
+        print(f"[UnifiedMapProvider] Calling Apify actor with input: {run_input}")
+        actor_call = await client.actor(APIFY_MAP_ACTOR).call(run_input=run_input, memory_mbytes=memory_mbytes)
+        if actor_call is None:
+            raise RuntimeError("Apify actor run did not finish")
 
-            if not items:
-                print(f"[UnifiedMapProvider] No data found for {restaurant_name}")
-                return None
+        # apify-client < 3 returns a dict, 3.x a Run model
+        dataset_id = actor_call["defaultDatasetId"] if isinstance(actor_call, dict) else actor_call.default_dataset_id
+        print(f"[UnifiedMapProvider] Actor call completed. Dataset ID: {dataset_id}")
 
-            # Get first result (most relevant)
-            data = items[0]
-
-            # Extract images - DISABLED
-            images = []
-            # if "imageUrls" in data and data["imageUrls"]:
-            #     images = data["imageUrls"][:max_images]
-
-            # Extract reviews
-            reviews = []
-            if "reviews" in data and data["reviews"]:
-                for review_data in data["reviews"]:
-                    try:
-                        review = RawReview(
-                            text=review_data.get("text", ""),
-                            rating=review_data.get("stars", 3),
-                            published_at=review_data.get("publishedAtDate"),
-                            author_name=review_data.get("name")
-                        )
-                        reviews.append(review)
-                    except Exception as e:
-                        print(f"[UnifiedMapProvider] Failed to parse review: {e}")
-                        continue
-
-            # Build MapData
-            map_data = MapData(
-                place_id=data.get("placeId", ""),
-                name=data.get("title", restaurant_name),
-                address=data.get("address", "Address not available"),
-                phone=data.get("phone"),
-                rating=data.get("totalScore"),
-                images=images,
-                reviews=reviews
-            )
+        # Only the fields _to_map_data reads; stop paging once the place is found
+        first = None
+        scanned = 0
+        async for item in client.dataset(dataset_id).iterate_items(fields=list(MAP_DATA_ITEM_FIELDS)):
+            scanned += 1
+            if first is None:
+                first = item
+            if not place_id or item.get("placeId") == place_id:
+                print(f"[UnifiedMapProvider] Matched dataset item after {scanned} item(s)")
+                return item
 
-            print(f"[UnifiedMapProvider] Success: {len(images)} images, {len(reviews)} reviews")
-            return map_data
+        if first is not None:
+            print(f"[UnifiedMapProvider] No item matched {place_id} in {scanned} item(s), using the first")
+        return first
+
+    @staticmethod
+    def _to_map_data(data: dict, restaurant_name: str) -> MapData:
+        # Extract images - DISABLED
+        images = []
+        # if "imageUrls" in data and data["imageUrls"]:
+        #     images = data["imageUrls"][:max_images]
+
+        # Extract reviews: downstream stages read only text and rating, and skip reviews without text
+        reviews = []
+        for review_data in data.get("reviews") or []:
+            if len(reviews) >= MAP_DATA_MAX_REVIEWS:
+                break
+            if not (review_data.get("text") or "").strip():
+                continue
+            try:
+                review = RawReview(text=review_data["text"], rating=review_data.get("stars", 3))
+                reviews.append(review)
+            except Exception as e:
+                print(f"[UnifiedMapProvider] Failed to parse review: {e}")
+                continue
 
+        return MapData(
+            place_id=data.get("placeId", ""),
+            name=data.get("title", restaurant_name),
+            address=data.get("address", "Address not available"),
+            phone=data.get("phone"),
+            rating=data.get("totalScore"),
+            images=images,
+            reviews=reviews
+        )
+
+    async def _cache_get(self, place_id: str) -> Optional[MapData]:
+        if not self.db or MAP_DATA_CACHE_TTL_HOURS <= 0:
+            return None
+        try:
+            doc = await run_firestore(self.db.collection(MAP_DATA_CACHE_COLLECTION).document(place_id).get)
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            cached_at = data.get("cached_at")
+            # Ensure cached_at is timezone-aware
+            if cached_at and cached_at.tzinfo is None:
+                cached_at = cached_at.replace(tzinfo=timezone.utc)
+            if not cached_at or datetime.now(timezone.utc) - cached_at >= timedelta(hours=MAP_DATA_CACHE_TTL_HOURS):
+                return None
+
+            map_data = decode_map_data(data["payload"])
+            print(f"[UnifiedMapProvider] Cache hit for {place_id} ({len(map_data.reviews)} reviews, "
+                  f"cached {(datetime.now(timezone.utc) - cached_at).total_seconds() / 3600:.1f}h ago)")
+            return map_data
         except Exception as e:
-            error_msg = str(e)
-            print(f"[UnifiedMapProvider] Error fetching data: {error_msg}")
-            
-            # Special handling for Apify quota errors
-            if "exceed the memory limit" in error_msg:
-                print("[UnifiedMapProvider] Apify memory quota exceeded. This might be temporary.")
-                print("[UnifiedMapProvider] Possible causes:")
-                print("  1. Other tasks are running on your Apify account")
-                print("  2. Previous tasks haven't finished yet")
-                print("  3. Multiple concurrent requests")
-                print("[UnifiedMapProvider] Waiting 5 seconds and retrying once...")
-                
-                import asyncio
-                await asyncio.sleep(5)
-                
-                try:
-                    # Retry once with even lower memory (256MB)
-                    print("[UnifiedMapProvider] Retrying with 256MB memory allocation...")
-                    actor_call = await client.actor("compass/crawler-google-places").call(
-                        run_input=run_input,
-                        memory_mbytes=256
-                    )
-                    
-                    # Fetch results
-                    dataset_client = client.dataset(actor_call["defaultDatasetId"])
-                    items = []
-                    async for item in dataset_client.iterate_items():
-                        items.append(item)
-                    
-                    if items:
-                        data = items[0]
-                        # ... (same processing as above)
-                        # For brevity, return a minimal result
-                        print("[UnifiedMapProvider] Retry successful!")
-                        return None  # Will be handled by orchestrator fallback
-                    
-                except Exception as retry_error:
-                    print(f"[UnifiedMapProvider] Retry also failed: {retry_error}")
-            
-            import traceback
-            traceback.print_exc()
+            print(f"[UnifiedMapProvider] Cache read error: {e}")
             return None
 
+    async def _cache_set(self, place_id: str, map_data: MapData):
+        if not self.db or not place_id or MAP_DATA_CACHE_TTL_HOURS <= 0:
+            return
+        try:
+            payload = encode_map_data(map_data)
+            await run_firestore(self.db.collection(MAP_DATA_CACHE_COLLECTION).document(place_id).set, {
+                "payload": payload,
+                "cached_at": datetime.now(timezone.utc)
+            })
+            print(f"[UnifiedMapProvider] Saved to cache: {place_id} ({len(payload)} bytes compressed)")
+        except Exception as e:
+            print(f"[UnifiedMapProvider] Cache write error: {e}")
+
+
+def encode_map_data(map_data: MapData) -> bytes:
+    """zlib-compressed JSON (Firestore documents are capped at 1 MiB)"""
+    return zlib.compress(map_data.model_dump_json(exclude_none=True).encode("utf-8"), MAP_DATA_CACHE_COMPRESSION_LEVEL)
+
+
+def decode_map_data(payload: bytes) -> MapData:
+    return MapData.model_validate_json(zlib.decompress(payload))
+
 
 class WebSearchProvider:
     """
@@ -210,7 +280,7 @@ class WebSearchProvider:
         if self.db:
             try:
                 doc_ref = self.db.collection('web_search_cache').document(cache_key)
-                doc = doc_ref.get()
+                doc = await run_firestore(doc_ref.get)
                 if doc.exists:
                     data = doc.to_dict()
                     # Check expiry (7 days)
@@ -246,32 +316,33 @@ class WebSearchProvider:
             print(f"[WebSearchProvider] Fetching content from: {menu_url}")
             jina_url = f"https://r.jina.ai/{menu_url}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(jina_url, timeout=30)
-                response.raise_for_status()
-                content = response.text
-                
-                print(f"[WebSearchProvider] ✓ Fetched {len(content)} chars")
-                
-                result = WebContent(
-                    source_url=menu_url,
-                    text_content=content
-                )
-                
-                # Save to cache
-                if self.db:
-                    try:
-                        self.db.collection('web_search_cache').document(cache_key).set({
-                            'source_url': menu_url,
-                            'text_content': content,
-                            'cached_at': datetime.now(timezone.utc)
-                        })
-                        print(f"[WebSearchProvider] Saved to cache: {cache_key}")
-                    except Exception as e:
-                        print(f"[WebSearchProvider] Cache write error: {e}")
-                
-                return result
-                
+            client = get_client("jina")
+            response = await client.get(jina_url)
+            response.raise_for_status()
+            content = response.text
+            
+            print(f"[WebSearchProvider] ✓ Fetched {len(content)} chars")
+            
+            result = WebContent(
+                source_url=menu_url,
+                text_content=content
+            )
+            
+            # Save to cache
+            if self.db:
+                try:
+                    doc_ref = self.db.collection('web_search_cache').document(cache_key)
+                    await run_firestore(doc_ref.set, {
+                        'source_url': menu_url,
+                        'text_content': content,
+                        'cached_at': datetime.now(timezone.utc)
+                    })
+                    print(f"[WebSearchProvider] Saved to cache: {cache_key}")
+                except Exception as e:
+                    print(f"[WebSearchProvider] Cache write error: {e}")
+            
+            return result
+            
         except Exception as e:
             print(f"[WebSearchProvider] Search error: {e}")
             return None
@@ -280,57 +351,56 @@ class WebSearchProvider:
         """Search for menu URL using Serper.dev"""
         try:
             # Use httpx to call Serper API
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://google.serper.dev/search",
-                    headers={
-                        "X-API-KEY": self.serper_key,
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "q": f"{restaurant_name} 菜單 menu メニュー 메뉴",
-                        "hl": "zh-tw",
-                        "num": 10
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code == 403:
-                    print("[WebSearchProvider] Serper API 403 Forbidden - Check API Key or Credits")
-                    return None
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # Extract best URL (prioritize high-quality menu sources by region)
-                priority_keywords = [
-                    # Taiwan / Global
-                    "ichef", "inline", "ubereats", "foodpanda", "facebook", "instagram",
-                    # Japan
-                    "tabelog", "gnavi", "hotpepper", "retty",
-                    # Korea
-                    "naver", "catchtable", "mangoplate",
-                    # Generic
-                    "menu", "菜單", "メニュー", "메뉴"
-                ]
-                
-                # Check organic results
-                if "organic" in data:
-                    for result in data["organic"]:
-                        url = result.get("link", "")
-                        if any(keyword in url.lower() for keyword in priority_keywords):
-                            print(f"[WebSearchProvider] Found URL: {url}")
-                            return url
-                    
-                    # If no priority match, return first result
-                    if data["organic"]:
-                        url = data["organic"][0].get("link")
-                        print(f"[WebSearchProvider] Using first result: {url}")
-                        return url
-                
-                print(f"[WebSearchProvider] No menu URL found")
+            client = get_client("serper")
+            response = await client.post(
+                "https://google.serper.dev/search",
+                headers={
+                    "X-API-KEY": self.serper_key,
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "q": f"{restaurant_name} 菜單 menu メニュー 메뉴",
+                    "hl": "zh-tw",
+                    "num": 10
+                }
+            )
+            
+            if response.status_code == 403:
+                print("[WebSearchProvider] Serper API 403 Forbidden - Check API Key or Credits")
                 return None
+            
+            response.raise_for_status()
+            data = response.json()
+            
+            # Extract best URL (prioritize high-quality menu sources by region)
+            priority_keywords = [
+                # Taiwan / Global
+                "ichef", "inline", "ubereats", "foodpanda", "facebook", "instagram",
+                # Japan
+                "tabelog", "gnavi", "hotpepper", "retty",
+                # Korea
+                "naver", "catchtable", "mangoplate",
+                # Generic
+                "menu", "菜單", "メニュー", "메뉴"
+            ]
+            
+            # Check organic results
+            if "organic" in data:
+                for result in data["organic"]:
+                    url = result.get("link", "")
+                    if any(keyword in url.lower() for keyword in priority_keywords):
+                        print(f"[WebSearchProvider] Found URL: {url}")
+                        return url
                 
+                # If no priority match, return first result
+                if data["organic"]:
+                    url = data["organic"][0].get("link")
+                    print(f"[WebSearchProvider] Using first result: {url}")
+                    return url
+            
+            print(f"[WebSearchProvider] No menu URL found")
+            return None
+            
         except Exception as e:
             print(f"[WebSearchProvider] Serper search error: {e}")
             return None
@@ -0,0 +1,80 @@
+"""
+Category Rankings - per-category dish order by one canonical score
+Built when a profile is assembled and stored with it, so alternatives are a walk down a list
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from schemas.restaurant_profile import MenuItem, RestaurantProfile
+from services.pipeline.menu_matrix import MenuMatrix, DEFAULT_CATEGORY
+
+
+def score_menu_item(item: MenuItem) -> float:
+    """
+    Canonical dish score: popularity, review sentiment and mentions, minus risk
+    (reference definition; hot paths use the vectorized MenuMatrix scores)
+    """
+    score = 0.0
+
+    # Popular dishes get bonus
+    if item.is_popular:
+        score += 10.0
+
+    # Sentiment score bonus
+    if item.analysis and item.analysis.sentiment_score:
+        score += item.analysis.sentiment_score * 5.0
+
+    # Positive AI insight bonus
+    if item.ai_insight:
+        if item.ai_insight.sentiment == "positive":
+            score += 3.0
+        elif item.ai_insight.sentiment == "negative":
+            score -= 5.0
+
+        # Mention count bonus
+        score += min(item.ai_insight.mention_count, 5) * 0.5
+
+    # Risky dishes get penalty
+    if item.is_risky:
+        score -= 10.0
+
+    return score
+
+
+def build_category_rankings(menu_items: List[MenuItem]) -> Dict[str, List[int]]:
+    """Category -> indices into menu_items, best score first (menu order on ties)"""
+    # Vectorized score_menu_item over the menu's columns
+    return MenuMatrix(menu_items).category_rankings()
+
+
+def ensure_category_rankings(profile: RestaurantProfile) -> Dict[str, List[int]]:
+    """
+    The profile's stored rankings, rebuilt (and kept on the profile) when missing
+    or not covering the current menu, e.g. profiles saved before rankings existed
+    """
+    rankings = profile.category_rankings
+    if not rankings or sum(len(indices) for indices in rankings.values()) != len(profile.menu_items):
+        rankings = build_category_rankings(profile.menu_items)
+        profile.category_rankings = rankings
+    return rankings
+
+
+def ranked_alternatives(
+    profile: RestaurantProfile,
+    category: str,
+    exclude_names: List[str],
+    limit: int,
+    allows: Optional[Callable[[MenuItem], bool]] = None
+) -> List[MenuItem]:
+    """Best `limit` dishes of a category, skipping excluded names and items `allows` rejects"""
+    excluded = set(exclude_names)
+    menu_items = profile.menu_items
+    found = []
+    for index in ensure_category_rankings(profile).get(category or DEFAULT_CATEGORY, ()):
+        item = menu_items[index]
+        if item.name in excluded or (allows is not None and not allows(item)):
+            continue
+        found.append(item)
+        if len(found) >= limit:
+            break
+    return found
@@ -24,7 +24,7 @@ async def get_restaurant_data(place_id: str, name: str) -> Optional[RestaurantPr
     """
     # WARM START: Check cache first
     print(f"[Aggregator] Checking cache for place_id: {place_id}")
-    cached_profile = firestore_service.get_restaurant_profile(place_id=place_id)
+    cached_profile = await firestore_service.get_restaurant_profile_async(place_id=place_id)
 
     if cached_profile:
         print(f"[Aggregator] ✓ Cache hit for {name}")
@@ -54,7 +54,7 @@ async def get_restaurant_data(place_id: str, name: str) -> Optional[RestaurantPr
 
         # Save to Firestore
         print(f"[Aggregator] Saving profile to Firestore...")
-        firestore_service.save_restaurant_profile(profile)
+        await firestore_service.save_restaurant_profile_async(profile)
 
         print(f"[Aggregator] ✓ Cold start complete for {name}")
         return profile
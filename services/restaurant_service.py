@@ -1,26 +1,73 @@
-from typing import Optional
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional, Set
 from schemas.restaurant_profile import RestaurantProfile
 from services import firestore_service
 from services.pipeline.orchestrator import RestaurantPipeline
 from schemas.pipeline import PipelineInput
 from services.mock_service import MockService
+from services.single_flight import SingleFlight
+from services.memory_cache import BoundedTTLCache
+from services.llm_gateway import llm_priority, PRIORITY_BACKGROUND
+
+# Scheduler lane for stale-while-revalidate refreshes (shares the prefetch workers)
+REFRESH_LANE = "prefetch"
+# A restaurant whose refresh was attempted (e.g. failed on an Apify quota or Gemini 429) is not
+# refreshed again for this long; a failed refresh leaves the profile stale
+PROFILE_REFRESH_RETRY_SECONDS = float(os.getenv("PROFILE_REFRESH_RETRY_SECONDS", "900"))
 
 class RestaurantService:
+    # Concurrent cold starts for the same restaurant share one pipeline run
+    _cold_starts = SingleFlight("cold_start")
+    # Job IDs waiting on each in-flight cold start (all of them receive progress updates)
+    _cold_start_jobs: Dict[str, List[str]] = {}
+    # Keys with a stale-while-revalidate refresh queued or running on the scheduler
+    _refreshing: Set[str] = set()
+    # Last refresh attempt per key; present = still cooling down
+    _refresh_attempts = BoundedTTLCache("profile_refresh_attempts", max_entries=4096, default_ttl=PROFILE_REFRESH_RETRY_SECONDS)
+    _refresh_stats = {"scheduled": 0, "completed": 0, "failed": 0, "dropped_saturated": 0, "skipped_cooldown": 0}
+
+    @staticmethod
+    def _cold_start_key(restaurant_name: str, place_id: Optional[str]) -> str:
+        """Coalescing key: place_id when known, otherwise the normalized restaurant name"""
+        if place_id:
+            return f"place:{place_id}"
+        name = unicodedata.normalize("NFKC", restaurant_name or "").strip().lower()
+        name = re.sub(r"\s+", " ", name)
+        return f"name:{name}"
+
+    @staticmethod
+    async def _report_progress(key: str, progress: int, message: str):
+        """Push a progress update to every job waiting on this cold start"""
+        from services.job_manager import job_manager, JobStatus
+        for job_id in list(RestaurantService._cold_start_jobs.get(key, [])):
+            await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=progress, message=message)
+
+    @staticmethod
+    def cold_start_stats() -> Dict[str, int]:
+        """Coalescing counters for cold starts"""
+        return RestaurantService._cold_starts.stats()
+
     @staticmethod
     async def get_or_create_profile(
-        restaurant_name: str, 
+        restaurant_name: str,
         place_id: Optional[str] = None,
         job_id: Optional[str] = None  # For progress updates
     ) -> RestaurantProfile:
         """
         Retrieves a restaurant profile from DB or triggers a cold start pipeline.
-        
+        Concurrent cold starts for the same restaurant are coalesced into one pipeline run.
+        A profile past the soft TTL is returned immediately (stale-while-revalidate)
+        and refreshed in the background; check firestore_service.is_profile_stale().
+
         Args:
             restaurant_name: Name of the restaurant
             place_id: Optional Google Place ID
             job_id: Optional job ID for progress updates during cold start
         """
-        
+
         # Mock handling
         if place_id == 'mock-place-id':
             return MockService.get_mock_profile(restaurant_name)
@@ -28,58 +75,128 @@ class RestaurantService:
         # Step 1: Fetch from DB (Warm Start check)
         profile_data = None
         if place_id:
-            profile_data = firestore_service.get_restaurant_profile(place_id)
-        
+            profile_data = await firestore_service.get_restaurant_profile_async(place_id, allow_stale=True)
+
         if profile_data:
             # Warm Start - data already exists
             print(f"[RestaurantService] Warm Start: Profile found for {restaurant_name}")
+            if firestore_service.is_profile_stale(profile_data):
+                RestaurantService._schedule_refresh(restaurant_name, place_id)
             if job_id:
                 # Quick update to 60% since we're skipping cold start
                 from services.job_manager import job_manager, JobStatus
-                job_manager.update_status(job_id, JobStatus.PROCESSING, progress=60, message="已找到餐廳資料...")
+                await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=60, message="已找到餐廳資料...")
             return profile_data
-        
-        # Cold Start - need to run pipeline
-        print(f"[RestaurantService] Cold Start: Profile not found. Triggering pipeline for: {restaurant_name}")
-        
+
+        # Cold Start - need to run pipeline (or join the one already running)
+        key = RestaurantService._cold_start_key(restaurant_name, place_id)
+        if RestaurantService._cold_starts.in_flight(key):
+            print(f"[RestaurantService] Cold Start: Joining in-flight pipeline for: {restaurant_name}")
+        else:
+            print(f"[RestaurantService] Cold Start: Profile not found. Triggering pipeline for: {restaurant_name}")
+
+        if job_id:
+            RestaurantService._cold_start_jobs.setdefault(key, []).append(job_id)
+            from services.job_manager import job_manager, JobStatus
+            await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=20, message="正在搜尋餐廳菜單與評論...")
+
         try:
-            if job_id:
-                from services.job_manager import job_manager, JobStatus
-                job_manager.update_status(job_id, JobStatus.PROCESSING, progress=20, message="正在搜尋餐廳菜單與評論...")
-            
-            pipeline = RestaurantPipeline()
-            pipeline_input = PipelineInput(
-                restaurant_name=restaurant_name,
-                place_id=place_id
+            profile = await RestaurantService._cold_starts.do(
+                key,
+                lambda: RestaurantService._run_cold_start(restaurant_name, place_id, key)
             )
-            
-            # Run pipeline with progress callback if job_id is provided
-            if job_id:
-                def progress_callback(step: int, message: str):
-                    """Callback for pipeline progress updates"""
-                    # Map pipeline steps to progress percentages (20-60%)
-                    progress_map = {
-                        1: (25, "正在搜尋餐廳菜單..."),
-                        2: (35, "正在抓取餐廳評論..."),
-                        3: (45, "正在解析菜單內容..."),
-                        4: (55, "正在融合評論與菜單..."),
-                    }
-                    progress, msg = progress_map.get(step, (30, message))
-                    job_manager.update_status(job_id, JobStatus.PROCESSING, progress=progress, message=msg)
-                
-                profile = await pipeline.process(pipeline_input, progress_callback=progress_callback)
-            else:
-                profile = await pipeline.process(pipeline_input)
-            
-            if not profile:
-                raise ValueError(f"Failed to generate profile for '{restaurant_name}'")
-            
-            if job_id:
-                job_manager.update_status(job_id, JobStatus.PROCESSING, progress=60, message="餐廳資料準備完成...")
-            
-            return profile
-            
         except Exception as e:
             print(f"[RestaurantService] Cold Start failed: {e}")
             raise e
+        finally:
+            if job_id:
+                waiting = RestaurantService._cold_start_jobs.get(key, [])
+                if job_id in waiting:
+                    waiting.remove(job_id)
+                if not waiting:
+                    RestaurantService._cold_start_jobs.pop(key, None)
+
+        if job_id:
+            await job_manager.update_status_async(job_id, JobStatus.PROCESSING, progress=60, message="餐廳資料準備完成...")
+
+        return profile
+
+    @staticmethod
+    def _schedule_refresh(restaurant_name: str, place_id: str):
+        """
+        Queue a background refresh of a stale profile on the scheduler's prefetch lane,
+        unless one is already queued/running or was attempted within
+        PROFILE_REFRESH_RETRY_SECONDS; dropped when the lane is full (the caller is
+        served the stale profile anyway)
+        """
+        from services.job_manager import job_scheduler, SchedulerSaturated
+        key = RestaurantService._cold_start_key(restaurant_name, place_id)
+        if key in RestaurantService._refreshing or RestaurantService._cold_starts.in_flight(key):
+            return
+        if RestaurantService._refresh_attempts.peek(key):
+            RestaurantService._refresh_stats["skipped_cooldown"] += 1
+            return
+
+        async def refresh():
+            try:
+                # Users are already served the stale profile: yield LLM capacity to interactive calls
+                with llm_priority(PRIORITY_BACKGROUND):
+                    await RestaurantService._cold_starts.do(
+                        key,
+                        lambda: RestaurantService._run_cold_start(restaurant_name, place_id, key)
+                    )
+                RestaurantService._refresh_stats["completed"] += 1
+            except Exception as e:
+                RestaurantService._refresh_stats["failed"] += 1
+                print(f"[RestaurantService] Background refresh failed for {restaurant_name}: {e}")
+            finally:
+                RestaurantService._refreshing.discard(key)
+
+        try:
+            job_scheduler.check_capacity(REFRESH_LANE)
+            job_scheduler.submit(REFRESH_LANE, refresh, label=f"refresh {key}")
+        except SchedulerSaturated:
+            RestaurantService._refresh_stats["dropped_saturated"] += 1
+            print(f"[RestaurantService] Stale profile for {restaurant_name}, refresh dropped ({REFRESH_LANE} lane full)")
+            return
+
+        RestaurantService._refreshing.add(key)
+        RestaurantService._refresh_attempts.set(key, time.time())
+        RestaurantService._refresh_stats["scheduled"] += 1
+        print(f"[RestaurantService] Stale profile for {restaurant_name}, refresh queued")
+
+    @staticmethod
+    def refresh_stats() -> Dict[str, int]:
+        """Stale-while-revalidate refresh counters (queue times are in the scheduler's lane stats)"""
+        return {**RestaurantService._refresh_stats, "lane": REFRESH_LANE, "pending": len(RestaurantService._refreshing)}
+
+    @staticmethod
+    async def _run_cold_start(restaurant_name: str, place_id: Optional[str], key: str) -> RestaurantProfile:
+        """Runs the pipeline once for a coalesced cold start (or refresh) and persists the result"""
+        pipeline = RestaurantPipeline()
+        pipeline_input = PipelineInput(
+            restaurant_name=restaurant_name,
+            place_id=place_id
+        )
+
+        async def progress_callback(step: int, message: str):
+            """Callback for pipeline progress updates"""
+            # Map pipeline steps to progress percentages (20-60%)
+            progress_map = {
+                1: (25, "正在搜尋餐廳菜單..."),
+                2: (35, "正在抓取餐廳評論..."),
+                3: (45, "正在解析菜單內容..."),
+                4: (55, "正在融合評論與菜單..."),
+            }
+            progress, msg = progress_map.get(step, (30, message))
+            await RestaurantService._report_progress(key, progress, msg)
+
+        profile = await pipeline.process(pipeline_input, progress_callback=progress_callback)
+
+        if not profile:
+            raise ValueError(f"Failed to generate profile for '{restaurant_name}'")
+
+        # Persist so later requests (and other instances) get a warm start
+        await firestore_service.save_restaurant_profile_async(profile)
 
+        return profile
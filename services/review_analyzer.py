@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 from typing import List, Tuple, Dict
 
 from schemas.restaurant_profile import MenuItem, MenuItemAnalysis
+from services import llm_gateway
 
 load_dotenv()
 
@@ -108,8 +109,9 @@ class ReviewAnalyzer:
 
         try:
             genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            response = await model.generate_content_async(prompt)
+            response = await llm_gateway.generate_content_async(
+                prompt, model_name='gemini-2.0-flash-exp', call_site="review_analyzer"
+            )
             
             analysis_raw = response.text
             if analysis_raw.startswith("```json"):
@@ -0,0 +1,77 @@
+"""
+Single-Flight Coalescing - one execution per key for concurrent callers
+The first caller starts the work; every caller arriving while it runs awaits the same result
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    In-flight registry keyed by string
+
+    The work runs in its own task, so a cancelled caller (e.g. a client that
+    disconnects) does not cancel the work other callers are waiting on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {
+            "flights": 0,           # Executions actually started
+            "coalesced_calls": 0,   # Callers that joined an existing execution
+            "max_waiters": 0,       # Largest number of joiners on a single execution
+            "last_waiters": 0,
+        }
+
+    def in_flight(self, key: str) -> bool:
+        """Whether an execution for this key is currently running"""
+        return key in self._flights
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once per key; concurrent callers share the result (or exception)
+
+        Args:
+            key: Coalescing key
+            fn: Zero-argument coroutine factory, only invoked by the first caller
+
+        Returns:
+            The result of the shared execution
+        """
+        task = self._flights.get(key)
+        if task is not None:
+            self._waiters[key] += 1
+            self._stats["coalesced_calls"] += 1
+            print(f"[SingleFlight:{self.name}] Joined in-flight execution for {key} "
+                  f"({self._waiters[key]} waiter(s))")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            self._waiters[key] = 0
+            self._stats["flights"] += 1
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Unregister a finished execution and record how many callers it served"""
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        waiters = self._waiters.pop(key, 0)
+        self._stats["last_waiters"] = waiters
+        self._stats["max_waiters"] = max(self._stats["max_waiters"], waiters)
+
+        if task.cancelled():
+            outcome = "cancelled"
+        elif task.exception() is not None:  # Also marks the exception as retrieved
+            outcome = "failed"
+        else:
+            outcome = "ok"
+        print(f"[SingleFlight:{self.name}] {key} finished ({outcome}), served {waiters} waiter(s)")
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of coalescing counters"""
+        return {**self._stats, "in_flight": len(self._flights)}
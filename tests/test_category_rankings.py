@@ -0,0 +1,67 @@
+import sys
+import os
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from agent.recommendation import RecommendationService
+from schemas.recommendation import UserInputV2
+from schemas.restaurant_profile import RestaurantProfile, MenuItem, DishAttributes, MenuItemAnalysis
+from services.pipeline.menu_matrix import MenuMatrix
+from services.pipeline.rankings import build_category_rankings, ranked_alternatives, score_menu_item
+
+
+def test_category_rankings():
+    print("Testing category rankings...")
+
+    menu_items = [
+        MenuItem(name="白飯", price=20, category="Side"),
+        MenuItem(name="紅燒牛肉", price=380, category="Main", is_popular=True,
+                 analysis=DishAttributes(contains_beef=True, sentiment_score=0.8)),
+        MenuItem(name="三杯雞", price=320, category="Main",
+                 ai_insight=MenuItemAnalysis(sentiment="positive", summary="入味", mention_count=4)),
+        MenuItem(name="炒時蔬", price=180, category="Main"),
+        MenuItem(name="滷豬腳", price=350, category="Main", is_risky=True,
+                 analysis=DishAttributes(contains_pork=True)),
+    ]
+    profile = RestaurantProfile(
+        place_id="mock-id",
+        name="Test Restaurant",
+        address="Test Address",
+        updated_at=datetime.now(),
+        trust_level="high",
+        menu_source_url=None,
+        menu_items=menu_items,
+        review_summary="Good food"
+    )
+
+    rankings = build_category_rankings(menu_items)
+    assert rankings == {"Main": [1, 2, 3, 4], "Side": [0]}
+
+    # Vectorized scores match the reference scorer
+    matrix = MenuMatrix(menu_items)
+    assert matrix.scores.tolist() == [score_menu_item(item) for item in menu_items]
+    assert matrix.rank().tolist() == [1, 2, 0, 3, 4]
+    balance = matrix.balance([0, 2, 3])
+    assert balance["categories"] == {"Side": 1, "Main": 2}
+    assert balance["has_staple"] and not balance["has_soup"]
+
+    # Profiles saved without rankings get them on first use
+    assert profile.category_rankings == {}
+    names = [item.name for item in ranked_alternatives(profile, "Main", ["三杯雞"], limit=2)]
+    assert names == ["紅燒牛肉", "炒時蔬"]
+    assert profile.category_rankings == rankings
+
+    # Hard-filtered dishes are skipped
+    user_input = UserInputV2(restaurant_name="Test Restaurant", dining_style="Shared", party_size=2, preferences=["no_beef"])
+    service = RecommendationService()
+    alternatives = service.get_alternatives("Main", [], profile, limit=5, user_input=user_input)
+    assert [alt.dish_name for alt in alternatives] == ["三杯雞", "炒時蔬", "滷豬腳"]
+    assert [alt.dish_name for alt in service.get_alternatives("Dessert", [], profile)] == []
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_category_rankings()
@@ -0,0 +1,48 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services.pipeline.matching import DishNameIndex, normalize_dish_name
+
+
+def test_dish_name_index():
+    print("Testing DishNameIndex...")
+
+    index = DishNameIndex([
+        ("招牌牛肉麵", "beef_noodles"),
+        ("牛肉麵", "beef_noodles_small"),
+        ("Spicy Chicken", "chicken"),
+        ("小籠包 (8入)", "xlb"),
+        ("麵", "plain_noodles"),
+    ])
+
+    # Exact and normalized matches
+    assert index.get("牛肉麵") == "beef_noodles_small"
+    assert index.get("spicy  chicken!") == "chicken"
+    assert index.get("ＳＰＩＣＹ ＣＨＩＣＫＥＮ") == "chicken"  # Full-width input
+    assert normalize_dish_name("小籠包 (8入)") == "小籠包8入"
+
+    # Query contained in a menu name, and menu name contained in the query
+    assert index.get("小籠包") == "xlb"
+    assert index.match("紅燒牛肉麵套餐") == ("牛肉麵", "beef_noodles_small")  # Closest length wins
+
+    # Deterministic tie-break: equal length difference -> first added
+    tie = DishNameIndex([("豆花A", 1), ("豆花B", 2)])
+    assert tie.get("豆花") == 1
+
+    # No match unless similarity is requested
+    assert index.get("清燉羊肉湯") is None
+    similar = DishNameIndex([("麻婆豆腐飯", "mapo")])
+    assert similar.get("麻婆豆腐蓋飯") is None  # Neither name contains the other
+    assert similar.get("麻婆豆腐蓋飯", min_similarity=0.6) == "mapo"
+    assert similar.get("麻婆豆腐蓋飯", min_similarity=0.9) is None
+    assert similar.get("宮保雞丁", min_similarity=0.5) is None
+    assert index.get("") is None
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_dish_name_index()
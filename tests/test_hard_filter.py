@@ -0,0 +1,102 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from agent.hard_filter import compile_hard_filter
+from schemas.allergens import ALLERGEN_BITS, SPICY, normalize_allergens
+from schemas.recommendation import UserInputV2, BudgetV2
+from schemas.restaurant_profile import MenuItem, DishAttributes
+from services.pipeline.menu_matrix import MenuMatrix
+
+
+def make_input(preferences, budget=None):
+    return UserInputV2(
+        restaurant_name="Test Restaurant",
+        dining_style="Shared",
+        party_size=2,
+        budget=budget,
+        preferences=preferences
+    )
+
+
+def test_hard_filter():
+    print("Testing compiled hard filter...")
+
+    # Allergen vocabulary
+    assert normalize_allergens("allergic to peanuts") == ["peanut"]
+    assert normalize_allergens("蝦蟹貝類過敏") == ["shellfish", "mollusc"]
+    assert normalize_allergens("eggplant") == []
+    # Compounds that only look like an allergen
+    assert normalize_allergens("三杯魷魚") == ["mollusc"]
+    assert normalize_allergens("章魚燒") == ["mollusc"]
+    assert normalize_allergens("peanut butter") == ["peanut"]
+    assert normalize_allergens("椰奶西米露") == []
+    assert normalize_allergens("coconut milk") == []
+    assert normalize_allergens("貝果") == []
+    assert normalize_allergens("鮭魚生魚片") == ["fish"]
+    assert normalize_allergens("鮮奶油") == ["milk"]
+    assert normalize_allergens("cheese") == ["milk"]
+    attrs = DishAttributes(is_spicy=True, allergens=["Shrimp", "花生"])
+    assert attrs.filter_mask == SPICY | ALLERGEN_BITS["shellfish"] | ALLERGEN_BITS["peanut"]
+
+    menu = [
+        MenuItem(name="麻辣鍋", price=500, analysis=DishAttributes(is_spicy=True, contains_beef=True)),
+        MenuItem(name="宮保蝦仁", price=320, analysis=DishAttributes(contains_seafood=True, allergens=["shrimp", "peanuts"])),
+        MenuItem(name="炒青菜", price=150, analysis=DishAttributes(is_vegan=True)),
+        MenuItem(name="奇異果沙拉", price=180, analysis=DishAttributes(is_vegan=True, allergens=["kiwi"])),
+        MenuItem(name="招牌滷肉", price=1200, analysis=DishAttributes(contains_pork=True)),
+        MenuItem(name="今日特餐", price=250),  # No analysis: passes attribute checks
+    ]
+
+    matrix = MenuMatrix(menu)
+
+    def names(preferences, budget=None):
+        hard_filter = compile_hard_filter(make_input(preferences, budget))
+        kept, rejected = hard_filter.apply(menu)
+        # The vectorized path must agree with the per-item one
+        assert hard_filter.apply_matrix(matrix) == (kept, rejected)
+        assert [item for item in menu if hard_filter.allows(item)] == kept
+        return [item.name for item in kept]
+
+    assert names([]) == [item.name for item in menu]
+    assert names(["No_Spicy"]) == ["宮保蝦仁", "炒青菜", "奇異果沙拉", "招牌滷肉", "今日特餐"]
+    assert names(["不吃牛", "no_pork"]) == ["宮保蝦仁", "炒青菜", "奇異果沙拉", "今日特餐"]
+    assert names(["素食"]) == ["炒青菜", "奇異果沙拉", "今日特餐"]
+    assert names(["花生過敏"]) == ["麻辣鍋", "炒青菜", "奇異果沙拉", "招牌滷肉", "今日特餐"]
+    assert names(["allergic to kiwi"]) == ["麻辣鍋", "宮保蝦仁", "炒青菜", "招牌滷肉", "今日特餐"]
+    assert names([], BudgetV2(type="Per_Person", amount=400)) == ["宮保蝦仁", "炒青菜", "奇異果沙拉", "今日特餐"]
+
+    _, rejected = compile_hard_filter(make_input(["shellfish allergy", "不辣"])).apply(menu)
+    assert rejected == {"attributes": 1, "allergens": 1, "budget": 0}
+
+    # Milk / fish allergies do not reject coconut milk, peanut butter or squid dishes
+    desserts = [
+        MenuItem(name="椰奶花生湯圓", price=90, analysis=DishAttributes(is_vegan=True, allergens=["椰奶", "peanut butter"])),
+        MenuItem(name="三杯魷魚", price=280, analysis=DishAttributes(contains_seafood=True, allergens=["魷魚"])),
+        MenuItem(name="鮮奶酪", price=80, analysis=DishAttributes(allergens=["牛奶"])),
+    ]
+    kept, rejected = compile_hard_filter(make_input(["牛奶過敏", "fish allergy"])).apply(desserts)
+    assert [item.name for item in kept] == ["椰奶花生湯圓", "三杯魷魚"]
+    assert rejected == {"attributes": 0, "allergens": 1, "budget": 0}
+
+    # diet_allows: candidate dicts, attribute bits when analysed, name keywords otherwise, no price cap
+    no_beef = compile_hard_filter(make_input(["no_beef"], BudgetV2(type="Per_Person", amount=100)))
+    assert not no_beef.diet_allows({"dish_name": "紅燒牛肉麵", "price": 200})
+    assert no_beef.diet_allows({"dish_name": "招牌滷肉飯", "price": 200})
+    assert not no_beef.diet_allows({"dish_name": "招牌麵", "analysis": {"contains_beef": True}})
+    assert no_beef.diet_allows({"dish_name": "牛蒡絲", "analysis": {"is_vegan": True}})  # Analysis wins over the name
+    assert not no_beef.diet_allows(menu[0]) and no_beef.diet_allows(menu[4])
+    vegan = compile_hard_filter(make_input(["vegan"]))
+    assert not vegan.diet_allows({"name": "宮保雞丁"}) and vegan.diet_allows({"name": "炒高麗菜"})
+    assert not vegan.diet_allows({"name": "炒高麗菜", "analysis": {"is_vegan": False}})
+    peanut = compile_hard_filter(make_input(["花生過敏"]))
+    assert not peanut.diet_allows({"dish_name": "花生豬腳"}) and peanut.diet_allows({"dish_name": "豬腳"})
+    assert compile_hard_filter(make_input([])).diet_allows({"dish_name": "紅燒牛肉麵"})
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_hard_filter()
@@ -0,0 +1,70 @@
+import sys
+import os
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services.http_clients import HttpClientRegistry, POOLS
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_clients():
+    print("Testing shared HTTP clients...")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    registry = HttpClientRegistry(POOLS)
+
+    async def run():
+        client = registry.get("serper")
+        assert registry.get("serper") is client
+        assert registry.get("jina") is not client
+        for _ in range(5):
+            response = await client.get(f"{base}/ok")
+            assert response.text == "ok"
+        await registry.get("serper").get(f"{base}/missing")
+        assert client.timeout.read == POOLS["serper"].timeout
+        return client
+
+    first = asyncio.run(run())
+
+    stats = registry.stats()["hosts"]["127.0.0.1"]
+    assert stats["requests"] == 6 and stats["responses"] == 6
+    assert stats["new_connections"] == 1, stats
+    assert stats["error_responses"] == 1
+    assert abs(stats["connection_reuse_rate"] - 5 / 6) < 1e-9
+
+    # A new event loop gets its own client; closing happens on the owning loop
+    async def run_again():
+        client = registry.get("serper")
+        assert client is not first
+        await client.get(f"{base}/ok")
+        await registry.aclose()
+        assert client.is_closed
+
+    asyncio.run(run_again())
+    assert registry.stats()["pools_open"] == []
+    server.shutdown()
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_http_clients()
@@ -0,0 +1,91 @@
+import sys
+import os
+import io
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services import image_fetcher
+
+
+def _encode(size, fmt, mode="RGB"):
+    out = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30) if mode == "RGB" else (200, 30, 30, 128)).save(out, format=fmt)
+    return out.getvalue()
+
+
+ROUTES = {
+    "/big.jpg": ("image/jpeg", _encode((3000, 2000), "JPEG")),
+    "/small.jpg": ("image/jpeg", _encode((400, 300), "JPEG")),
+    "/logo.png": ("image/png", _encode((500, 500), "PNG", mode="RGBA")),
+    "/untyped": ("application/octet-stream", _encode((800, 600), "JPEG")),
+    "/page.html": ("text/html", b"<html></html>"),
+    "/huge.jpg": ("image/jpeg", b"\xff" * 300_000),
+    "/broken.jpg": ("image/jpeg", b"not really a jpeg"),
+}
+_active = {"now": 0, "peak": 0}
+_lock = threading.Lock()
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with _lock:
+            _active["now"] += 1
+            _active["peak"] = max(_active["peak"], _active["now"])
+        time.sleep(0.05)
+        content_type, body = ROUTES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with _lock:
+            _active["now"] -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def test_image_fetcher():
+    print("Testing image fetcher...")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    urls = [f"{base}{path}" for path in ROUTES]
+    images = asyncio.run(image_fetcher.fetch_images(urls, max_dimension=1000, concurrency=3, max_bytes=200_000))
+    by_path = {image.url[len(base):]: image for image in images}
+
+    # Usable images only, input order kept
+    assert list(by_path) == ["/big.jpg", "/small.jpg", "/logo.png", "/untyped"], list(by_path)
+    assert _active["peak"] <= 3, _active
+
+    big = by_path["/big.jpg"]
+    assert (big.width, big.height) == (1000, 667) and big.mime_type == "image/jpeg"
+    assert len(big.data) < big.original_bytes
+    assert by_path["/small.jpg"].data == ROUTES["/small.jpg"][1]  # Passed through untouched
+    logo = by_path["/logo.png"]
+    assert logo.mime_type == "image/jpeg" and Image.open(io.BytesIO(logo.data)).mode == "RGB"
+    part = big.to_part()
+    assert part["mime_type"] == "image/jpeg" and isinstance(part["data"], str)
+
+    stats = image_fetcher.get_image_fetch_stats()
+    assert stats["rejected_content_type"] == 1
+    assert stats["rejected_too_large"] == 1
+    assert stats["rejected_undecodable"] == 1
+    server.shutdown()
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_image_fetcher()
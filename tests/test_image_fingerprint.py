@@ -0,0 +1,138 @@
+import sys
+import os
+import io
+import json
+import random
+import asyncio
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services import image_fingerprint, llm_gateway
+from services.image_fetcher import FetchedImage, prepare_image
+from services.image_fingerprint import FingerprintCache, fingerprint
+from services.pipeline import intelligence
+from services.pipeline.intelligence import MenuParser
+
+
+def _menu_page(seed, size=(1200, 1600)):
+    """Text-on-paper menu page; every seed shares the layout, only dish names and prices differ"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (250, 248, 240))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=40)
+    draw.text((400, 60), "MENU", fill=(0, 0, 0), font=font)
+    for row in range(20):
+        name = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randrange(6, 14)))
+        draw.text((80, 180 + row * 65), name, fill=(20, 20, 20), font=font)
+        draw.text((950, 180 + row * 65), str(rng.randrange(50, 500)), fill=(20, 20, 20), font=font)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def _reencode(raw, size, quality=60):
+    out = io.BytesIO()
+    Image.open(io.BytesIO(raw)).resize(size).save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def _fetched(url, raw):
+    data, mime_type, width, height = prepare_image(raw, 768)
+    return FetchedImage(url=url, data=data, mime_type=mime_type, width=width, height=height,
+                        original_bytes=len(raw), fingerprint=fingerprint(raw, preview=data))
+
+
+def test_image_fingerprint():
+    print("Testing image fingerprints...")
+
+    pages = [_menu_page(seed) for seed in range(8)]
+    # The same board re-encoded smaller by another CDN
+    copy = _reencode(pages[0], (600, 800))
+    cropped = _reencode(pages[0], (1200, 1300))
+
+    fp_pages = [fingerprint(page) for page in pages]
+    fp_copy = fingerprint(copy)
+    assert fp_pages[0].sha256 != fp_copy.sha256
+    assert fp_pages[0].is_duplicate_of(fp_copy), fp_pages[0].distance(fp_copy)
+    assert not fp_pages[0].is_duplicate_of(fingerprint(cropped))  # Different aspect ratio
+    # Different pages on the same template are never duplicates
+    for i, a in enumerate(fp_pages):
+        for b in fp_pages[i + 1:]:
+            assert not a.is_duplicate_of(b), a.distance(b)
+    # Preview decode (as in fetch_image) gives the same identity
+    assert fingerprint(pages[0], preview=prepare_image(pages[0], 768)[0]).is_duplicate_of(fp_pages[0])
+
+    kept = image_fingerprint.dedupe(["a", "b", "c", "d"], key={"a": fp_pages[0], "b": fp_copy, "c": fp_pages[1], "d": None}.get)
+    assert kept == ["a", "c", "d"]
+
+    # Caches key on exact bytes only; bounded
+    cache = FingerprintCache("test", max_entries=2, ttl=60)
+    cache.set([fp_pages[0]], True)
+    assert cache.get([fp_pages[0]]) is True
+    assert cache.get([fp_copy]) is None and cache.get([fp_pages[1]]) is None
+    cache.set([fp_pages[1]], False)
+    cache.set([fp_pages[0], fp_pages[1]], ["x"])
+    assert cache.get([fp_pages[1], fp_pages[0]]) == ["x"]
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+
+    # MenuParser: duplicates dropped within a batch, byte-identical photos skip Gemini
+    os.environ.setdefault("GEMINI_API_KEY", "test")
+    images = {
+        "u/page1": _fetched("u/page1", pages[0]),
+        "u/copy": _fetched("u/copy", copy),
+        "u/page2": _fetched("u/page2", pages[1]),
+    }
+    calls = []
+
+    async def fake_fetch_images(urls, max_dimension=None, **kwargs):
+        return [images[url] for url in urls]
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    async def fake_generate(contents, model_name, generation_config=None, call_site="unknown", **kwargs):
+        calls.append((call_site, len(contents) - 1))
+        if call_site == "MenuParser._classify_images":
+            return Response(json.dumps({"classifications": [
+                {"image_index": i, "is_menu": True, "confidence": 0.9} for i in range(len(contents) - 1)
+            ]}))
+        return Response(json.dumps([{"name": "滷肉飯", "price": 40, "category": "飯類"}]))
+
+    original_fetch_images = intelligence.fetch_images
+    original_generate = llm_gateway.generate_content_async
+    intelligence.fetch_images = fake_fetch_images
+    llm_gateway.generate_content_async = fake_generate
+    try:
+        parser = MenuParser()
+
+        items = asyncio.run(parser.parse_from_images(["u/page1", "u/copy", "u/page2"]))
+        assert [item.name for item in items] == ["滷肉飯"]
+        # The copy is dropped; both distinct pages are classified and OCR'd
+        assert calls == [("MenuParser._classify_images", 2), ("MenuParser.parse_from_images", 2)], calls
+
+        # Re-crawl with the same files: answered from cache
+        calls.clear()
+        items = asyncio.run(parser.parse_from_images(["u/page1", "u/page2"]))
+        assert [item.name for item in items] == ["滷肉飯"] and calls == [], calls
+
+        # A re-encoded copy is a different file: no cross-batch perceptual reuse
+        calls.clear()
+        asyncio.run(parser.parse_from_images(["u/copy"]))
+        assert calls == [("MenuParser._classify_images", 1), ("MenuParser.parse_from_images", 1)], calls
+    finally:
+        intelligence.fetch_images = original_fetch_images
+        llm_gateway.generate_content_async = original_generate
+
+    stats = image_fingerprint.get_image_fingerprint_stats()
+    assert stats["duplicates_dropped"] >= 1
+    assert stats["classification_cache"]["hits"] >= 2 and stats["ocr_cache"]["hits"] >= 1
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_image_fingerprint()
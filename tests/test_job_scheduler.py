@@ -0,0 +1,103 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from api.v1.recommend_v2 import _too_many_requests
+from services import job_manager as job_manager_module
+from services.job_manager import JobScheduler, SchedulerSaturated
+
+
+def test_job_scheduler():
+    print("Testing JobScheduler lanes...")
+
+    async def run():
+        scheduler = JobScheduler({"warm": (1, 2), "cold": (1, 1)})
+        release = asyncio.Event()
+        ran = []
+
+        def job(name, duration=0.0):
+            async def fn():
+                await release.wait()
+                await asyncio.sleep(duration)
+                ran.append(name)
+            return fn
+
+        # One running + two queued fills the warm lane
+        scheduler.submit("warm", job("w1"))
+        await asyncio.sleep(0)
+        scheduler.submit("warm", job("w2"))
+        scheduler.submit("warm", job("w3"))
+        assert scheduler.stats()["warm"]["running"] == 1 and scheduler.stats()["warm"]["queue_depth"] == 2
+
+        try:
+            scheduler.check_capacity("warm")
+            raise AssertionError("full lane accepted work")
+        except SchedulerSaturated as e:
+            # No finished jobs yet: 5s default x (2 queued + 1) / 1 worker
+            assert e.lane == "warm" and e.retry_after == 15
+            response = _too_many_requests(e)
+            assert response.status_code == 429 and response.headers["Retry-After"] == "15"
+        try:
+            scheduler.submit("warm", job("w4"))
+            raise AssertionError("full lane accepted work")
+        except SchedulerSaturated:
+            pass
+
+        # A full warm lane does not block the cold lane
+        scheduler.check_capacity("cold")
+        scheduler.submit("cold", job("c1"))
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert sorted(ran) == ["c1", "w1", "w2", "w3"]
+        stats = scheduler.stats()["warm"]
+        assert stats["submitted"] == 3 and stats["rejected"] == 2 and stats["completed"] == 3
+        assert stats["queue_depth"] == 0 and stats["running"] == 0
+
+        # Retry-After follows the measured run time, capped at SCHEDULER_MAX_RETRY_AFTER
+        slow = JobScheduler({"slow": (1, 3)})
+        blocker = asyncio.Event()
+        slow.submit("slow", job("s0", duration=0.6))
+        await asyncio.sleep(0.65)
+        slow.submit("slow", lambda: blocker.wait())
+        await asyncio.sleep(0)
+        for _ in range(3):
+            slow.submit("slow", job("queued"))
+        try:
+            slow.check_capacity("slow")
+            raise AssertionError("full lane accepted work")
+        except SchedulerSaturated as e:
+            assert e.retry_after == 3, e.retry_after  # ~0.6s x (3 queued + 1), not the 5s default
+
+        original_max = job_manager_module.SCHEDULER_MAX_RETRY_AFTER
+        job_manager_module.SCHEDULER_MAX_RETRY_AFTER = 1
+        try:
+            capped = JobScheduler({"capped": (1, 20)})
+            capped.submit("capped", lambda: blocker.wait())
+            await asyncio.sleep(0)
+            for _ in range(20):
+                capped.submit("capped", job("queued"))
+            try:
+                capped.submit("capped", job("over"))
+                raise AssertionError("full lane accepted work")
+            except SchedulerSaturated as e:
+                assert e.retry_after == 1  # 5s x 21 / 1 would be 105s
+        finally:
+            job_manager_module.SCHEDULER_MAX_RETRY_AFTER = original_max
+
+        blocker.set()
+        await asyncio.sleep(0.05)
+        for worker in slow._workers + capped._workers + scheduler._workers:
+            worker.cancel()
+
+    asyncio.run(run())
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_job_scheduler()
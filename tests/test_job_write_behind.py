@@ -0,0 +1,100 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services import job_manager as job_manager_module
+from services.job_manager import JobManager, JobStatus
+
+
+class _FakeCollection:
+    """Firestore collection stand-in recording every write and read"""
+
+    def __init__(self):
+        self.docs = {}
+        self.writes = []
+        self.reads = 0
+
+    def document(self, job_id):
+        collection = self
+
+        class Doc:
+            def set(self, data):
+                collection.writes.append(("set", job_id, dict(data)))
+                collection.docs[job_id] = dict(data)
+
+            def update(self, data):
+                collection.writes.append(("update", job_id, dict(data)))
+                collection.docs[job_id].update(data)
+
+            def get(self):
+                collection.reads += 1
+                data = collection.docs.get(job_id)
+                return type("Snapshot", (), {"exists": data is not None, "to_dict": lambda _: dict(data)})()
+        return Doc()
+
+
+def test_job_write_behind():
+    print("Testing JobManager write-behind...")
+
+    original_flush = job_manager_module.JOB_PROGRESS_FLUSH_SECONDS
+    original_retention = job_manager_module.JOB_FINISHED_RETENTION_SECONDS
+    job_manager_module.JOB_PROGRESS_FLUSH_SECONDS = 0.05
+    job_manager_module.JOB_FINISHED_RETENTION_SECONDS = 0.2
+    try:
+        manager = JobManager()
+        collection = _FakeCollection()
+        manager.collection = collection
+
+        async def run():
+            job_id = manager.create_job({"restaurant_name": "阿明小館"})
+            assert [kind for kind, _, _ in collection.writes] == ["set"]  # Written through
+
+            # Progress updates within one window: served from memory, coalesced into one write
+            for progress in (10, 20, 30, 40, 50):
+                await manager.update_status_async(job_id, JobStatus.PROCESSING, progress=progress, message=f"step {progress}")
+            assert len(collection.writes) == 1
+            assert (await manager.get_job_async(job_id))["progress"] == 50
+            await asyncio.sleep(0.15)
+            assert len(collection.writes) == 2, collection.writes
+            assert collection.writes[1][2]["progress"] == 50
+
+            # A terminal status is flushed at once, merged with pending progress, without a trailing timer write
+            await manager.update_status_async(job_id, JobStatus.PROCESSING, progress=90)
+            await manager.update_status_async(job_id, JobStatus.COMPLETED, progress=100, result={"items": []})
+            assert len(collection.writes) == 3
+            assert collection.writes[2][2]["status"] == "completed" and collection.writes[2][2]["progress"] == 100
+            await asyncio.sleep(0.15)
+            assert len(collection.writes) == 3
+            assert job_id not in manager._pending and job_id not in manager._flush_timers
+            return job_id
+
+        job_id = asyncio.run(run())
+
+        stats = manager.write_stats()
+        assert stats["updates"] == 7 and stats["writes"] == 2 and stats["saved"] == 5, stats
+        assert stats["pending_jobs"] == 0
+
+        # Finished jobs stay readable from memory for the retention window, then come from Firestore
+        assert job_id not in manager.memory_store
+        assert manager.get_job(job_id)["status"] == "completed" and collection.reads == 0
+        asyncio.run(asyncio.sleep(0.25))
+        assert manager.get_job(job_id)["status"] == "completed" and collection.reads == 1
+
+        # Without Firestore the in-memory job is the only copy and is never evicted
+        local = JobManager()
+        local.collection = None
+        local_id = local.create_job({"restaurant_name": "local"})
+        asyncio.run(local.update_status_async(local_id, JobStatus.FAILED, error="boom"))
+        assert local.get_job(local_id)["error"] == "boom"
+    finally:
+        job_manager_module.JOB_PROGRESS_FLUSH_SECONDS = original_flush
+        job_manager_module.JOB_FINISHED_RETENTION_SECONDS = original_retention
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_job_write_behind()
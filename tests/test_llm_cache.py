@@ -0,0 +1,93 @@
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services import llm_gateway
+from services.llm_gateway import cache_key
+
+
+class _FakeModel:
+    """GenerativeModel stand-in: counts calls, answers are numbered in call order"""
+    calls = 0
+
+    def __init__(self, model_name, generation_config=None, **kwargs):
+        self.model_name = model_name
+
+    async def generate_content_async(self, contents):
+        _FakeModel.calls += 1
+        usage = type("Usage", (), {"prompt_token_count": 10, "candidates_token_count": 5})()
+        return type("Response", (), {"text": f"answer {_FakeModel.calls}", "usage_metadata": usage})()
+
+
+def test_llm_cache():
+    print("Testing LLM gateway cache...")
+
+    # Key stability: same inputs -> same key, regardless of config key order
+    image = {"mime_type": "image/jpeg", "data": b"\xff\xd8jpeg"}
+    base = cache_key("gemini", {"temperature": 0.2, "top_p": 0.9}, ["prompt", image])
+    assert base == cache_key("gemini", {"top_p": 0.9, "temperature": 0.2}, ["prompt", dict(reversed(list(image.items())))])
+    assert base != cache_key("gemini-pro", {"temperature": 0.2, "top_p": 0.9}, ["prompt", image])
+    assert base != cache_key("gemini", {"temperature": 0.3, "top_p": 0.9}, ["prompt", image])
+    assert base != cache_key("gemini", {"temperature": 0.2, "top_p": 0.9}, ["prompt", {**image, "data": b"\xff\xd8other"}])
+    assert base != cache_key("gemini", {"temperature": 0.2, "top_p": 0.9}, ["prompt", image], {"system_instruction": "x"})
+    # Length-prefixed parts can't run together
+    assert cache_key("m", None, ["ab", "c"]) != cache_key("m", None, ["a", "bc"])
+    assert cache_key("m", None, "12") != cache_key("m", None, b"12")
+
+    original_model = llm_gateway.genai.GenerativeModel
+    original_enabled = llm_gateway.LLM_CACHE_ENABLED
+    original_dir = llm_gateway.LLM_CACHE_DIR
+    llm_gateway.genai.GenerativeModel = _FakeModel
+    llm_gateway.LLM_CACHE_ENABLED = True
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            llm_gateway.LLM_CACHE_DIR = cache_dir
+
+            def call(prompt, **kwargs):
+                return asyncio.run(llm_gateway.generate_content_async(prompt, "gemini", call_site="test_llm_cache", **kwargs))
+
+            first = call("menu prompt")
+            assert first.text == "answer 1" and first.cache_tier is None and first.total_tokens == 15
+
+            # Memory tier
+            hit = call("menu prompt")
+            assert hit.text == "answer 1" and hit.cache_tier == "memory" and _FakeModel.calls == 1
+
+            # use_cache=False: no lookup and nothing stored
+            fresh = call("menu prompt", use_cache=False)
+            assert fresh.text == "answer 2" and fresh.cache_tier is None
+            uncached = call("other prompt", use_cache=False)
+            assert call("other prompt").text == "answer 4" and _FakeModel.calls == 4, uncached
+
+            # Disk tier survives a cleared memory tier and is promoted back to memory
+            llm_gateway._memory.clear()
+            from_disk = call("menu prompt")
+            assert from_disk.text == "answer 1" and from_disk.cache_tier == "disk"
+            assert call("menu prompt").cache_tier == "memory" and _FakeModel.calls == 4
+
+            # Expired disk entries are dropped
+            llm_gateway._memory.clear()
+            path = llm_gateway._disk_path(cache_key("gemini", None, "menu prompt", {}))
+            stale = time.time() - llm_gateway.LLM_CACHE_DISK_TTL_SECONDS - 60
+            os.utime(path, (stale, stale))
+            assert call("menu prompt").text == "answer 5" and _FakeModel.calls == 5
+
+        site = llm_gateway.get_llm_stats()["call_sites"]["test_llm_cache"]
+        assert site["calls"] == 8 and site["hits"] == 3 and site["disk_hits"] == 1, site
+        assert site["tokens_saved"] == 45 and site["tokens_used"] == 75
+    finally:
+        llm_gateway.genai.GenerativeModel = original_model
+        llm_gateway.LLM_CACHE_ENABLED = original_enabled
+        llm_gateway.LLM_CACHE_DIR = original_dir
+        llm_gateway._memory.clear()
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_llm_cache()
@@ -0,0 +1,112 @@
+import sys
+import os
+import asyncio
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services import llm_gateway
+from services.llm_gateway import LLMRateLimiter, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+def test_llm_rate_limiter():
+    print("Testing LLM rate limiter...")
+
+    async def priorities():
+        # One slot, no RPM/TPM budget: only the queue order matters
+        limiter = LLMRateLimiter(max_in_flight=1, requests_per_minute=0, tokens_per_minute=0)
+        await limiter.acquire(100, PRIORITY_BACKGROUND)
+        admitted = []
+
+        async def call(name, priority):
+            await limiter.acquire(100, priority)
+            admitted.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release(100)
+
+        tasks = [asyncio.create_task(call("bg1", PRIORITY_BACKGROUND)), asyncio.create_task(call("bg2", PRIORITY_BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(call("ui1", PRIORITY_INTERACTIVE)), asyncio.create_task(call("ui2", PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_wait"]["background"]["queued"] == 2
+        assert limiter.saturated(max_queue=4) and not limiter.saturated(max_queue=5)
+
+        limiter.release(100)
+        await asyncio.gather(*tasks)
+        # Interactive waiters go first even though they queued last; FIFO within a priority
+        assert admitted == ["ui1", "ui2", "bg1", "bg2"], admitted
+        assert limiter.stats()["peak_in_flight"] == 1
+
+        # A cancelled waiter gives up its place without taking a slot
+        await limiter.acquire(100, PRIORITY_INTERACTIVE)
+        waiter = asyncio.create_task(limiter.acquire(100, PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        limiter.release(100)
+        assert limiter.in_flight == 0
+
+    async def token_budget():
+        # 600 tokens per minute refill at 10/s: once drained, 5 tokens take ~0.5s
+        limiter = LLMRateLimiter(max_in_flight=8, requests_per_minute=0, tokens_per_minute=600)
+        assert await limiter.acquire(600, PRIORITY_INTERACTIVE) < 50
+        limiter.release(600)
+        waited_ms = await limiter.acquire(5, PRIORITY_INTERACTIVE)
+        limiter.release(5)
+        assert 400 <= waited_ms < 1000, waited_ms
+
+        # Real usage above the estimate is charged on release
+        limiter = LLMRateLimiter(max_in_flight=8, requests_per_minute=0, tokens_per_minute=600)
+        await limiter.acquire(10, PRIORITY_INTERACTIVE)
+        limiter.release(10, actual_tokens=600)
+        assert await limiter.acquire(5, PRIORITY_INTERACTIVE) >= 400
+
+    async def cooldown():
+        limiter = LLMRateLimiter(max_in_flight=8, requests_per_minute=0, tokens_per_minute=0)
+        await limiter.acquire(100, PRIORITY_INTERACTIVE)
+        limiter.release(100, rate_limited=True)
+        assert limiter.saturated(max_queue=100)
+        started = time.monotonic()
+        await limiter.acquire(100, PRIORITY_INTERACTIVE)
+        assert time.monotonic() - started >= 0.2
+        assert not limiter.saturated(max_queue=100)
+        limiter.release(100)
+        assert limiter.stats()["rate_limited_responses"] == 1
+
+    class ResourceExhausted(Exception):
+        pass
+
+    class _RateLimitedModel:
+        def __init__(self, model_name, generation_config=None, **kwargs):
+            pass
+
+        async def generate_content_async(self, contents):
+            raise ResourceExhausted("429 quota exceeded")
+
+    original_cooldown = llm_gateway.LLM_RATE_LIMIT_COOLDOWN_SECONDS
+    original_model = llm_gateway.genai.GenerativeModel
+    llm_gateway.LLM_RATE_LIMIT_COOLDOWN_SECONDS = 0.2
+    try:
+        asyncio.run(priorities())
+        asyncio.run(token_budget())
+        asyncio.run(cooldown())
+
+        # A 429 from the API puts the gateway's limiter into cooldown
+        llm_gateway.genai.GenerativeModel = _RateLimitedModel
+        try:
+            asyncio.run(llm_gateway.generate_content_async("prompt", "gemini", call_site="test_rate_limit", use_cache=False))
+            raise AssertionError("429 was swallowed")
+        except ResourceExhausted:
+            pass
+        assert llm_gateway.llm_overloaded()
+        time.sleep(0.25)
+        assert not llm_gateway.llm_overloaded()
+    finally:
+        llm_gateway.LLM_RATE_LIMIT_COOLDOWN_SECONDS = original_cooldown
+        llm_gateway.genai.GenerativeModel = original_model
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_llm_rate_limiter()
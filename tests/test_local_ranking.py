@@ -0,0 +1,88 @@
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from agent import local_ranking
+from agent.recommendation import RecommendationService
+from schemas.recommendation import UserInputV2, BudgetV2
+from schemas.restaurant_profile import RestaurantProfile, MenuItem, DishAttributes, MenuItemAnalysis
+from services import llm_gateway
+from services.pipeline.menu_matrix import MenuMatrix
+
+
+def test_local_ranking():
+    print("Testing local ranking...")
+
+    menu_items = [
+        MenuItem(name="白飯", price=20, category="主食"),
+        MenuItem(name="紅燒牛肉", price=380, category="Main", is_popular=True,
+                 analysis=DishAttributes(contains_beef=True, sentiment_score=0.8, is_signature=True,
+                                         suitable_occasions=["group_share"])),
+        MenuItem(name="三杯雞", price=320, category="Main",
+                 ai_insight=MenuItemAnalysis(sentiment="positive", summary="入味", mention_count=4)),
+        MenuItem(name="炒時蔬", price=180, category="蔬菜"),
+        MenuItem(name="酸辣湯", price=150, category="湯品", analysis=DishAttributes(is_spicy=True)),
+        MenuItem(name="炸雞排", price=200, category="Main"),
+        MenuItem(name="滷肉飯", price=60, category="主食", is_popular=True),
+    ]
+    profile = RestaurantProfile(
+        place_id="mock-id",
+        name="Test Restaurant",
+        address="Test Address",
+        updated_at=datetime.now(),
+        trust_level="high",
+        menu_source_url=None,
+        menu_items=menu_items,
+        review_summary="Good food"
+    )
+    user_input = UserInputV2(
+        restaurant_name="Test Restaurant", dining_style="Shared", party_size=4,
+        budget=BudgetV2(type="Total", amount=1000), occasion="friends"
+    )
+    matrix = MenuMatrix(menu_items)
+
+    # Vegetable and soup first, then by score with category diversity, within budget
+    rows = local_ranking.select_dishes(matrix, list(range(len(menu_items))), user_input)
+    names = [menu_items[row].name for row in rows]
+    assert names == ["紅燒牛肉", "滷肉飯", "白飯", "炒時蔬", "酸辣湯", "炸雞排"], names
+    assert sum(menu_items[row].price for row in rows) <= 1000
+    assert local_ranking.dish_reason(menu_items[1], user_input) == "招牌菜、人氣必點、適合朋友聚餐"
+    assert local_ranking.dish_reason(menu_items[2], user_input) == "4 則評論提到：入味"
+
+    # Fitness favours non-fried dishes; individual meals skip the balance must-haves
+    fitness = user_input.model_copy(update={"occasion": "fitness", "dining_style": "Individual", "budget": None, "party_size": 3})
+    names = [menu_items[row].name for row in local_ranking.select_dishes(matrix, list(range(len(menu_items))), fitness)]
+    assert names == ["紅燒牛肉", "滷肉飯", "三杯雞"], names
+
+    # Local mode: complete response without an LLM call, not cached
+    service = RecommendationService()
+    local_input = user_input.model_copy(update={"ranking_mode": "local"})
+    result = asyncio.run(service.generate_recommendation(local_input, profile))
+    assert [slot.display.dish_name for slot in result.items][:2] == ["紅燒牛肉", "滷肉飯"]
+    assert result.total_price <= 1000
+    assert not service.used_fallback
+    shown = {slot.display.dish_name for slot in result.items}
+    assert all(alt.dish_name not in shown for slot in result.items for alt in slot.alternatives)
+    assert [alt.dish_name for alt in result.items[0].alternatives] == ["三杯雞"]
+
+    # Auto: personalized requests use the LLM unless it is overloaded
+    auto_input = user_input.model_copy(update={"ranking_mode": "auto"})
+    assert service._resolve_ranking_mode(auto_input) == "local"
+    personalized = auto_input.model_copy(update={"user_id": "u1"})
+    assert service._resolve_ranking_mode(personalized) == "llm"
+    original = llm_gateway.llm_overloaded
+    llm_gateway.llm_overloaded = lambda: True
+    try:
+        assert service._resolve_ranking_mode(personalized) == "local"
+    finally:
+        llm_gateway.llm_overloaded = original
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_local_ranking()
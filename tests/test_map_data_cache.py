@@ -0,0 +1,126 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+# Add project root to path
+sys.path.append(os.getcwd())
+os.environ.setdefault("APIFY_API_TOKEN", "test")
+
+from services.pipeline import providers
+from services.pipeline.providers import UnifiedMapProvider, decode_map_data
+
+
+class _Doc:
+    def __init__(self, store, key):
+        self.store, self.key = store, key
+
+    def get(self):
+        data = self.store.get(self.key)
+        return type("Snapshot", (), {"exists": data is not None, "to_dict": lambda _: dict(data)})()
+
+    def set(self, data):
+        self.store[self.key] = dict(data)
+
+
+class _FakeFirestore:
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return type("Collection", (), {"document": lambda _, key: _Doc(self.docs, (name, key))})()
+
+
+class _FakeApify:
+    """Actor runs and dataset pages; counts runs and items read"""
+    runs = []
+    items_read = 0
+    fail_memory_once = False
+
+    def __init__(self, token):
+        pass
+
+    def actor(self, name):
+        client = self
+
+        class Actor:
+            async def call(self, run_input, memory_mbytes):
+                _FakeApify.runs.append(memory_mbytes)
+                if _FakeApify.fail_memory_once:
+                    _FakeApify.fail_memory_once = False
+                    raise RuntimeError("By launching this job you will exceed the memory limit")
+                return {"defaultDatasetId": "ds1"}
+        return Actor()
+
+    def dataset(self, dataset_id):
+        class Dataset:
+            async def iterate_items(self, fields=None):
+                reviews = [{"text": f"好吃 {i}", "stars": 5, "name": "someone", "publishedAtDate": "2024-01-01",
+                            "reviewerPhotoUrl": "x" * 200} for i in range(70)]
+                reviews.insert(1, {"text": "", "stars": 1})
+                items = [
+                    {"placeId": "other", "title": "別家", "reviews": []},
+                    {"placeId": "p1", "title": "阿明小館", "address": "台北", "totalScore": 4.5,
+                     "reviews": reviews, "popularTimesHistogram": {"Mo": list(range(24))}},
+                    {"placeId": "p2", "title": "Never read"},
+                ]
+                for item in items:
+                    _FakeApify.items_read += 1
+                    yield {k: v for k, v in item.items() if not fields or k in fields}
+        return Dataset()
+
+
+def test_map_data_cache():
+    print("Testing map data cache...")
+
+    original_client = providers.ApifyClientAsync
+    original_delay = providers.MAP_DATA_RETRY_DELAY_SECONDS
+    providers.ApifyClientAsync = _FakeApify
+    providers.MAP_DATA_RETRY_DELAY_SECONDS = 0
+    try:
+        provider = UnifiedMapProvider()
+        provider.db = _FakeFirestore()
+
+        # Cold: one crawl, iteration stops at the matching item, reviews trimmed
+        map_data = asyncio.run(provider.fetch_map_data("阿明小館", place_id="p1"))
+        assert map_data.name == "阿明小館" and map_data.place_id == "p1"
+        assert _FakeApify.runs == [512] and _FakeApify.items_read == 2
+        assert len(map_data.reviews) == providers.MAP_DATA_MAX_REVIEWS
+        assert all(r.text and r.author_name is None for r in map_data.reviews)
+
+        doc = provider.db.docs[(providers.MAP_DATA_CACHE_COLLECTION, "p1")]
+        assert isinstance(doc["payload"], bytes) and decode_map_data(doc["payload"]) == map_data
+        assert len(doc["payload"]) < len(map_data.model_dump_json().encode("utf-8"))
+
+        # Warm: served from the cache, no actor run
+        again = asyncio.run(provider.fetch_map_data("阿明小館", place_id="p1"))
+        assert again == map_data and _FakeApify.runs == [512]
+
+        # Expired: crawled again; memory quota error retries at 256MB and returns data
+        doc["cached_at"] = datetime.now(timezone.utc) - timedelta(hours=providers.MAP_DATA_CACHE_TTL_HOURS + 1)
+        _FakeApify.fail_memory_once = True
+        retried = asyncio.run(provider.fetch_map_data("阿明小館", place_id="p1"))
+        assert retried == map_data and _FakeApify.runs == [512, 512, 256], _FakeApify.runs
+
+        # No item for the requested place: the first-item fallback is returned but not cached
+        fallback = asyncio.run(provider.fetch_map_data("阿華小吃", place_id="p9"))
+        assert fallback.place_id == "other"
+        assert (providers.MAP_DATA_CACHE_COLLECTION, "p9") not in provider.db.docs
+        assert (providers.MAP_DATA_CACHE_COLLECTION, "other") not in provider.db.docs
+        asyncio.run(provider.fetch_map_data("阿華小吃", place_id="p9"))
+        assert len(_FakeApify.runs) == 5  # Crawled again, not served from cache
+
+        # Name search (no place_id to check): cached under the place it found
+        provider.db.docs.clear()
+        searched = asyncio.run(provider.fetch_map_data("別家"))
+        assert searched.place_id == "other"
+        assert (providers.MAP_DATA_CACHE_COLLECTION, "other") in provider.db.docs
+    finally:
+        providers.ApifyClientAsync = original_client
+        providers.MAP_DATA_RETRY_DELAY_SECONDS = original_delay
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_map_data_cache()
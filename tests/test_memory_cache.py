@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services.memory_cache import BoundedTTLCache
+
+
+def test_memory_cache():
+    print("Testing BoundedTTLCache...")
+
+    # LRU eviction by entry count; get() refreshes recency
+    cache = BoundedTTLCache("test_lru", max_entries=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    # peek() does not refresh recency
+    assert cache.peek("a")
+    cache.get("c")
+    cache.set("d", 4)
+    assert cache.get("a") is None and cache.get("c") == 3
+    # Replacing a key does not evict anything
+    cache.set("c", 30)
+    assert cache.get("c") == 30 and cache.get("d") == 4
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 2
+
+    # Per-entry TTL
+    cache = BoundedTTLCache("test_ttl", max_entries=10, default_ttl=0.1)
+    cache.set("short", "x")
+    cache.set("long", "y", ttl=60)
+    cache.set("never", "z", ttl=0)  # Non-positive TTL: not stored
+    assert cache.peek("short") and not cache.peek("never")
+    time.sleep(0.15)
+    assert not cache.peek("short")
+    assert cache.get("short") is None and cache.get("long") == "y"
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 1
+    assert cache.invalidate("long") and not cache.invalidate("long")
+    assert cache.stats()["invalidations"] == 1
+
+    # Byte cap: evicts least recently used entries until the total fits
+    cache = BoundedTTLCache("test_bytes", max_entries=100, default_ttl=60, max_bytes=10, size_of=len)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")
+    cache.set("c", "cccc")
+    assert cache.get("b") is None and cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] == 8
+    cache.set("a", "a")  # Replacing an entry updates the byte total
+    assert cache.stats()["bytes"] == 5
+    cache.set("huge", "x" * 11)  # Bigger than the whole cache: skipped, nothing evicted
+    assert cache.get("huge") is None and cache.stats()["entries"] == 2
+    cache.clear()
+    assert cache.stats()["bytes"] == 0 and cache.stats()["entries"] == 0
+
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] > 0 and 0 <= stats["hit_rate"] <= 1
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_memory_cache()
@@ -0,0 +1,131 @@
+import sys
+import os
+import json
+import asyncio
+import itertools
+import random
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from agent import menu_optimizer
+from agent.menu_optimizer import MenuCandidate, MenuConstraints, optimize_menu
+from agent import recommendation_agents
+from agent.recommendation_agents import OrchestratorAgent
+from schemas.recommendation import UserInputV2, BudgetV2
+from services import llm_gateway
+
+
+def _brute_force(candidates, constraints):
+    best = None
+    for k in range(constraints.min_dishes, constraints.max_dishes + 1):
+        for combo in itertools.combinations(range(len(candidates)), k):
+            chosen = [candidates[i] for i in combo]
+            if sum(c.cost for c in chosen) > constraints.budget:
+                continue
+            counts = {}
+            for c in chosen:
+                counts[c.group] = counts.get(c.group, 0) + 1
+            if any(counts.get(g, 0) < n for g, n in constraints.group_min.items()):
+                continue
+            if any(counts.get(g, 0) > n for g, n in constraints.group_max.items()):
+                continue
+            utility = sum(c.utility for c in chosen)
+            if best is None or utility > best + 1e-9:
+                best = utility
+    return best
+
+
+def test_menu_optimizer():
+    print("Testing menu optimizer...")
+
+    # Exact against brute force (budget under PRICE_BUCKETS, so no price rounding)
+    rng = random.Random(7)
+    groups = ["main", "main", "main", "vegetable", "soup", "staple"]
+    for _ in range(20):
+        candidates = [
+            MenuCandidate(name=f"dish{i}", price=rng.randint(10, 80), category="c", group=rng.choice(groups),
+                          utility=round(rng.uniform(0.5, 5.0), 2), quantity=rng.choice([1, 1, 2]))
+            for i in range(10)
+        ]
+        constraints = MenuConstraints(budget=200, min_dishes=2, max_dishes=5,
+                                      group_min={"vegetable": 1}, group_max={"soup": 1, "staple": 1})
+        expected = _brute_force(candidates, constraints)
+        menu = optimize_menu(candidates, constraints)
+        if expected is None:
+            assert not menu.feasible
+            continue
+        assert menu.feasible and abs(menu.utility - expected) < 1e-6, (menu.utility, expected)
+        assert abs(sum(c.utility for c in menu.selected) - expected) < 1e-6
+        assert menu.total_price <= 200
+
+    # Request constraints: portions, balance groups, per-person budget
+    pool = [
+        {"dish_name": "東坡肉", "price": 480, "category": "熱菜", "status": "Must Order", "confidence_score": 95},
+        {"dish_name": "宮保雞丁", "price": "$320", "category": "熱菜", "status": "Recommended"},
+        {"dish_name": "乾煸四季豆", "price": 220, "category": "蔬菜", "status": "Standard"},
+        {"dish_name": "酸菜白肉鍋", "price": 520, "category": "湯品", "status": "Recommended"},
+        {"dish_name": "白飯", "price": 20, "category": "主食"},
+        {"dish_name": "涼拌小黃瓜", "price": 90, "category": "冷菜"},
+        {"dish_name": "炸排骨", "price": 300, "category": "熱菜", "status": "Avoid"},
+        {"dish_name": "紅豆湯圓", "price": 80, "category": "甜點"},
+    ]
+    user_input = UserInputV2(restaurant_name="Test", dining_style="Shared", party_size=4,
+                             budget=BudgetV2(type="Per_Person", amount=500))
+    candidates = menu_optimizer.build_candidates(pool, user_input)
+    assert "炸排骨" not in [c.name for c in candidates]
+    quantities = {c.name: c.quantity for c in candidates}
+    assert quantities["白飯"] == 4 and quantities["涼拌小黃瓜"] == 2 and quantities["東坡肉"] == 1
+    menu = optimize_menu(candidates, menu_optimizer.constraints_for(user_input, candidates))
+    names = [c.name for c in menu.selected]
+    assert menu.feasible and menu.total_price <= 2000
+    assert "乾煸四季豆" in names and "酸菜白肉鍋" in names and "東坡肉" in names
+    assert 5 <= len(names) <= 7
+
+    # Infeasible minimums are relaxed rather than failing
+    tight = user_input.model_copy(update={"budget": BudgetV2(type="Total", amount=700)})
+    menu = optimize_menu(candidates, menu_optimizer.constraints_for(tight, candidates))
+    assert not menu.feasible and menu.relaxed and menu.selected and menu.total_price <= 700
+
+    # Orchestrator: non-personalized requests make one LLM call (reasons only)
+    calls = []
+
+    class FakeResponse:
+        def __init__(self, text):
+            self.text = text
+
+    async def fake_generate(prompt, model_name, generation_config=None, call_site="unknown", **kwargs):
+        calls.append(call_site)
+        assert model_name == recommendation_agents.EXPLAIN_MODEL_NAME
+        menu_json = prompt.split("# Final Menu (do not add, remove or reorder dishes)\n", 1)[1].split("\n\n# Output", 1)[0]
+        dishes = [{"dish_name": d["dish_name"], "reason": f"推薦{d['dish_name']}"} for d in json.loads(menu_json)]
+        return FakeResponse(json.dumps({"dishes": dishes, "rationale": "ok"}, ensure_ascii=False))
+
+    original = llm_gateway.generate_content_async
+    llm_gateway.generate_content_async = fake_generate
+    try:
+        final_menu = asyncio.run(OrchestratorAgent().run(user_input, pool, pool))
+    finally:
+        llm_gateway.generate_content_async = original
+    assert calls == ["DishSelectorAgent.explain"], calls
+    assert all(dish["reason"] == f"推薦{dish['dish_name']}" for dish in final_menu)
+    assert sum(dish["price"] * dish["quantity"] for dish in final_menu) <= 2000
+
+    # Dietary preferences in any form (English keys, aliases) remove dishes before optimizing
+    beef_pool = pool + [
+        {"dish_name": "紅燒牛肉", "price": 450, "category": "熱菜", "status": "Must Order", "confidence_score": 99},
+        {"dish_name": "招牌煲", "price": 400, "category": "熱菜", "status": "Must Order",
+         "analysis": {"contains_beef": True, "is_signature": True}},
+    ]
+    for preference in ("no_beef", "不要牛肉", "不吃牛"):
+        no_beef = user_input.model_copy(update={"preferences": [preference]})
+        names = [c.name for c in OrchestratorAgent()._optimize_menu(beef_pool, no_beef).selected]
+        assert names and "紅燒牛肉" not in names and "招牌煲" not in names, (preference, names)
+    names = [c.name for c in OrchestratorAgent()._optimize_menu(beef_pool, user_input).selected]
+    assert "紅燒牛肉" in names
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_menu_optimizer()
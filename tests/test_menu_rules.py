@@ -0,0 +1,75 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from agent import menu_rules
+from agent.recommendation_agents import BalanceCheckerAgent, QualityAssuranceAgent
+from schemas.recommendation import UserInputV2
+from services import llm_gateway
+
+
+def test_menu_rules():
+    print("Testing local menu rules...")
+
+    balanced = [
+        {"dish_name": "東坡肉", "price": 480, "quantity": 1, "category": "熱菜", "tag": "招牌"},
+        {"dish_name": "宮保雞丁", "price": 320, "quantity": 1, "category": "熱菜", "tag": "Standard"},
+        {"dish_name": "炒青菜", "price": 220, "quantity": 1, "category": "蔬菜", "tag": "Standard"},
+        {"dish_name": "酸菜白肉鍋", "price": 520, "quantity": 1, "category": "湯品", "tag": "Standard"},
+        {"dish_name": "涼拌小黃瓜", "price": 90, "quantity": 2, "category": "冷菜", "tag": "Standard"},
+        {"dish_name": "白飯", "price": 20, "quantity": 4, "category": "主食", "tag": "Standard"},
+    ]
+    report = menu_rules.score_balance(balanced, "Shared", 4)
+    assert report.passed and report.score >= 0.9, report
+
+    # Missing vegetable and too few dishes never pass
+    greasy = [
+        {"dish_name": "炸雞", "category": "熱菜"},
+        {"dish_name": "炸排骨", "category": "熱菜"},
+        {"dish_name": "鹽酥雞", "category": "熱菜"},
+    ]
+    report = menu_rules.score_balance(greasy, "Shared", 4)
+    assert not report.passed
+    assert "缺少蔬菜類菜品" in report.issues and report.criteria["grease"] == 0.0
+    assert menu_rules.method_entropy(["fried", "fried", "fried"]) == 0.0
+    assert menu_rules.method_entropy(["fried", "steamed"]) == 1.0
+    assert menu_rules.score_balance(greasy, "Individual", 2).passed
+
+    # QA: per-head unit items and over-ordering
+    user_input = UserInputV2(restaurant_name="Test", dining_style="Shared", party_size=4, occasion="business")
+    hard_checks = QualityAssuranceAgent()._perform_hard_checks(balanced, user_input)
+    assert menu_rules.score_quality(balanced, user_input, hard_checks).passed
+    short_rice = [dict(d, quantity=1) if d["dish_name"] == "白飯" else d for d in balanced]
+    report = menu_rules.score_quality(short_rice, user_input, hard_checks)
+    assert not report.passed and report.issues == ["白飯 份數 1 與 4 人不符"]
+
+    # Agents skip their LLM calls when the local rules pass
+    calls = []
+
+    async def fake_generate(prompt, model_name, generation_config=None, call_site="unknown", **kwargs):
+        calls.append(call_site)
+        raise RuntimeError("LLM unavailable in test")
+
+    original = llm_gateway.generate_content_async
+    llm_gateway.generate_content_async = fake_generate
+    try:
+        balance = asyncio.run(BalanceCheckerAgent().run(balanced, "Shared", 4))
+        qa = asyncio.run(QualityAssuranceAgent().run(balanced, user_input, []))
+        assert balance.approved and qa.approved and calls == []
+        asyncio.run(BalanceCheckerAgent().run(greasy, "Shared", 4))
+        assert calls == ["BalanceCheckerAgent.run"]
+    finally:
+        llm_gateway.generate_content_async = original
+
+    stats = menu_rules.get_rules_stats()
+    assert stats["balance"]["skipped_llm_calls"] == 1 and stats["balance"]["llm_calls"] == 1
+    assert stats["qa_soft"]["skipped_llm_calls"] == 1
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_menu_rules()
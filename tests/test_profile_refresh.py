@@ -0,0 +1,97 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from services import firestore_service, job_manager as job_manager_module
+from services.job_manager import JobScheduler
+from services.memory_cache import BoundedTTLCache
+from services.restaurant_service import RestaurantService
+
+
+def test_profile_refresh():
+    print("Testing stale profile refresh scheduling...")
+
+    runs = []
+    release = asyncio.Event()
+
+    async def fake_get_profile(place_id, allow_stale=False):
+        return {"place_id": place_id, "name": place_id}
+
+    async def fake_run_cold_start(restaurant_name, place_id, key):
+        runs.append(place_id)
+        await release.wait()
+        if place_id == "p4":
+            raise RuntimeError("By launching this job you will exceed the memory limit")
+        return {"place_id": place_id}
+
+    original_get = firestore_service.get_restaurant_profile_async
+    original_stale = firestore_service.is_profile_stale
+    original_run = RestaurantService._run_cold_start
+    original_scheduler = job_manager_module.job_scheduler
+    original_attempts = RestaurantService._refresh_attempts
+    firestore_service.get_restaurant_profile_async = fake_get_profile
+    firestore_service.is_profile_stale = lambda profile: True
+    RestaurantService._run_cold_start = staticmethod(fake_run_cold_start)
+    # One worker, one queued job: the third stale restaurant finds the lane full
+    job_manager_module.job_scheduler = JobScheduler({"prefetch": (1, 1)})
+    RestaurantService._refresh_attempts = BoundedTTLCache("test_refresh_attempts", max_entries=16, default_ttl=0.5)
+    try:
+        async def run():
+            # Stale profiles are served at once; refreshes go through the prefetch lane
+            for place_id in ("p1", "p1", "p2", "p3"):
+                profile = await RestaurantService.get_or_create_profile(place_id, place_id)
+                assert profile["place_id"] == place_id
+                await asyncio.sleep(0)
+            assert runs == ["p1"]
+            stats = RestaurantService.refresh_stats()
+            assert stats["scheduled"] == 2 and stats["dropped_saturated"] == 1 and stats["pending"] == 2, stats
+            lane = job_manager_module.job_scheduler.stats()["prefetch"]
+            assert lane["running"] == 1 and lane["queue_depth"] == 1 and lane["rejected"] == 1
+
+            release.set()
+            await asyncio.sleep(0.05)
+            assert runs == ["p1", "p2"]
+            stats = RestaurantService.refresh_stats()
+            assert stats["completed"] == 2 and stats["pending"] == 0
+
+            # Attempted recently: no new run. A dropped refresh (p3) was never attempted
+            async def request(place_id):
+                await RestaurantService.get_or_create_profile(place_id, place_id)
+                await asyncio.sleep(0.05)
+
+            await request("p1")
+            await request("p3")
+            assert runs == ["p1", "p2", "p3"]
+
+            # A failed refresh backs off instead of rerunning the pipeline on every request
+            await request("p4")
+            await request("p4")
+            await request("p4")
+            assert runs == ["p1", "p2", "p3", "p4"]
+            stats = RestaurantService.refresh_stats()
+            assert stats["failed"] == 1 and stats["skipped_cooldown"] == 3, stats
+
+            # Retried once the cooldown has passed
+            await asyncio.sleep(0.5)
+            await request("p4")
+            assert runs == ["p1", "p2", "p3", "p4", "p4"]
+            for worker in job_manager_module.job_scheduler._workers:
+                worker.cancel()
+
+        asyncio.run(run())
+    finally:
+        firestore_service.get_restaurant_profile_async = original_get
+        firestore_service.is_profile_stale = original_stale
+        RestaurantService._run_cold_start = original_run
+        job_manager_module.job_scheduler = original_scheduler
+        RestaurantService._refresh_attempts = original_attempts
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_profile_refresh()
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from schemas.pipeline import RawReview
+from schemas.restaurant_profile import MenuItem, MenuItemAnalysis, DishAttributes
+from services.pipeline.mentions import ReviewMentionIndex, name_variants
+
+
+def test_review_mentions():
+    print("Testing ReviewMentionIndex...")
+
+    menu = ["招牌牛肉麵", "牛肉麵", "小籠包 (8入)", "酸辣湯", "Mango Ice"]
+    reviews = [
+        RawReview(text="招牌牛肉麵超好吃！小籠包也很讚。", rating=5),
+        RawReview(text="牛 肉 麵普通，酸辣湯太鹹", rating=2),
+        RawReview(text="環境很吵，服務還可以", rating=3),
+        RawReview(text="MANGO ICE is great, 小籠包皮薄", rating=4),
+        RawReview(text=None, rating=4),
+    ]
+
+    assert "小籠包" in name_variants("小籠包 (8入)")
+
+    mentions = ReviewMentionIndex(menu).scan(reviews)
+
+    # Leftmost-longest: "招牌牛肉麵" does not also count as "牛肉麵"
+    assert mentions.for_dish("招牌牛肉麵").mention_count == 1
+    assert mentions.for_dish("牛肉麵").mention_count == 1  # Spaced-out name in review 2
+    assert mentions.for_dish("小籠包 (8入)").mention_count == 2
+    assert mentions.for_dish("Mango Ice").mention_count == 1
+    assert mentions.for_dish("酸辣湯").sentiment == "negative"
+    assert mentions.for_dish("招牌牛肉麵").sentiment == "positive"
+
+    # Offsets point into the original text
+    review_index, start, end = mentions.for_dish("牛肉麵").spans[0]
+    assert reviews[review_index].text[start:end] == "牛 肉 麵"
+    assert mentions.highlight("小籠包 (8入)") == "小籠包也很讚"  # Highest-rated review wins
+    assert mentions.review_texts("酸辣湯") == ["牛 肉 麵普通，酸辣湯太鹹"]
+
+    # Reviews mentioning more dishes come first, the rest keep their order
+    ranked = mentions.rank_reviews()
+    assert [r.text for r in ranked[:2]] == [reviews[0].text, reviews[1].text]
+    assert ranked[-2:] == [reviews[2], reviews[4]]
+
+    # Local counts fill in what the LLM missed
+    items = [
+        MenuItem(name="小籠包 (8入)", price=200, ai_insight=MenuItemAnalysis(sentiment="neutral", summary="未提及", mention_count=0),
+                 analysis=DishAttributes(highlight_review=None)),
+        MenuItem(name="酸辣湯", price=60, ai_insight=MenuItemAnalysis(sentiment="negative", summary="太鹹", mention_count=5)),
+    ]
+    applied = mentions.apply(items)
+    assert applied[0].ai_insight.mention_count == 2
+    assert applied[0].ai_insight.sentiment == "positive"
+    assert applied[0].analysis.highlight_review == "小籠包也很讚"
+    assert applied[1].ai_insight.mention_count == 5  # LLM count kept when higher
+    assert applied[1].ai_insight.summary == "太鹹"
+    assert applied[1].is_popular
+
+    # Names nested in a longer name still find their reviews; short exact names are patterns
+    assert name_variants("粥") == ["粥"]
+    nested = ReviewMentionIndex(["牛肉麵", "牛肉", "粥"]).scan(["牛肉麵很好吃", "皮蛋粥不錯"])
+    assert nested.review_texts("牛肉") == ["牛肉麵很好吃"]
+    assert nested.review_texts("粥") == ["皮蛋粥不錯"]
+    assert nested.for_dish("牛肉麵").mention_count == 1
+    assert nested.for_dish("牛肉").mention_count == 0  # Counted once, as the longer name
+    assert mentions.review_texts("牛肉麵") == [reviews[0].text, reviews[1].text]
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_review_mentions()
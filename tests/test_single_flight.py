@@ -0,0 +1,87 @@
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from services.single_flight import SingleFlight
+
+
+def test_single_flight():
+    print("Testing SingleFlight...")
+
+    async def run():
+        flights = SingleFlight("test")
+        executions = []
+        release = asyncio.Event()
+
+        async def work():
+            executions.append("run")
+            await release.wait()
+            return {"profile": "阿明小館"}
+
+        # Concurrent callers share one execution and the same result
+        callers = [asyncio.create_task(flights.do("p1", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.in_flight("p1") and not flights.in_flight("p2")
+        release.set()
+        results = await asyncio.gather(*callers)
+        assert executions == ["run"]
+        assert all(result is results[0] for result in results)
+        stats = flights.stats()
+        assert stats["flights"] == 1 and stats["coalesced_calls"] == 4 and stats["last_waiters"] == 4
+        assert stats["in_flight"] == 0 and not flights.in_flight("p1")
+
+        # The key is free again once finished: the next call runs anew
+        await flights.do("p1", work)
+        assert executions == ["run", "run"]
+
+        # Every caller sees the shared exception
+        failing = asyncio.Event()
+
+        async def fail():
+            executions.append("fail")
+            await failing.wait()
+            raise ValueError("crawl failed")
+
+        callers = [asyncio.create_task(flights.do("p2", fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+        failing.set()
+        outcomes = await asyncio.gather(*callers, return_exceptions=True)
+        assert executions.count("fail") == 1
+        assert all(isinstance(outcome, ValueError) and str(outcome) == "crawl failed" for outcome in outcomes)
+        assert not flights.in_flight("p2")
+
+        # Cancelling one waiter (client disconnect) leaves the shared execution running for the rest
+        release.clear()
+        first = asyncio.create_task(flights.do("p3", work))
+        second = asyncio.create_task(flights.do("p3", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert first.cancelled() and flights.in_flight("p3")
+        release.set()
+        assert (await second) == {"profile": "阿明小館"}
+        assert executions.count("run") == 3
+
+        # Even when the caller that started it is the only one, cancelling it does not cancel the work
+        release.clear()
+        lone = asyncio.create_task(flights.do("p4", work))
+        await asyncio.sleep(0)
+        lone.cancel()
+        await asyncio.sleep(0)
+        assert flights.in_flight("p4")
+        late = asyncio.create_task(flights.do("p4", work))  # Joins the surviving execution
+        await asyncio.sleep(0)
+        release.set()
+        assert (await late) == {"profile": "阿明小館"}
+        assert executions.count("run") == 4
+
+    asyncio.run(run())
+
+    print("Test Passed!")
+
+
+if __name__ == "__main__":
+    test_single_flight()